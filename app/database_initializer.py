@@ -1,19 +1,62 @@
 import logging
 
 from typing import AsyncGenerator
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from fastapi import Request
+from sqlalchemy import make_url
+from sqlalchemy.ext.asyncio import (
+    create_async_engine,
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+)
 from sqlalchemy.orm import declarative_base
 
 import settings
+from app.utils.pool import InstrumentedQueuePool, instrument_pool
+from app.utils.query_stats import instrument_engine
+from app.utils.replica import is_sticky_primary
 
 logger = logging.getLogger(__name__)
 
-engine = create_async_engine(
-    settings.SQLALCHEMY_DATABASE_URL,
-    echo=True,
-    future=True,
-    connect_args={"check_same_thread": False},
-)
+
+def get_engine_options(url: str) -> dict:
+    url = make_url(url)
+    options = {
+        "echo": settings.DATABASE_ECHO,
+        "pool_pre_ping": settings.DATABASE_POOL_PRE_PING,
+    }
+
+    if url.get_backend_name() == "sqlite":
+        # aiosqlite runs the connection in its own thread
+        options["connect_args"] = {"check_same_thread": False}
+
+        # In-memory databases live in a single connection, there's no pool to size
+        if url.database in (None, "", ":memory:"):
+            return options
+    elif url.get_driver_name() == "asyncpg":
+        options["connect_args"] = {
+            "prepared_statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE
+        }
+
+    return {
+        **options,
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE,
+    }
+
+
+def create_engine(url: str, name: str) -> AsyncEngine:
+    engine = create_async_engine(url, pool_logging_name=name, **get_engine_options(url))
+    instrument_engine(engine)
+    instrument_pool(engine, name)
+
+    return engine
+
+
+engine = create_engine(settings.SQLALCHEMY_DATABASE_URL, "primary")
 
 SessionLocal = async_sessionmaker(
     autocommit=False,
@@ -22,6 +65,19 @@ SessionLocal = async_sessionmaker(
     bind=engine,
 )
 
+if settings.SQLALCHEMY_REPLICA_URL:
+    replica_engine = create_engine(settings.SQLALCHEMY_REPLICA_URL, "replica")
+
+    ReplicaSessionLocal = async_sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        expire_on_commit=False,
+        bind=replica_engine,
+    )
+else:
+    replica_engine = None
+    ReplicaSessionLocal = None
+
 Base = declarative_base()
 
 
@@ -33,6 +89,23 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         await db.close()
 
 
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Session for read-only routes. It reads from the replica if there is one, except
+    for clients which have just written, see app.utils.replica.
+    """
+    if ReplicaSessionLocal is None or is_sticky_primary(request):
+        session_maker = SessionLocal
+    else:
+        session_maker = ReplicaSessionLocal
+
+    db: AsyncSession = session_maker()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
 async def init_models(clean=False) -> None:
     async with engine.begin() as conn:
         if clean:
@@ -0,0 +1,87 @@
+"""media store
+
+Media moved from base64 in the rows to the media store. Photo columns hold
+references now, so the old binary ones are kept as legacy_photo until
+migrate_media.py moves their content to the store.
+
+The database used to be created with create_all, so the changes are applied
+only where the schema doesn't have them yet.
+
+Revision ID: 0001_media_store
+Revises:
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_media_store"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PHOTO_TABLES = ("users", "organizations")
+
+
+def get_columns(table: str) -> dict:
+    return {
+        column["name"]: column
+        for column in sa.inspect(op.get_bind()).get_columns(table)
+    }
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table("media"):
+        op.create_table(
+            "media",
+            sa.Column("hash", sa.String(64), primary_key=True),
+            sa.Column("size", sa.BigInteger, nullable=False),
+            sa.Column("mime", sa.String(255), nullable=False),
+            sa.Column("created_at", sa.DateTime, nullable=False),
+        )
+
+    media_columns = get_columns("media")
+    with op.batch_alter_table("media") as batch_op:
+        if "ref_count" not in media_columns:
+            batch_op.add_column(
+                sa.Column("ref_count", sa.Integer, nullable=False, server_default="0")
+            )
+        if "unreferenced_at" not in media_columns:
+            batch_op.add_column(sa.Column("unreferenced_at", sa.DateTime, nullable=True))
+            batch_op.create_index("ix_media_unreferenced_at", ["unreferenced_at"])
+
+    for table in PHOTO_TABLES:
+        photo = get_columns(table).get("photo")
+
+        if photo is None or not isinstance(photo["type"], sa.LargeBinary):
+            continue
+
+        indexes = [index["name"] for index in inspector.get_indexes(table)]
+
+        with op.batch_alter_table(table) as batch_op:
+            if f"ix_{table}_photo" in indexes:
+                batch_op.drop_index(f"ix_{table}_photo")
+
+            batch_op.alter_column("photo", new_column_name="legacy_photo")
+
+        # Separately, so SQLite doesn't recreate the table with two "photo" columns
+        op.add_column(table, sa.Column("photo", sa.JSON, nullable=True))
+
+
+def downgrade() -> None:
+    # Photos which were already moved to the media store aren't restored
+    for table in PHOTO_TABLES:
+        if "legacy_photo" not in get_columns(table):
+            continue
+
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("photo")
+
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column("legacy_photo", new_column_name="photo")
@@ -0,0 +1,46 @@
+"""favorite stories indexes
+
+Favorite stories of an organization are read by one query filtering stories of
+the organization and of its goals by position.
+
+Revision ID: 0002_favorite_stories_indexes
+Revises: 0001_media_store
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_favorite_stories_indexes"
+down_revision: Union[str, None] = "0001_media_store"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "ix_stories_organization_id_position": ["organization_id", "position"],
+    "ix_stories_goal_id_position": ["goal_id", "position"],
+}
+
+
+def get_index_names(table: str) -> set:
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade() -> None:
+    existing = get_index_names("stories")
+
+    for name, columns in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, "stories", columns)
+
+
+def downgrade() -> None:
+    existing = get_index_names("stories")
+
+    for name in INDEXES:
+        if name in existing:
+            op.drop_index(name, table_name="stories")
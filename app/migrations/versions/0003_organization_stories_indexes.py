@@ -0,0 +1,49 @@
+"""organization stories indexes
+
+Allowed stories of an organization are read from both of its attachment paths,
+stories.organization_id and stories.goal_id.
+
+Revision ID: 0003_organization_stories_indexes
+Revises: 0002_favorite_stories_indexes
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_organization_stories_indexes"
+down_revision: Union[str, None] = "0002_favorite_stories_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "ix_stories_organization_id_moderation_state": [
+        "organization_id",
+        "moderation_state",
+    ],
+    "ix_stories_goal_id_moderation_state": ["goal_id", "moderation_state"],
+}
+
+
+def get_index_names(table: str) -> set:
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade() -> None:
+    existing = get_index_names("stories")
+
+    for name, columns in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, "stories", columns)
+
+
+def downgrade() -> None:
+    existing = get_index_names("stories")
+
+    for name in INDEXES:
+        if name in existing:
+            op.drop_index(name, table_name="stories")
@@ -0,0 +1,107 @@
+"""rationalize indexes
+
+Indexes which no query uses are dropped, they only slow down writes: duplicates
+of primary keys, and indexes on binary, JSON and long text columns. Indexes for
+the lookups the models do are added.
+
+Revision ID: 0004_rationalize_indexes
+Revises: 0003_organization_stories_indexes
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_rationalize_indexes"
+down_revision: Union[str, None] = "0003_organization_stories_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DROPPED_INDEXES = {
+    "users": {
+        "ix_users_id": ["id"],
+        "ix_users_description": ["description"],
+        "ix_users_hashed_password": ["hashed_password"],
+    },
+    "organizations": {"ix_organizations_id": ["id"]},
+    "goals": {
+        "ix_goals_id": ["id"],
+        "ix_goals_dates": ["dates"],
+        "ix_goals_address": ["address"],
+        "ix_goals_description": ["description"],
+        "ix_goals_prize_info": ["prize_info"],
+        "ix_goals_prize_conditions": ["prize_conditions"],
+        "ix_goals_content": ["content"],
+    },
+    "places": {"ix_places_id": ["id"]},
+    "codes": {"ix_codes_value": ["value"]},
+    "discounts": {"ix_discounts_id": ["id"]},
+    "stories": {
+        "ix_stories_id": ["id"],
+        "ix_stories_description": ["description"],
+        "ix_stories_content": ["content"],
+    },
+}
+
+ADDED_INDEXES = {
+    "goals": {"ix_goals_owner_id": ["owner_id"]},
+    "places": {"ix_places_organization_id_address": ["organization_id", "address"]},
+    "codes": {"ix_codes_owner_id": ["owner_id"]},
+    "discounts": {
+        "ix_discounts_user_id_organization_id": ["user_id", "organization_id"]
+    },
+    "stories": {"ix_stories_owner_id": ["owner_id"]},
+}
+
+
+def get_index_names(table: str) -> set:
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def is_json(table: str, column: str) -> bool:
+    columns = sa.inspect(op.get_bind()).get_columns(table)
+
+    return any(
+        item["name"] == column and isinstance(item["type"], sa.JSON) for item in columns
+    )
+
+
+def drop_indexes(indexes: dict) -> None:
+    for table, table_indexes in indexes.items():
+        existing = get_index_names(table)
+
+        for name in table_indexes:
+            if name in existing:
+                op.drop_index(name, table_name=table)
+
+
+def create_indexes(indexes: dict) -> None:
+    for table, table_indexes in indexes.items():
+        existing = get_index_names(table)
+
+        for name, columns in table_indexes.items():
+            if name in existing:
+                continue
+
+            # PostgreSQL has no btree operator class for json, such indexes
+            # could only be created by SQLite
+            if op.get_bind().dialect.name == "postgresql" and any(
+                is_json(table, column) for column in columns
+            ):
+                continue
+
+            op.create_index(name, table, columns)
+
+
+def upgrade() -> None:
+    drop_indexes(DROPPED_INDEXES)
+    create_indexes(ADDED_INDEXES)
+
+
+def downgrade() -> None:
+    drop_indexes(ADDED_INDEXES)
+    create_indexes(DROPPED_INDEXES)
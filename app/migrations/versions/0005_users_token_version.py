@@ -0,0 +1,41 @@
+"""users token version
+
+Access tokens carry the version of the account they were issued for, it's raised
+when the role or the organization of the user changes so older tokens are rejected.
+
+Revision ID: 0005_users_token_version
+Revises: 0004_rationalize_indexes
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_users_token_version"
+down_revision: Union[str, None] = "0004_rationalize_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def get_column_names(table: str) -> set:
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    if "token_version" not in get_column_names("users"):
+        with op.batch_alter_table("users") as batch_op:
+            batch_op.add_column(
+                sa.Column(
+                    "token_version", sa.Integer, nullable=False, server_default="0"
+                )
+            )
+
+
+def downgrade() -> None:
+    if "token_version" in get_column_names("users"):
+        with op.batch_alter_table("users") as batch_op:
+            batch_op.drop_column("token_version")
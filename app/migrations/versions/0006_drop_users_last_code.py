@@ -0,0 +1,38 @@
+"""drop users last code
+
+Email verification codes are kept in Redis with a time to live, see
+app.utils.email_codes.
+
+Revision ID: 0006_drop_users_last_code
+Revises: 0005_users_token_version
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_drop_users_last_code"
+down_revision: Union[str, None] = "0005_users_token_version"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def get_column_names(table: str) -> set:
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    if "last_code" in get_column_names("users"):
+        with op.batch_alter_table("users") as batch_op:
+            batch_op.drop_column("last_code")
+
+
+def downgrade() -> None:
+    # Codes issued meanwhile aren't restored, users request new ones
+    if "last_code" not in get_column_names("users"):
+        with op.batch_alter_table("users") as batch_op:
+            batch_op.add_column(sa.Column("last_code", sa.String(5), nullable=True))
@@ -17,7 +17,7 @@ from sqlalchemy import (
 
 from app.database_initializer import Base
 from app.schemas.code import CodeCreateSchema
-from app.utils.db import create_model_instance
+from app.utils.db import create_model_instance, save
 from app.types.enums import CodeType
 
 DEFAULT_CODE_EXPIRATION = 60 * 5  # 5 minutes
@@ -26,7 +26,7 @@ DEFAULT_CODE_EXPIRATION = 60 * 5  # 5 minutes
 class Code(Base):
     __tablename__ = "codes"
 
-    value = Column(String, index=True, primary_key=True)
+    value = Column(String, primary_key=True)
     code_type = Column(Enum(CodeType), nullable=False)
     content = Column(LargeBinary, nullable=False)
 
@@ -35,13 +35,16 @@ class Code(Base):
     created_at = Column(DateTime, index=True, nullable=True)
 
     goal_id = Column(Integer, ForeignKey("goals.id"), nullable=True)
-    goal = relationship("Goal", back_populates="codes", lazy="selectin")
+    goal = relationship("Goal", back_populates="codes", lazy="raise")
 
     organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=True)
-    organization = relationship("Organization", back_populates="codes", lazy="selectin")
+    organization = relationship("Organization", back_populates="codes", lazy="raise")
 
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    owner = relationship("User", back_populates="codes", lazy="selectin")
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    owner = relationship("User", back_populates="codes", lazy="raise")
+
+    # is_valid has a server default, it's fetched by the INSERT
+    __mapper_args__ = {"eager_defaults": True}
 
     def __str__(self):
         return f"Goal #{self.id}"
@@ -72,7 +75,6 @@ class Code(Base):
     async def blacklist(self, session: AsyncSession) -> "Code":
         self.is_valid = False
 
-        await session.commit()
-        await session.refresh(self)
+        await save(session)
 
         return self
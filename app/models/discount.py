@@ -1,22 +1,29 @@
-from sqlalchemy import Column, Integer, ForeignKey, Float, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, Float, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func, select
 from sqlalchemy.exc import NoResultFound
 from app.database_initializer import Base
+from app.utils.db import save
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
 class Discount(Base):
     __tablename__ = "discounts"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     discount_percentage = Column(Float, nullable=False)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
 
-    user = relationship("User", back_populates="discounts")
-    organization = relationship("Organization", back_populates="discounts")
+    user = relationship("User", back_populates="discounts", lazy="raise")
+    organization = relationship("Organization", back_populates="discounts", lazy="raise")
+
+    __table_args__ = (
+        Index("ix_discounts_user_id_organization_id", "user_id", "organization_id"),
+    )
+    # updated_at is set by the database, it's fetched by INSERT and UPDATE
+    __mapper_args__ = {"eager_defaults": True}
 
     @classmethod
     async def create(
@@ -33,8 +40,7 @@ class Discount(Base):
             discount_percentage=discount_percentage,
         )
         session.add(discount)
-        await session.commit()
-        await session.refresh(discount)
+        await save(session, flush=True)
         return discount
 
     @classmethod
@@ -57,6 +63,5 @@ class Discount(Base):
     ) -> "Discount":
         """Update the discount percentage in the database."""
         self.discount_percentage = discount_percentage
-        await session.commit()
-        await session.refresh(self)
+        await save(session)
         return self
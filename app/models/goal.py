@@ -1,9 +1,9 @@
 from datetime import datetime
-from typing import List
+from typing import List, Sequence
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy import (
     Column,
     Integer,
@@ -15,19 +15,21 @@ from sqlalchemy import (
     DateTime,
 )
 
-from app.utils.db import create_model_instance
+from app.utils.db import create_model_instance, save
+from app.utils.pagination import Page, PageParams, get_page, paginate
 from app.schemas.goal import GoalCreateSchema
 from app.database_initializer import Base
+from app.models.media import MEDIA_REFERENCE
 
 
 class Goal(Base):
     __tablename__ = "goals"
 
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     title = Column(String, index=True)
     cost = Column(Integer, index=True, nullable=True)
 
-    dates = Column(JSON, index=True, nullable=True)
+    dates = Column(JSON, nullable=True)
 
     from_date = Column(Date, index=True, nullable=True)
     to_date = Column(Date, index=True, nullable=True)
@@ -36,20 +38,24 @@ class Goal(Base):
     to_time = Column(Time, index=True, nullable=True)
 
     created_at = Column(DateTime, index=True)
-    address = Column(JSON, index=True)
-    description = Column(String, index=True)
+    address = Column(JSON)
+    description = Column(String)
 
-    prize_info = Column(String, index=True, nullable=True)
-    prize_conditions = Column(JSON, index=True, nullable=True)
+    prize_info = Column(String, nullable=True)
+    prize_conditions = Column(JSON, nullable=True)
 
-    content = Column(JSON, index=True, nullable=True)
+    content = deferred(
+        Column(JSON, nullable=True, info=MEDIA_REFERENCE), raiseload=True
+    )
 
-    owner_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
-    owner = relationship("Organization", back_populates="goals", lazy="selectin")
+    owner_id = Column(
+        Integer, ForeignKey("organizations.id"), index=True, nullable=False
+    )
+    owner = relationship("Organization", back_populates="goals", lazy="raise")
 
-    codes = relationship("Code", back_populates="goal", lazy="selectin")
+    codes = relationship("Code", back_populates="goal", lazy="raise")
     stories = relationship(
-        "Story", back_populates="goal", lazy="selectin", cascade="all, delete-orphan"
+        "Story", back_populates="goal", lazy="raise", cascade="all, delete-orphan"
     )
 
     def __str__(self):
@@ -73,16 +79,25 @@ class Goal(Base):
         return db_goal
 
     @classmethod
-    async def get_by_id(cls, session: AsyncSession, goal_id: int) -> "Goal":
-        goal_result = await session.execute(select(cls).filter(cls.id == goal_id))
+    async def get_by_id(
+        cls, session: AsyncSession, goal_id: int, options: Sequence = ()
+    ) -> "Goal":
+        goal_result = await session.execute(
+            select(cls).filter(cls.id == goal_id).options(*options)
+        )
 
         return goal_result.scalars().one()
 
     @classmethod
-    async def get_all(cls, session: AsyncSession) -> list["Goal"]:
-        all_goals_result = await session.execute(select(cls))
+    async def get_all_rows(
+        cls, session: AsyncSession, columns: Sequence, page: PageParams
+    ) -> Page:
+        """Get only the columns of a page of goals, without building entities."""
+        all_goals_result = await session.execute(
+            paginate(select(*columns), keys=[cls.id], page=page)
+        )
 
-        return all_goals_result.scalars().all()
+        return get_page(all_goals_result.all(), keys=[cls.id], page=page)
 
     @classmethod
     async def get_all_by_owner(
@@ -100,14 +115,17 @@ class Goal(Base):
         goal: GoalCreateSchema,
     ) -> "Goal":
         for key, value in goal.model_dump().items():
+            # The cover is kept unless a new one is uploaded
+            if key == "content" and value is None:
+                continue
+
             if key != "owner_id":
                 setattr(self, key, value)
 
-        await session.commit()
-        await session.refresh(self)
+        await save(session)
 
         return self
 
     async def delete(self, session: AsyncSession) -> None:
         await session.delete(self)
-        await session.commit()
+        await save(session)
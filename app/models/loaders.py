@@ -0,0 +1,52 @@
+"""
+Loader option profiles for queries.
+
+Relationships aren't loaded unless asked for and heavy columns (media references,
+password hashes) are deferred, both raise when accessed without being loaded.
+So a query opts in with the profile matching what its result is used for.
+"""
+
+from sqlalchemy.orm import selectinload, undefer
+
+# All mapped classes have to be imported before the options configure the mappers
+from app.models.code import Code  # noqa: F401
+from app.models.discount import Discount  # noqa: F401
+from app.models.goal import Goal
+from app.models.organization import Organization, Place
+from app.models.story import Story
+from app.models.user import User
+
+
+USER_CREDENTIALS = (undefer(User.hashed_password),)
+
+USER_PROFILE = (
+    undefer(User.photo),
+    selectinload(User.stories).undefer(Story.content),
+)
+
+GOAL_CONTENT = (undefer(Goal.content),)
+
+STORY_CONTENT = (undefer(Story.content),)
+
+# Organization of the story is needed to reward its author
+STORY_ORGANIZATION = (
+    selectinload(Story.organization),
+    selectinload(Story.goal).selectinload(Goal.owner),
+)
+
+# Stories of the goal are deleted together with it
+GOAL_STORIES = (selectinload(Goal.stories),)
+
+ORGANIZATION_PROFILE = (
+    undefer(Organization.photo),
+    selectinload(Organization.goals).undefer(Goal.content),
+    selectinload(Organization.stories).undefer(Story.content),
+)
+
+PLACE_DETAIL = (
+    selectinload(Place.organization).options(
+        undefer(Organization.photo),
+        selectinload(Organization.goals).undefer(Goal.content),
+        selectinload(Organization.stories).undefer(Story.content),
+    ),
+)
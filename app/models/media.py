@@ -0,0 +1,296 @@
+from collections import Counter
+from datetime import datetime
+from functools import cache
+from typing import List
+
+from sqlalchemy import event, inspect, select, update, delete, case, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime
+
+from app.database_initializer import Base
+from app.utils.db import dialect_insert
+
+# Info of columns which hold media references, they are tracked in Media.ref_count
+MEDIA_REFERENCE = {"media": True}
+
+_REF_DELTAS_KEY = "media_ref_deltas"
+
+
+class Media(Base):
+    """
+    Metadata of a blob in the media store. Rows of other tables reference media
+    by a small JSON object ``{"hash": ..., "size": ..., "mime": ...}``.
+
+    The same content is stored once, ``ref_count`` is the number of references
+    to it and is maintained on flush. Media without references since
+    ``unreferenced_at`` is removed by the garbage collection.
+    """
+
+    __tablename__ = "media"
+
+    hash = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    mime = Column(String(255), nullable=False)
+
+    ref_count = Column(Integer, nullable=False, default=0, server_default="0")
+    unreferenced_at = Column(DateTime, nullable=True, index=True)
+
+    created_at = Column(DateTime, nullable=False)
+
+    def __str__(self):
+        return f"Media #{self.hash}"
+
+    def as_reference(self) -> dict:
+        return {"hash": self.hash, "size": self.size, "mime": self.mime}
+
+    @classmethod
+    async def register(
+        cls, session: AsyncSession, blob_hash: str, size: int, mime: str
+    ) -> "Media":
+        """
+        Insert media metadata unless the blob is already known. Unreferenced media
+        gets its grace period restarted, so it isn't collected before the upload
+        which is being saved references it.
+        """
+        now = datetime.now()
+
+        insert_stmt = dialect_insert(session, cls).values(
+            hash=blob_hash,
+            size=size,
+            mime=mime,
+            ref_count=0,
+            unreferenced_at=now,
+            created_at=now,
+        )
+        await session.execute(
+            insert_stmt.on_conflict_do_update(
+                index_elements=[cls.hash],
+                set_={"unreferenced_at": case((cls.ref_count > 0, None), else_=now)},
+            )
+        )
+
+        return cls(hash=blob_hash, size=size, mime=mime)
+
+    @classmethod
+    async def get_by_hash(cls, session: AsyncSession, blob_hash: str) -> "Media":
+        media_result = await session.execute(select(cls).filter(cls.hash == blob_hash))
+
+        return media_result.scalars().one()
+
+    @classmethod
+    async def get_unreferenced(
+        cls, session: AsyncSession, before: datetime, limit: int | None = None
+    ) -> List[str]:
+        """Hashes of media which has no references since before the time."""
+        hashes_result = await session.execute(
+            select(cls.hash)
+            .filter(cls.ref_count <= 0, cls.unreferenced_at < before)
+            .limit(limit)
+        )
+
+        return hashes_result.scalars().all()
+
+    @classmethod
+    async def get_known_hashes(
+        cls, session: AsyncSession, hashes: List[str]
+    ) -> set[str]:
+        hashes_result = await session.execute(
+            select(cls.hash).filter(cls.hash.in_(hashes))
+        )
+
+        return set(hashes_result.scalars().all())
+
+    @classmethod
+    async def delete_unreferenced(
+        cls, session: AsyncSession, hashes: List[str], before: datetime
+    ) -> List[str]:
+        """
+        Delete media which still has no references since before the time and return
+        hashes of the deleted rows. Media referenced again in the meantime is kept.
+        """
+        deleted_result = await session.execute(
+            delete(cls)
+            .where(
+                cls.hash.in_(hashes), cls.ref_count <= 0, cls.unreferenced_at < before
+            )
+            .returning(cls.hash)
+        )
+        deleted = deleted_result.scalars().all()
+
+        await session.commit()
+
+        return deleted
+
+    @classmethod
+    async def recount_references(cls, session: AsyncSession, batch_size: int) -> int:
+        """
+        Recalculate reference counts from the referencing rows, e.g. after they were
+        changed bypassing the ORM. Returns the number of corrected media.
+        """
+        counts = Counter()
+
+        for model in get_media_models():
+            mapper = inspect(model)
+            columns = [mapper.columns[key] for key in get_media_attribute_names(model)]
+
+            rows = await session.stream(
+                select(*columns).execution_options(yield_per=batch_size)
+            )
+            async for row in rows:
+                for value in row:
+                    counts.update(get_media_hashes(value))
+
+        media_result = await session.execute(select(cls.hash, cls.ref_count))
+
+        hashes_by_count = {}
+        for blob_hash, ref_count in media_result:
+            if counts[blob_hash] != ref_count:
+                hashes_by_count.setdefault(counts[blob_hash], []).append(blob_hash)
+
+        now = datetime.now()
+        for count, hashes in hashes_by_count.items():
+            for i in range(0, len(hashes), batch_size):
+                await session.execute(
+                    update(cls)
+                    .where(cls.hash.in_(hashes[i : i + batch_size]))
+                    .values(
+                        ref_count=count,
+                        unreferenced_at=(
+                            None if count > 0 else func.coalesce(cls.unreferenced_at, now)
+                        ),
+                    )
+                )
+
+        await session.commit()
+
+        return sum(len(hashes) for hashes in hashes_by_count.values())
+
+
+def get_media_hashes(value) -> list[str]:
+    """Hashes of the media referenced by a column value: a reference or a list of them."""
+    if isinstance(value, dict):
+        value = [value]
+
+    if not isinstance(value, list):
+        return []
+
+    return [
+        ref["hash"]
+        for ref in value
+        if isinstance(ref, dict) and isinstance(ref.get("hash"), str)
+    ]
+
+
+@cache
+def get_media_attribute_names(model) -> tuple[str, ...]:
+    return tuple(
+        attr.key
+        for attr in inspect(model).column_attrs
+        if any(column.info.get("media") for column in attr.columns)
+    )
+
+
+def get_media_models() -> list:
+    return [
+        mapper.class_
+        for mapper in Base.registry.mappers
+        if get_media_attribute_names(mapper.class_)
+    ]
+
+
+def _get_stored_hashes(session: Session, model, keys: tuple[str, ...], ids: list):
+    """Hashes referenced by the rows as they are stored, before the flush."""
+    mapper = inspect(model)
+    columns = [mapper.columns[key] for key in keys]
+
+    rows = session.connection().execute(
+        select(*columns).where(mapper.primary_key[0].in_(ids))
+    )
+
+    return [
+        blob_hash
+        for row in rows
+        for value in row
+        for blob_hash in get_media_hashes(value)
+    ]
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_media_reference_changes(session: Session, flush_context, instances):
+    deltas = Counter()
+    # Old values of deferred columns are usually not loaded, so they are read
+    # from the rows, grouped to a query per model and set of columns
+    replaced = {}
+
+    for instance in session.new:
+        state = inspect(instance)
+
+        for key in get_media_attribute_names(type(instance)):
+            deltas.update(get_media_hashes(state.dict.get(key)))
+
+    for instance in session.dirty:
+        state = inspect(instance)
+        changed = tuple(
+            key
+            for key in get_media_attribute_names(type(instance))
+            if state.attrs[key].history.has_changes()
+        )
+
+        for key in changed:
+            deltas.update(get_media_hashes(state.dict.get(key)))
+
+        if changed:
+            replaced.setdefault((type(instance), changed), []).append(state.identity[0])
+
+    for instance in session.deleted:
+        state = inspect(instance)
+
+        if keys := get_media_attribute_names(type(instance)):
+            replaced.setdefault((type(instance), keys), []).append(state.identity[0])
+
+    for (model, keys), ids in replaced.items():
+        deltas.subtract(_get_stored_hashes(session, model, keys, ids))
+
+    if any(deltas.values()):
+        session.info.setdefault(_REF_DELTAS_KEY, Counter()).update(deltas)
+
+
+def get_ref_count_updates(deltas: Counter) -> list:
+    """Statements applying changes of reference counts, one per distinct change."""
+    now = datetime.now()
+
+    hashes_by_delta = {}
+    for blob_hash, delta in deltas.items():
+        if delta:
+            hashes_by_delta.setdefault(delta, []).append(blob_hash)
+
+    return [
+        update(Media)
+        .where(Media.hash.in_(hashes))
+        .values(
+            ref_count=Media.ref_count + delta,
+            unreferenced_at=case(
+                (Media.ref_count + delta > 0, None),
+                (Media.unreferenced_at.is_(None), now),
+                else_=Media.unreferenced_at,
+            ),
+        )
+        for delta, hashes in hashes_by_delta.items()
+    ]
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_media_reference_changes(session: Session, flush_context):
+    deltas = session.info.pop(_REF_DELTAS_KEY, None)
+
+    if not deltas:
+        return
+
+    for statement in get_ref_count_updates(deltas):
+        session.connection().execute(statement)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_media_reference_changes(session: Session, previous_transaction):
+    session.info.pop(_REF_DELTAS_KEY, None)
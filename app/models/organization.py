@@ -1,11 +1,10 @@
-from typing import Any
+from typing import Any, Sequence
 
-from sqlalchemy import select
+from sqlalchemy import Row, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import NoResultFound
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy import (
-    LargeBinary,
     Column,
     String,
     Integer,
@@ -13,24 +12,30 @@ from sqlalchemy import (
     Float,
     Enum,
     ForeignKey,
+    JSON,
+    Index,
 )
 
 from app.models.user import Role, User
 from app.schemas.organization import OrganizationCreateSchema
 from app.schemas.user import UserCreateSchema
-from app.utils.db import create_model_instance
+from app.utils.db import create_model_instance, save, unit_of_work
+from app.utils.pagination import Page, PageParams, get_page, paginate
 from app.database_initializer import Base
+from app.models.media import MEDIA_REFERENCE
 from app.types.enums import OrganizationType
 
 
 class Organization(Base):
     __tablename__ = "organizations"
 
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
 
     name = Column(String(255), nullable=False)
     description = Column(String(2550), nullable=True)
-    photo = Column(LargeBinary, nullable=True)
+    photo = deferred(
+        Column(JSON, nullable=True, info=MEDIA_REFERENCE), raiseload=True
+    )
 
     inn_or_ogrn = Column(String(255), nullable=False)
     legal_address = Column(String(255), nullable=False)
@@ -48,19 +53,19 @@ class Organization(Base):
     step_amount = Column(Integer, nullable=True)
     days_to_step_back = Column(Integer, nullable=True)
 
-    goals = relationship("Goal", back_populates="owner", lazy="selectin")
-    places = relationship("Place", back_populates="organization", lazy="selectin")
-    stories = relationship("Story", back_populates="organization", lazy="selectin")
-    users = relationship("User", back_populates="organization", lazy="selectin")
-    codes = relationship("Code", back_populates="organization", lazy="selectin")
-    discounts = relationship("Discount", back_populates="organization", lazy="selectin")
+    goals = relationship("Goal", back_populates="owner", lazy="raise")
+    places = relationship("Place", back_populates="organization", lazy="raise")
+    stories = relationship("Story", back_populates="organization", lazy="raise")
+    users = relationship("User", back_populates="organization", lazy="raise")
+    codes = relationship("Code", back_populates="organization", lazy="raise")
+    discounts = relationship("Discount", back_populates="organization", lazy="raise")
 
     @classmethod
     async def create(
         cls,
         session: AsyncSession,
         organization_schema: OrganizationCreateSchema,
-        photo: bytes,
+        photo: dict | None,
     ) -> "Organization":
         user_data = organization_schema.model_dump()
 
@@ -69,33 +74,36 @@ class Organization(Base):
         organization = organization_schema.model_dump()
         organization.pop("password")
 
-        db_org = await create_model_instance(
-            session=session, model=cls, **organization, photo=photo
-        )
-
-        user_data["username"] = f"admin{db_org.id}"
-
-        db_user = await User.create(
-            session=session,
-            user_schema=UserCreateSchema.model_validate(user_data),
-            role=Role.org_admin,
-        )
+        async with unit_of_work(session):
+            db_org = await create_model_instance(
+                session=session, model=cls, **organization, photo=photo
+            )
 
-        db_user.organization_id = db_org.id
+            user_data["username"] = f"admin{db_org.id}"
 
-        await session.commit()
-        await session.refresh(db_user)
+            db_user = await User.create(
+                session=session,
+                user_schema=UserCreateSchema.model_validate(user_data),
+                role=Role.org_admin,
+                organization_id=db_org.id,
+            )
 
         return db_org, db_user
 
     async def get_by_id(
         session: AsyncSession,
         organization_id: int | None = None,
+        options: Sequence = (),
     ) -> "Organization":
         if organization_id:
-            db_user_result = await session.execute(
-                select(Organization).filter(Organization.id == organization_id)
-            )
+            query = select(Organization).filter(Organization.id == organization_id)
+
+            if options:
+                query = query.options(*options).execution_options(
+                    populate_existing=True
+                )
+
+            db_user_result = await session.execute(query)
         else:
             return None
 
@@ -111,8 +119,7 @@ class Organization(Base):
                 continue
             setattr(self, key, value)
 
-        await session.commit()
-        await session.refresh(self)
+        await save(session)
 
         return self
 
@@ -120,14 +127,19 @@ class Organization(Base):
 class Place(Base):
     __tablename__ = "places"
 
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
 
     name = Column(String, index=True, nullable=False)
     address = Column(String(255), nullable=False)
 
     organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
     organization = relationship(
-        "Organization", back_populates="places", lazy="selectin"
+        "Organization", back_populates="places", lazy="raise"
+    )
+
+    # Also serves lookups by organization_id alone
+    __table_args__ = (
+        Index("ix_places_organization_id_address", "organization_id", "address"),
     )
 
     @classmethod
@@ -150,55 +162,60 @@ class Place(Base):
         return db_place
 
     @classmethod
-    async def get_all(cls, session: AsyncSession) -> list["Place"]:
+    async def get_all_rows(
+        cls, session: AsyncSession, columns: Sequence, page: PageParams
+    ) -> Page:
+        """Get only the columns of a page of places, without building entities."""
         places_result = await session.execute(
-            select(cls).filter(cls.organization_id.isnot(None))
+            paginate(
+                select(*columns).filter(cls.organization_id.isnot(None)),
+                keys=[cls.id],
+                page=page,
+            )
         )
 
-        return places_result.scalars().all()
+        return get_page(places_result.all(), keys=[cls.id], page=page)
 
     @classmethod
-    async def get_by_id(cls, session: AsyncSession, place_id: int) -> "Place":
-        place_result = await session.execute(
-            select(cls).filter(cls.organization_id.isnot(None) & (cls.id == place_id))
+    async def get_by_id(
+        cls, session: AsyncSession, place_id: int, options: Sequence = ()
+    ) -> "Place":
+        query = select(cls).filter(
+            cls.organization_id.isnot(None) & (cls.id == place_id)
         )
 
+        if options:
+            query = query.options(*options).execution_options(populate_existing=True)
+
+        place_result = await session.execute(query)
+
         try:
             return place_result.scalars().one()
         except NoResultFound:
             return None
 
     @classmethod
-    async def get_by_query(
+    async def get_rows_by_query(
         cls,
         session: AsyncSession,
         search_query: str,
         org_type: str,
         has_goals: bool,
         has_discount: bool,
-    ) -> list["Place"]:
-        to_filter = select(Organization)
+        columns: Sequence,
+    ) -> Sequence[Row]:
+        """Get only the columns of places of organizations matching the query."""
+        to_filter = select(*columns).join(cls.organization)
 
         if org_type:
             to_filter = to_filter.filter(Organization.organization_type == org_type)
         if search_query:
             to_filter = to_filter.filter(Organization.name.ilike(f"%{search_query}%"))
         if has_goals:
-            to_filter = to_filter.filter(Organization.goals.isnot(None))
+            to_filter = to_filter.filter(Organization.goals.any())
         if has_discount:
             to_filter = to_filter.filter(Organization.common_discount.isnot(None))
 
-        orgs_result = await session.execute(to_filter)
-
-        orgs = orgs_result.scalars().all()
-
-        if orgs:
-            orgs_ids = set(org.id for org in orgs)
-
-            places_result = await session.execute(
-                select(cls).filter(cls.organization_id.in_(orgs_ids))
-            )
-
-            return places_result.scalars().all()
+        places_result = await session.execute(to_filter)
 
-        return []
+        return places_result.all()
@@ -1,8 +1,8 @@
 from datetime import datetime
-from typing import List
+from typing import List, Sequence
 
-from sqlalchemy.orm import relationship
-from sqlalchemy import select, and_
+from sqlalchemy.orm import relationship, deferred, undefer
+from sqlalchemy import select, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import (
     Column,
@@ -15,22 +15,31 @@ from sqlalchemy import (
     JSON,
     SmallInteger,
     DateTime,
+    Index,
 )
 
-from app.utils.db import create_model_instance
-from app.schemas.story import StoryCreateSchema, StoryChangeSchema, StorySchema
+from app.utils.db import create_model_instance, save
+from app.utils.pagination import Page, PageParams, get_page, paginate
+from app.schemas.story import (
+    StoryCreateSchema,
+    StoryChangeSchema,
+    SummaryStorySchema,
+)
 from app.models.goal import Goal
 from app.database_initializer import Base
+from app.models.media import MEDIA_REFERENCE
 from app.types.enums import ModerationState
 
 
 class Story(Base):
     __tablename__ = "stories"
 
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
 
-    description = Column(String(2550), index=True, nullable=True)
-    content = Column(JSON, index=True, nullable=True)
+    description = Column(String(2550), nullable=True)
+    content = deferred(
+        Column(JSON, nullable=True, info=MEDIA_REFERENCE), raiseload=True
+    )
 
     created_at = Column(DateTime, index=True)
 
@@ -39,19 +48,32 @@ class Story(Base):
 
     position = Column(SmallInteger, default=0, nullable=False)
 
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    owner = relationship("User", back_populates="stories", lazy="selectin")
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    owner = relationship("User", back_populates="stories", lazy="raise")
 
     goal_id = Column(Integer, ForeignKey("goals.id"), nullable=True)
-    goal = relationship("Goal", back_populates="stories", lazy="selectin")
+    goal = relationship("Goal", back_populates="stories", lazy="raise")
 
     organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=True)
     organization = relationship(
-        "Organization", back_populates="stories", lazy="selectin"
+        "Organization", back_populates="stories", lazy="raise"
     )
 
     PrimaryKeyConstraint("id", name="pk_story_id")
 
+    __table_args__ = (
+        # Favorite stories of an organization and of its goals
+        Index("ix_stories_organization_id_position", "organization_id", "position"),
+        Index("ix_stories_goal_id_position", "goal_id", "position"),
+        # Allowed stories of an organization and of its goals
+        Index(
+            "ix_stories_organization_id_moderation_state",
+            "organization_id",
+            "moderation_state",
+        ),
+        Index("ix_stories_goal_id_moderation_state", "goal_id", "moderation_state"),
+    )
+
     def __str__(self):
         return f"Story #{self.id}"
 
@@ -60,7 +82,7 @@ class Story(Base):
         cls,
         session: AsyncSession,
         story: StoryCreateSchema,
-        content: List[bytes],
+        content: List[dict],
         owner_id: int,
     ) -> "Story":
         db_story = await create_model_instance(
@@ -76,104 +98,151 @@ class Story(Base):
 
     @classmethod
     async def get_by_id(
-        cls, session: AsyncSession, story_id: int, private: bool = False
+        cls,
+        session: AsyncSession,
+        story_id: int,
+        private: bool = False,
+        options: Sequence = (),
     ) -> "Story":
         story_result = await session.execute(
-            select(cls).filter(
+            select(cls)
+            .filter(
                 and_(
                     cls.id == story_id, cls.moderation_state == ModerationState.allowed
                 )
                 if not private
                 else cls.id == story_id
             )
+            .options(*options)
         )
         return story_result.scalars().one()
 
     @classmethod
-    async def get_all(cls, session: AsyncSession, moderation_state) -> List["Story"]:
+    async def get_all(
+        cls,
+        session: AsyncSession,
+        moderation_state,
+        page: PageParams,
+        options: Sequence = (),
+    ) -> Page:
         stories_of_user_result = await session.execute(
-            select(cls).filter(cls.moderation_state == moderation_state)
+            paginate(
+                select(cls)
+                .filter(cls.moderation_state == moderation_state)
+                .options(*options),
+                keys=[cls.id],
+                page=page,
+            )
         )
 
-        return stories_of_user_result.scalars().all()
+        return get_page(stories_of_user_result.scalars().all(), keys=[cls.id], page=page)
 
     @classmethod
-    async def get_all_by_owner(
-        cls, session: AsyncSession, owner_id: int
-    ) -> List["Story"]:
+    async def get_all_rows_by_owner(
+        cls, session: AsyncSession, owner_id: int, columns: Sequence, page: PageParams
+    ) -> Page:
+        """Get only the columns of a page of the user's stories, without building entities."""
         stories_of_user_result = await session.execute(
-            select(cls).filter(cls.owner_id == owner_id)
+            paginate(
+                select(*columns).filter(cls.owner_id == owner_id),
+                keys=[cls.id],
+                page=page,
+            )
         )
 
-        return stories_of_user_result.scalars().all()
+        return get_page(stories_of_user_result.all(), keys=[cls.id], page=page)
 
     @classmethod
     async def get_all_by_organization(
-        cls, session: AsyncSession, organization_id: int
-    ) -> List["Story"]:
+        cls,
+        session: AsyncSession,
+        organization_id: int,
+        page: PageParams,
+        options: Sequence = (),
+    ) -> Page:
+        """
+        Allowed stories attached to the organization directly or through its goals.
+        Goals are joined as a semi-join, like in get_favorite, so each branch is
+        served by an index on stories.
+        """
+        organization_goals = select(Goal.id).filter(Goal.owner_id == organization_id)
+
         stories_of_organization_result = await session.execute(
-            select(cls).filter(
-                and_(
-                    Goal.owner_id == organization_id,
+            paginate(
+                select(cls)
+                .filter(
                     cls.moderation_state == ModerationState.allowed,
+                    or_(
+                        cls.organization_id == organization_id,
+                        cls.goal_id.in_(organization_goals),
+                    ),
                 )
+                .options(*options),
+                keys=[cls.id],
+                page=page,
             )
         )
 
-        return stories_of_organization_result.scalars().all()
-
-    @staticmethod
-    async def get_favorite(session: AsyncSession, organization_id: int) -> dict:
-        from app.models.goal import Goal
-
-        # Stories for this organization
-        stories_by_organization_result = await session.execute(
-            select(Story).filter(Story.organization_id == organization_id)
+        return get_page(
+            stories_of_organization_result.scalars().all(), keys=[cls.id], page=page
         )
-        stories = stories_by_organization_result.scalars().all()
 
-        # Goals in this organization
-        goals_by_organization_result = await session.execute(
-            select(Goal).filter(Goal.owner_id == organization_id)
+    @classmethod
+    async def get_favorite(cls, session: AsyncSession, organization_id: int) -> dict:
+        """
+        Stories placed in the showcase of the organization, both its own and the ones
+        about its goals. Goals are joined as a semi-join, so each branch of the filter
+        is served by an index on stories and only the placed stories are read.
+        """
+        organization_goals = select(Goal.id).filter(Goal.owner_id == organization_id)
+
+        favorite_stories_result = await session.execute(
+            select(cls)
+            .filter(
+                cls.position > 0,
+                or_(
+                    cls.organization_id == organization_id,
+                    cls.goal_id.in_(organization_goals),
+                ),
+            )
+            .order_by(cls.position, cls.id)
+            .options(undefer(cls.content))
         )
-        goals_by_organization = goals_by_organization_result.scalars().all()
 
-        # Stories for goals in this organization
-        all_stories_result = await session.execute(select(Story).filter(Story.goal_id))
-        all_stories = all_stories_result.scalars().all()
+        return {
+            int(story.position): SummaryStorySchema.model_validate(story)
+            for story in favorite_stories_result.scalars().all()
+        }
 
-        stories_by_goal = [
-            story for story in all_stories if story.goal in goals_by_organization
-        ]
+    async def get_showcase_organization_ids(self, session: AsyncSession) -> set[int]:
+        """Organizations whose favorite stories may show the story."""
+        organization_ids = {self.organization_id}
 
-        stories += stories_by_goal
+        if self.goal_id:
+            organization_ids.add(
+                await session.scalar(select(Goal.owner_id).filter(Goal.id == self.goal_id))
+            )
 
-        return {
-            int(story.position): StorySchema.model_validate(story)
-            for story in stories
-            if story.position
-        }
+        return organization_ids - {None}
 
     async def change_position(self, session: AsyncSession, position: int) -> "Story":
         """Change the position of the story in the favorite list."""
         self.position = position
 
-        await session.commit()
-        await session.refresh(self)
+        await save(session)
 
         return self
 
     async def delete(self, session: AsyncSession) -> None:
         await session.delete(self)
-        await session.commit()
+        await save(session)
 
     async def change_moderation_state(
         self, session: AsyncSession, moderation_state: ModerationState
     ) -> "Story":
         self.moderation_state = moderation_state
 
-        await session.commit()
-        await session.refresh(self)
+        await save(session)
 
         return self
 
@@ -181,7 +250,7 @@ class Story(Base):
         self,
         session: AsyncSession,
         story: StoryChangeSchema,
-        content: List[bytes],
+        content: List[dict],
     ) -> "Story":
         if not isinstance(story, dict):
             story = story.model_dump()
@@ -195,7 +264,6 @@ class Story(Base):
         if content and any(content):
             self.content = content
 
-        await session.commit()
-        await session.refresh(self)
+        await save(session)
 
         return self
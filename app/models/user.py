@@ -1,11 +1,9 @@
-import random
-
-from typing import Any
+from typing import Any, AsyncIterator, Sequence
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import NoResultFound
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy import (
     LargeBinary,
     Column,
@@ -15,47 +13,63 @@ from sqlalchemy import (
     Date,
     Enum,
     ForeignKey,
+    JSON,
     UniqueConstraint,
     PrimaryKeyConstraint,
 )
 
 from app.services.auth.password import hash_password
+from app.services.availability import add_taken_logins
 from app.schemas.user import UserCreateSchema
-from app.utils.db import create_model_instance
+from app.utils.db import create_model_instance, save
+from app.utils.principal import (
+    Principal,
+    invalidate_principal,
+    publish_account_version,
+)
 from app.database_initializer import Base
+from app.models.media import MEDIA_REFERENCE
 from app.types.enums import Gender, Role
 
 import settings
 
 
+# Columns which access tokens carry
+ACCOUNT_STATE_FIELDS = ("role", "organization_id")
+
+
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
 
     first_name = Column(String(255), index=True, nullable=True)
     username = Column(String(255), index=True, unique=True, nullable=True)
 
-    description = Column(String(2550), index=True, nullable=True)
+    description = Column(String(2550), nullable=True)
     birth_date = Column(Date, index=True, nullable=True)
     gender = Column(Enum(Gender), nullable=True)
-    photo = Column(LargeBinary, index=True, nullable=True)
+    photo = deferred(
+        Column(JSON, nullable=True, info=MEDIA_REFERENCE), raiseload=True
+    )
 
     email = Column(String(255), index=True, unique=True, nullable=True)
     is_email_confirmed = Column(Boolean, default=False)
 
-    last_code = Column(String(5), default="")
-
-    hashed_password = Column(LargeBinary, index=True, nullable=False)
+    hashed_password = deferred(
+        Column(LargeBinary, nullable=False), raiseload=True
+    )
 
     role = Column(Enum(Role), nullable=False)
+    # Raised when the role or the organization changes, see app.utils.principal
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=True)
-    organization = relationship("Organization", back_populates="users", lazy="selectin")
+    organization = relationship("Organization", back_populates="users", lazy="raise")
 
-    stories = relationship("Story", back_populates="owner", lazy="selectin")
-    codes = relationship("Code", back_populates="owner", lazy="selectin")
-    discounts = relationship("Discount", back_populates="user", lazy="selectin")
+    stories = relationship("Story", back_populates="owner", lazy="raise")
+    codes = relationship("Code", back_populates="owner", lazy="raise")
+    discounts = relationship("Discount", back_populates="user", lazy="raise")
 
     UniqueConstraint("email", name="uq_user_email")
     PrimaryKeyConstraint("id", name="pk_user_id")
@@ -72,6 +86,7 @@ class User(Base):
         session: AsyncSession,
         user_schema: UserCreateSchema,
         role: str,
+        organization_id: int | None = None,
     ) -> "User":
         """Create a new user in the database."""
         if not isinstance(user_schema, dict):
@@ -80,13 +95,15 @@ class User(Base):
             user_data = user_schema
 
         user_data["role"] = role
+        user_data["organization_id"] = organization_id
 
         if settings.DEBUG:
             user_data["is_email_confirmed"] = True
 
-        user_data["hashed_password"] = hash_password(user_data.pop("password"))
+        user_data["hashed_password"] = await hash_password(user_data.pop("password"))
 
         user = await create_model_instance(session, model=cls, **user_data)
+        await add_taken_logins(user.username, user.email)
 
         return user
 
@@ -96,10 +113,17 @@ class User(Base):
         session: AsyncSession,
         user_id: int | None = None,
         login: str | None = None,
+        options: Sequence = (),
     ) -> "User":
-        """Get user by id or login (username or email)."""
+        """
+        Get user by id or login (username or email).
+        Loader options are applied even if the user is already in the session.
+        """
         query = select(cls)
 
+        if options:
+            query = query.options(*options).execution_options(populate_existing=True)
+
         if user_id is not None:
             query = query.filter(cls.id == user_id)
         elif login is not None:
@@ -110,30 +134,79 @@ class User(Base):
         except NoResultFound:
             return None
 
-    async def set_last_code(self, session: AsyncSession) -> str:
-        code = "".join([str(random.randint(0, 9)) for _ in range(6)])
-        setattr(self, "last_code", code)
+    @classmethod
+    async def is_login_taken(cls, session: AsyncSession, login: str) -> bool:
+        """Whether a user has the login as username or email, without loading them."""
+        query = select(cls.id).filter((cls.username == login) | (cls.email == login))
 
-        await session.commit()
+        return (await session.execute(query.limit(1))).first() is not None
 
-        return code
+    @classmethod
+    async def iterate_logins(cls, session: AsyncSession) -> AsyncIterator[str]:
+        """Usernames and emails of all users, read in batches."""
+        result = await session.stream(
+            select(cls.username, cls.email).execution_options(yield_per=10000)
+        )
+
+        async for username, email in result:
+            for login in (username, email):
+                if login:
+                    yield login
+
+    @classmethod
+    async def get_principal(
+        cls, session: AsyncSession, user_id: int
+    ) -> Principal | None:
+        """Get only the columns authorization needs."""
+        query = select(
+            cls.id,
+            cls.role,
+            cls.organization_id,
+            cls.is_email_confirmed,
+            cls.token_version,
+        ).filter(cls.id == user_id)
+
+        if row := (await session.execute(query)).one_or_none():
+            return Principal.from_user(row)
+
+        return None
 
     async def delete(self, session: AsyncSession) -> None:
         """Delete a user from the database."""
         await session.delete(self)
-        await session.commit()
+        # Flushed right away, otherwise a new user with the same email would be
+        # inserted before the deletion in the same unit of work
+        await save(session, flush=True)
+        await invalidate_principal(self.id)
+        # Access tokens of the user are rejected from now on
+        await publish_account_version(self.id, (self.token_version or 0) + 1)
 
     async def update(self, session: AsyncSession, updates: dict[str, Any]) -> "User":
-        """Update a user in the database."""
+        """
+        Update a user in the database. A change of the role or the organization
+        raises the token version, which rejects access tokens issued before.
+        """
+        is_account_changed = False
+
         for key, value in updates.items():
             if value is None:
                 continue
             if key == "password":
                 key = "hashed_password"
-                value = hash_password(value)
+                value = await hash_password(value)
+            if key in ACCOUNT_STATE_FIELDS and getattr(self, key) != value:
+                is_account_changed = True
             setattr(self, key, value)
 
-        await session.commit()
-        await session.refresh(self)
+        if is_account_changed:
+            self.token_version = (self.token_version or 0) + 1
+
+        await add_taken_logins(updates.get("username"), updates.get("email"))
+
+        await save(session)
+        await invalidate_principal(self.id)
+
+        if is_account_changed:
+            await publish_account_version(self.id, self.token_version)
 
         return self
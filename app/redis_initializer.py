@@ -1,9 +1,19 @@
+import logging
+import time
+
 from redis import asyncio as aioredis
+from redis.commands.core import AsyncScript
 from fastapi import HTTPException
 
-from settings import REDIS_HOST
+from settings import REDIS_HOST, REDIS_RETRY_INTERVAL
+
+logger = logging.getLogger(__name__)
 
 redis = None
+# Redis isn't used by optional features until then after it failed (monotonic time)
+unavailable_until = 0.0
+# Lua scripts by their source, with the client they were registered with
+scripts: dict[str, AsyncScript] = {}
 
 
 async def get_redis(decode_responses=True) -> aioredis.Redis:
@@ -21,3 +31,38 @@ async def get_redis(decode_responses=True) -> aioredis.Redis:
             )
 
     return redis
+
+
+async def get_optional_redis() -> aioredis.Redis | None:
+    """
+    Redis for features which fall back to something else without it, e.g. caches.
+    None for REDIS_RETRY_INTERVAL after report_redis_error, so requests don't wait
+    for a Redis which is down.
+    """
+    if time.monotonic() < unavailable_until:
+        return None
+
+    return await get_redis()
+
+
+def report_redis_error(error: Exception) -> None:
+    global unavailable_until
+
+    logger.warning(
+        "Redis is unavailable, retrying in %d s: %s", REDIS_RETRY_INTERVAL, error
+    )
+    unavailable_until = time.monotonic() + REDIS_RETRY_INTERVAL
+
+
+def get_script(client: aioredis.Redis, source: str) -> AsyncScript:
+    """
+    The Lua script registered with the client once, rather than on every call which
+    hashes the source again. Redis loads it on the first call by its SHA.
+    """
+    script = scripts.get(source)
+
+    if script is None or script.registered_client is not client:
+        script = scripts[source] = client.register_script(source)
+
+    return script
+
@@ -1,6 +1,16 @@
 from fastapi import APIRouter
 
-from app.routers import user, goal, auth, organization, barcode, search, story
+from app.routers import (
+    user,
+    goal,
+    auth,
+    organization,
+    barcode,
+    search,
+    story,
+    media,
+    metrics,
+)
 
 root_router = APIRouter(prefix="/api")
 
@@ -17,3 +27,5 @@ root_router.include_router(search.router, prefix="/search", tags=["Search"])
 root_router.include_router(
     barcode.router, prefix="/barcode", tags=["Barcode generator"]
 )
+root_router.include_router(media.router, prefix="/media", tags=["Media"])
+root_router.include_router(metrics.router, prefix="/metrics", tags=["Metrics"])
@@ -1,14 +1,22 @@
 from typing import Dict
-from base64 import b64encode
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    status,
+    UploadFile,
+    File,
+    Form,
+)
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database_initializer import get_db
+from app.database_initializer import get_db, get_read_db
 
 from app.services.auth.email import send_email
 from app.services.auth.jwt import (
@@ -17,12 +25,23 @@ from app.services.auth.jwt import (
     decode_token,
 )
 from app.services.auth.password import validate_password
+from app.services.availability import is_login_possibly_taken
 
 from app.models.user import User, Role
-from app.utils.redis import save_token_on_user_logout, check_token_status
+from app.models import loaders
+from app.utils.revoked_tokens import is_token_revoked, revoke_token
 from app.schemas.user import UserSchema, UserCreateSchema, UserLoginSchema
 
-from app.utils.auth import get_current_user
+from app.utils.auth import get_current_principal, raise_user_not_found
+from app.utils.principal import Principal
+from app.utils.db import unit_of_work
+from app.utils.email_codes import check_email_code, issue_email_code
+from app.utils.rate_limit import (
+    EMAIL_CODE_RATE_LIMIT,
+    EMAIL_VERIFICATION_RATE_LIMIT,
+    LOGIN_RATE_LIMIT,
+)
+from app.utils.media import save_upload
 
 
 router = APIRouter()
@@ -36,30 +55,31 @@ router = APIRouter()
     description="Create new user in database",
 )
 async def signup(
+    background_tasks: BackgroundTasks,
     user: UserCreateSchema = Form(),
     session: AsyncSession = Depends(get_db),
 ):
     try:
-        if user.photo:
-            content = await user.photo.read()
-            user.photo = b64encode(content)
-
-        if old_user := await User.get_by_id_or_login(session=session, login=user.email):
-            if old_user.is_email_confirmed:
-                raise ValueError
-            else:
-                await old_user.delete(session=session)
-
-        user = await User.create(
-            session=session,
-            user_schema=user,
-            role=Role.consumer,
-        )
+        async with unit_of_work(session):
+            if old_user := await User.get_by_id_or_login(
+                session=session, login=user.email
+            ):
+                if old_user.is_email_confirmed:
+                    raise ValueError
+                else:
+                    await old_user.delete(session=session)
+
+            if user.photo:
+                user.photo = await save_upload(session, user.photo, background_tasks)
+
+            user = await User.create(
+                session=session,
+                user_schema=user,
+                role=Role.consumer,
+            )
 
         return UserSchema.model_validate(user)
     except ValueError:
-        await session.rollback()
-        await session.flush()
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Error while creating user. Perhaps, user already exists",
@@ -71,6 +91,7 @@ async def signup(
     response_model=dict,
     status_code=status.HTTP_200_OK,
     summary="Send email activation code",
+    dependencies=[Depends(EMAIL_CODE_RATE_LIMIT)],
     description="Send activation code to the email.",
 )
 async def email_get_code(email: str, session: AsyncSession = Depends(get_db)):
@@ -82,7 +103,9 @@ async def email_get_code(email: str, session: AsyncSession = Depends(get_db)):
             detail="User doesn't exist",
         )
 
-    code = await user.set_last_code(session=session)
+    # The code is kept in Redis, the connection isn't needed while the email is sent
+    await session.close()
+    code = await issue_email_code(email)
 
     text = f"""<h1>Ваш код подтверждения на <b>Goals</b></h1>
     {code}
@@ -105,6 +128,7 @@ async def email_get_code(email: str, session: AsyncSession = Depends(get_db)):
     response_model=dict,
     status_code=status.HTTP_200_OK,
     summary="Check email activation code.",
+    dependencies=[Depends(EMAIL_VERIFICATION_RATE_LIMIT)],
     description="Check email activation code.",
 )
 async def email_post_code(
@@ -118,9 +142,8 @@ async def email_post_code(
             detail="User doesn't exist",
         )
 
-    if user.last_code == code and code != "":
-        user.is_email_confirmed = True
-        await session.commit()
+    if await check_email_code(email, code):
+        await user.update(session=session, updates={"is_email_confirmed": True})
 
         return {"detail": "Email is activated"}
 
@@ -142,6 +165,7 @@ class RefreshedAccessTokenSchema(BaseModel):
 @router.post(
     "/login",
     response_model=TokenPairSchema,
+    dependencies=[Depends(LOGIN_RATE_LIMIT)],
     status_code=status.HTTP_200_OK,
     summary="Authenticate user",
     description="Authenticate user and obtain JWT pair of access and refresh tokens",
@@ -150,14 +174,19 @@ async def login(
     payload: UserLoginSchema = Form(),
     session: AsyncSession = Depends(get_db),
 ):
-    user = await User.get_by_id_or_login(session=session, login=payload.login)
+    user = await User.get_by_id_or_login(
+        session=session, login=payload.login, options=loaders.USER_CREDENTIALS
+    )
+
+    # The connection isn't needed while the password is checked
+    await session.close()
 
     try:
         assert user
         logging.info("The user exists")
         assert user.is_email_confirmed
         logging.info("Email is confirmed")
-        assert validate_password(user.hashed_password, payload.password)
+        assert await validate_password(user.hashed_password, payload.password)
     except AssertionError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -177,15 +206,13 @@ async def login(
     summary="Check if user exists",
     description="Check if user with specified email or username exists",
 )
-async def exists(login: str, session: AsyncSession = Depends(get_db)):
-    user = await User.get_by_id_or_login(session=session, login=login)
-
-    try:
-        assert user
-        return {"exists": True}
-    except AssertionError:
+async def exists(login: str, session: AsyncSession = Depends(get_read_db)):
+    # Most logins typed into the signup form are answered by the filter alone
+    if not await is_login_possibly_taken(login):
         return {"exists": False}
 
+    return {"exists": await User.is_login_taken(session, login)}
+
 
 @router.post(
     "/refresh",
@@ -205,7 +232,7 @@ async def refresh(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid token type"
         )
 
-    if not await check_token_status(credentials.credentials):
+    if await is_token_revoked(credentials.credentials, payload):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token blacklisted due to logout. Please log in again",
@@ -213,6 +240,10 @@ async def refresh(
 
     user = await User.get_by_id_or_login(session=session, user_id=payload["id"])
 
+    if not user:
+        raise_user_not_found()
+
+    # Issued for the current role, organization and version of the account
     return {"access_token": generate_access_token(user)}
 
 
@@ -232,7 +263,7 @@ async def logout(credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer(
         )
 
     try:
-        await save_token_on_user_logout(credentials.credentials)
+        await revoke_token(credentials.credentials, payload)
         return {"detail": "Вы успешно вышли из системы"}
     except Exception as e:
         print(e)
@@ -249,7 +280,14 @@ async def logout(credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer(
     summary="Get current user",
     description="Get current user. Should be authorized",
 )
-async def get_current_authorized_user(user: User = Depends(get_current_user)):
+async def get_current_authorized_user(
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_db),
+):
+    user = await User.get_by_id_or_login(
+        session=session, user_id=user.id, options=loaders.USER_PROFILE
+    )
+
     return UserSchema.model_validate(user)
 
 
@@ -6,10 +6,10 @@ from sqlalchemy.exc import NoResultFound
 from app.schemas.code import CodeSchema, CodeCreateSchema
 from app.models.code import CodeType, Code
 from app.models.goal import Goal
-from app.models.user import User
 from app.models.organization import Organization
 
-from app.utils.auth import get_current_user, verify_organization_admin
+from app.utils.auth import get_current_principal, verify_organization_admin
+from app.utils.principal import Principal
 
 from app.database_initializer import get_db
 
@@ -35,7 +35,7 @@ router = APIRouter()
 async def create_goal_barcode(
     goal_id: int,
     session: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     value = f"T:1-N:{goal_id}-U:{user.id}-{random.randint(100000, 999999)}"
     barcode = Code128(value, writer=SVGWriter())
@@ -70,7 +70,7 @@ async def create_goal_barcode(
 async def create_organization_barcode(
     organization_id: int,
     session: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     value = f"T:2-N:{organization_id}-U:{user.id}-{random.randint(100000, 999999)}"
     barcode = Code128(value, writer=SVGWriter())
@@ -106,7 +106,7 @@ async def create_organization_barcode(
 async def verify_code(
     value: str,
     session: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     await verify_organization_admin(user)
 
@@ -1,18 +1,26 @@
-from typing import List
-
-from fastapi import APIRouter, Depends, HTTPException, status, Form
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Form
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database_initializer import get_db
+from app.database_initializer import get_db, get_read_db
 
 from app.models.goal import Goal
-from app.models.user import User
-from app.schemas.goal import GoalCreateSchema, GoalUpdateSchema, GoalSchema
-
-from app.utils.auth import get_current_user, verify_organization_admin
+from app.models import loaders
+from app.schemas.goal import (
+    GoalCreateSchema,
+    GoalUpdateSchema,
+    GoalSchema,
+    SummaryGoalSchema,
+)
+from app.schemas.pagination import PageSchema
 
-from base64 import b64encode
+from app.utils.auth import get_current_principal, verify_organization_admin
+from app.utils.principal import Principal
+from app.utils.cache import invalidate_favorite_stories
+from app.utils.media import save_upload
+from app.utils.pagination import PageParams, get_page_params
+from app.utils.projection import get_schema_columns, page_response
+from app.utils.query_stats import query_budget
 
 
 router = APIRouter()
@@ -48,9 +56,10 @@ def validate_datetime(dates, from_date, to_date, from_time, to_time):
     description="Create new goal in database. Should be authorized as organization member. ",
 )
 async def create_new_goal(
+    background_tasks: BackgroundTasks,
     # content: bytes = File(description="The cover for your goal"),
     goal: GoalCreateSchema = Form(),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     session: AsyncSession = Depends(get_db),
 ):
     await verify_organization_admin(user)
@@ -60,7 +69,9 @@ async def create_new_goal(
     )
 
     goal.content = (
-        b64encode(await goal.content.read()).decode("utf-8") if goal.content else None
+        await save_upload(session, goal.content, background_tasks)
+        if goal.content
+        else None
     )
 
     await Goal.create(
@@ -74,21 +85,27 @@ async def create_new_goal(
 
 @router.get(
     "/",
-    response_model=List[GoalSchema],
+    response_model=PageSchema[SummaryGoalSchema],
     summary="Get all goals",
-    description="Get all goals.",
+    description="Get a page of goals. Pass next_cursor of the page to get the next one.",
 )
+@query_budget(1)
 async def get_all_goals(
-    session: AsyncSession = Depends(get_db),
+    page: PageParams = Depends(get_page_params),
+    session: AsyncSession = Depends(get_read_db),
 ):
     try:
-        goals = await Goal.get_all(session=session)
+        goals = await Goal.get_all_rows(
+            session=session,
+            columns=get_schema_columns(Goal, SummaryGoalSchema),
+            page=page,
+        )
     except NoResultFound:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Ни один голс не существует"
         )
 
-    return [GoalSchema.model_validate(goal) for goal in goals]
+    return page_response(SummaryGoalSchema, goals)
 
 
 @router.get(
@@ -99,10 +116,12 @@ async def get_all_goals(
 )
 async def get_goal(
     goal_id: int,
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_read_db),
 ):
     try:
-        goal = await Goal.get_by_id(session, goal_id=goal_id)
+        goal = await Goal.get_by_id(
+            session, goal_id=goal_id, options=loaders.GOAL_CONTENT
+        )
     except NoResultFound:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Голс не найден"
@@ -118,9 +137,10 @@ async def get_goal(
 )
 async def update_post(
     goal_id: int,
+    background_tasks: BackgroundTasks,
     new_goal: GoalUpdateSchema = Form(),
     session: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     await verify_organization_admin(user)
 
@@ -146,7 +166,7 @@ async def update_post(
     )
 
     new_goal.content = (
-        b64encode(await new_goal.content.read()).decode("utf-8")
+        await save_upload(session, new_goal.content, background_tasks)
         if new_goal.content
         else None
     )
@@ -165,12 +185,14 @@ async def update_post(
 async def delete_goal(
     goal_id: int,
     session: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     await verify_organization_admin(user)
 
     try:
-        goal = await Goal.get_by_id(session, goal_id=goal_id)
+        goal = await Goal.get_by_id(
+            session, goal_id=goal_id, options=loaders.GOAL_STORIES
+        )
     except NoResultFound:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Голс не найден"
@@ -182,6 +204,11 @@ async def delete_goal(
             detail="У вас нет прав на удаление этого голса",
         )
 
+    has_favorite_stories = any(story.position for story in goal.stories)
+
     await goal.delete(session=session)
 
+    if has_favorite_stories:
+        await invalidate_favorite_stories(user.organization_id)
+
     return {"detail": "Пост и истории к нему успешно удалены"}
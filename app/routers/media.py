@@ -0,0 +1,111 @@
+import asyncio
+import os
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import FileResponse
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database_initializer import get_read_db
+from app.models.media import Media
+from app.services.media import BlobNotFound, get_blob_store
+
+from settings import MEDIA_DERIVATIVE_SIZES, MEDIA_DERIVATIVE_MIME
+
+# Content under the hash never changes, so clients can cache it forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# The original is served in place of a derivative which isn't generated yet
+FALLBACK_CACHE_CONTROL = "public, max-age=60"
+
+
+router = APIRouter()
+
+
+def is_etag_matched(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    # If-None-Match uses weak comparison
+    return etag in (
+        tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+    )
+
+
+@router.get(
+    "/{media_hash}",
+    response_class=Response,
+    summary="Get media",
+    description="Get raw media file by its content hash. "
+    "Images can be requested in smaller size by specifying variant. "
+    "If the variant isn't generated yet, the original is returned. "
+    "Supports conditional requests with If-None-Match and partial content with Range.",
+)
+async def get_media(
+    media_hash: str,
+    request: Request,
+    variant: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_db),
+):
+    if variant is not None and variant not in MEDIA_DERIVATIVE_SIZES:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Медиафайл не найден"
+        )
+
+    store = get_blob_store()
+
+    try:
+        media = await Media.get_by_hash(session, blob_hash=media_hash)
+    except NoResultFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Медиафайл не найден"
+        )
+
+    etag = f'"{media.hash}"'
+    media_type = media.mime
+    cache_control = IMMUTABLE_CACHE_CONTROL
+    served_variant = None
+
+    if variant and media.mime.startswith("image/"):
+        if await store.exists(media.hash, variant):
+            etag = f'"{media.hash}.{variant}"'
+            media_type = MEDIA_DERIVATIVE_MIME
+            served_variant = variant
+        else:
+            cache_control = FALLBACK_CACHE_CONTROL
+
+    headers = {"etag": etag, "cache-control": cache_control}
+
+    if is_etag_matched(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if path := store.local_path(media.hash, served_variant):
+        try:
+            stat_result = await asyncio.to_thread(os.stat, path)
+        except FileNotFoundError:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Медиафайл не найден"
+            )
+
+        # Served straight from disk, with sendfile if the server supports it
+        return FileResponse(
+            path, media_type=media_type, headers=headers, stat_result=stat_result
+        )
+
+    try:
+        if served_variant:
+            content = await store.get_derivative(media.hash, served_variant)
+        else:
+            content = await store.get(media.hash)
+    except BlobNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Медиафайл не найден"
+        )
+
+    return Response(content=content, media_type=media_type, headers=headers)
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from app.utils.auth import get_current_principal, is_user_service_admin
+from app.utils.metrics import CONTENT_TYPE, REGISTRY
+from app.utils.principal import Principal
+
+
+router = APIRouter()
+
+
+@router.get(
+    "",
+    response_class=PlainTextResponse,
+    summary="Get metrics",
+    description="Metrics of the process in the Prometheus text format. "
+    "Should be authorized as a service admin.",
+)
+async def get_metrics(user: Principal = Depends(get_current_principal)):
+    if not await is_user_service_admin(user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Вы не являетесь администратором сервиса.",
+        )
+
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
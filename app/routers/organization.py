@@ -1,9 +1,16 @@
 import logging
-from base64 import b64encode
 from datetime import datetime, timedelta
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, status
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    File,
+    UploadFile,
+    status,
+)
 from fastapi_cache.decorator import cache
 
 from pydantic import BaseModel
@@ -11,10 +18,10 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database_initializer import get_db
-from app.models.user import User
+from app.database_initializer import get_db, get_read_db
 from app.models.organization import Organization, OrganizationType, Place
 from app.models.discount import Discount
+from app.models import loaders
 from app.schemas.organization import (
     OrganizationSchema,
     OrganizationCreateSchema,
@@ -23,11 +30,17 @@ from app.schemas.organization import (
     SummaryPlaceSchema,
     VerbosePlaceSchema,
 )
+from app.schemas.pagination import PageSchema
 from app.schemas.user import (
     UserSchemaPublic,
 )
 
-from app.utils.auth import get_current_user, verify_organization_admin
+from app.utils.auth import get_current_principal, verify_organization_admin
+from app.utils.principal import Principal
+from app.utils.media import save_upload
+from app.utils.pagination import PageParams, get_page_params
+from app.utils.projection import get_schema_columns, page_response
+from app.utils.query_stats import query_budget
 from app.services.geocoder import YandexGeocoder
 from settings import YANDEX_API_KEY
 
@@ -48,27 +61,28 @@ class OrganizationCreatedResponseSchema(BaseModel):
     description="Create new organization in database",
 )
 async def register(
+    background_tasks: BackgroundTasks,
     payload: OrganizationCreateSchema = Depends(),
     photo: UploadFile = File(None),
     session: AsyncSession = Depends(get_db),
 ):
     try:
-        if photo:
-            content = await photo.read()
-            encoded_photo = b64encode(content)
-        else:
-            encoded_photo = None
+        photo_reference = (
+            await save_upload(session, photo, background_tasks) if photo else None
+        )
 
         organization, admin = await Organization.create(
             session=session,
             organization_schema=payload,
-            photo=encoded_photo,
+            photo=photo_reference,
         )
 
         return OrganizationCreatedResponseSchema(
             admin=UserSchemaPublic.model_validate(admin),
             organization=OrganizationSchema.model_validate(organization),
         )
+    except HTTPException:
+        raise
     except IntegrityError:
         await session.rollback()
         raise HTTPException(
@@ -91,14 +105,16 @@ async def register(
     description="Get current organization info by access token. Should be authorized as organization member",
 )
 async def get_current_organization(
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     session: AsyncSession = Depends(get_db),
 ):
     await verify_organization_admin(user)
 
     try:
         organization = await Organization.get_by_id(
-            session=session, organization_id=user.organization_id
+            session=session,
+            organization_id=user.organization_id,
+            options=loaders.ORGANIZATION_PROFILE,
         )
     except NoResultFound:
         raise HTTPException(
@@ -116,11 +132,13 @@ async def get_current_organization(
 )
 async def info(
     organization_id: int,
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_read_db),
 ):
     try:
         organization = await Organization.get_by_id(
-            session=session, organization_id=organization_id
+            session=session,
+            organization_id=organization_id,
+            options=loaders.ORGANIZATION_PROFILE,
         )
         return OrganizationSchema.model_validate(organization)
     except NoResultFound:
@@ -138,14 +156,20 @@ async def info(
 async def update_organization_info(
     payload: OrganizationChangeSchema = Depends(),
     session: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     await verify_organization_admin(user)
 
     try:
-        organization = user.organization
-        organization = await organization.update(
-            session=session, updates=payload.model_dump()
+        organization = await Organization.get_by_id(
+            session=session, organization_id=user.organization_id
+        )
+        await organization.update(session=session, updates=payload.model_dump())
+
+        organization = await Organization.get_by_id(
+            session=session,
+            organization_id=user.organization_id,
+            options=loaders.ORGANIZATION_PROFILE,
         )
         return OrganizationSchema.model_validate(organization)
     except Exception as e:
@@ -163,22 +187,26 @@ async def update_organization_info(
     description="Update organization profile photo. Should be authorized as organization member",
 )
 async def update_organization_photo(
+    background_tasks: BackgroundTasks,
     photo: UploadFile = File(...),
     session: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     await verify_organization_admin(user)
 
     try:
-        content = await photo.read()
-        encoded_photo = b64encode(content)
+        photo_reference = await save_upload(session, photo, background_tasks)
 
-        organization = user.organization
+        organization = await Organization.get_by_id(
+            session=session, organization_id=user.organization_id
+        )
         organization = await organization.update(
-            session=session, updates={"photo": encoded_photo}
+            session=session, updates={"photo": photo_reference}
         )
 
         return {"detail": "Фото организации успешно обновлено"}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error("Failed to update user: %s", e)
         raise HTTPException(
@@ -196,7 +224,7 @@ async def update_organization_photo(
 async def set_organization_place(
     place: SetPlaceLocationSchema = Depends(),
     session: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     await verify_organization_admin(user)
 
@@ -232,27 +260,27 @@ async def get_location(address: str):
 
 @router.get(
     "/places/",
-    response_model=List[SummaryPlaceSchema],
+    response_model=PageSchema[SummaryPlaceSchema],
     summary="Get all places",
-    description="Get all places in all organizations.",
+    description="Get a page of places in all organizations. Pass next_cursor of the page to get the next one.",
 )
+@query_budget(1)
 async def get_all_available_places(
-    session: AsyncSession = Depends(get_db),
+    page: PageParams = Depends(get_page_params),
+    session: AsyncSession = Depends(get_read_db),
 ):
-    places = await Place.get_all(session=session)
-
-    formatted_places = [
-        SummaryPlaceSchema(
-            id=place.id,
-            organization_id=place.organization_id,
-            name=place.name,
-            address=place.address,
-            location=await get_location(place.address),
-        )
-        for place in places
+    places = await Place.get_all_rows(
+        session=session,
+        columns=get_schema_columns(Place, SummaryPlaceSchema),
+        page=page,
+    )
+
+    places.items = [
+        {**place._mapping, "location": await get_location(place.address)}
+        for place in places.items
     ]
 
-    return formatted_places
+    return page_response(SummaryPlaceSchema, places)
 
 
 @router.get(
@@ -263,9 +291,11 @@ async def get_all_available_places(
 )
 async def get_place(
     place_id: int,
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_read_db),
 ):
-    place = await Place.get_by_id(session=session, place_id=place_id)
+    place = await Place.get_by_id(
+        session=session, place_id=place_id, options=loaders.PLACE_DETAIL
+    )
 
     formatted_place = VerbosePlaceSchema(
         id=place.id,
@@ -306,7 +336,7 @@ async def get_available_organization_types():
 async def get_individual_discount(
     organization_id: int,
     session: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     try:
         discount = await Discount.get_by_user_and_organization(
@@ -3,11 +3,13 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database_initializer import get_db
+from app.database_initializer import get_read_db
 
 from app.models.organization import OrganizationType, Place
 from .organization import get_location
 from app.schemas.organization import SummaryPlaceSchema
+from app.utils.projection import get_schema_columns, list_response
+from app.utils.query_stats import query_budget
 
 
 router = APIRouter()
@@ -20,28 +22,31 @@ router = APIRouter()
     summary="Search places",
     description="Search places by organization name or type.",
 )
+@query_budget(1)
 async def search_places(
     search_query: str = None,
     organization_type: OrganizationType = None,
     has_goals: bool = None,
     has_discount: bool = None,
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_read_db),
 ):
     try:
-        places = await Place.get_by_query(
+        places = await Place.get_rows_by_query(
             session=session,
             search_query=search_query,
             org_type=organization_type,
             has_goals=has_goals,
             has_discount=has_discount,
+            columns=get_schema_columns(Place, SummaryPlaceSchema),
         )
 
-        return [
-            SummaryPlaceSchema.model_validate(
-                {**place.__dict__, "location": await get_location(place.address)}
-            )
-            for place in places
-        ]
+        return list_response(
+            SummaryPlaceSchema,
+            [
+                {**place._mapping, "location": await get_location(place.address)}
+                for place in places
+            ],
+        )
 
     except Exception as e:
         logging.error(e)
@@ -1,24 +1,48 @@
 import logging
 from typing import List
-from base64 import b64encode
 
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    status,
+    File,
+    UploadFile,
+)
+
+from fastapi_cache.decorator import cache
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import NoResultFound, IntegrityError
 
-from app.database_initializer import get_db
+from app.database_initializer import get_db, get_read_db
 from app.models.story import Story
 from app.types.enums import ModerationState
 from app.models.user import User
 from app.models.discount import Discount
+from app.models import loaders
 from app.schemas.story import (
     StoryCreateSchema,
     StoryChangeSchema,
     StorySchema,
+    SummaryStorySchema,
 )
-
-from app.utils.auth import get_current_user, is_user_service_admin
+from app.schemas.pagination import PageSchema
+
+from app.utils.auth import get_current_principal, is_user_service_admin
+from app.utils.principal import Principal
+from app.utils.cache import (
+    FAVORITE_STORIES_NAMESPACE,
+    invalidate_favorite_stories,
+    organization_key_builder,
+)
+from app.utils.db import unit_of_work
+from app.utils.media import save_uploads
+from app.utils.pagination import PageParams, get_page_params
+from app.utils.projection import get_schema_columns, page_response
+from app.utils.query_stats import query_budget
+from settings import FAVORITE_STORIES_CACHE_EXPIRE
 
 
 router = APIRouter()
@@ -32,10 +56,11 @@ router = APIRouter()
     description="Create new story in database. Should be authorized",
 )
 async def create_new_story(
+    background_tasks: BackgroundTasks,
     story: StoryCreateSchema = Depends(),
     content: List[UploadFile] = File(None),
     session: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     if (story.organization_id and story.goal_id) or (
         not story.organization_id and not story.goal_id
@@ -52,21 +77,16 @@ async def create_new_story(
         )
 
     try:
-        encoded_content = (
-            [
-                b64encode(await content_item.read()).decode("utf-8")
-                for content_item in content
-            ]
-            if content
-            else None
-        )
+        content_references = await save_uploads(session, content, background_tasks)
         await Story.create(
             session=session,
             story=story,
-            content=encoded_content,
+            content=content_references,
             owner_id=user.id,
         )
         return {"detail": "История успешно создана"}
+    except HTTPException:
+        raise
     except Exception as error:
         logging.error(error)
         raise HTTPException(
@@ -77,22 +97,29 @@ async def create_new_story(
 
 @router.get(
     "/me",
-    response_model=List[StorySchema],
+    response_model=PageSchema[SummaryStorySchema],
     summary="Get current user stories",
-    description="Get stories by current user. Should be authorized",
+    description="Get a page of stories by current user. Should be authorized",
 )
+@query_budget(2)
 async def get_current_user_stories(
+    page: PageParams = Depends(get_page_params),
     session: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     try:
-        stories = await Story.get_all_by_owner(session, owner_id=user.id)
+        stories = await Story.get_all_rows_by_owner(
+            session,
+            owner_id=user.id,
+            columns=get_schema_columns(Story, SummaryStorySchema),
+            page=page,
+        )
     except NoResultFound:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Истории не найдены"
         )
 
-    return [StorySchema.model_validate(story) for story in stories]
+    return page_response(SummaryStorySchema, stories)
 
 
 @router.get(
@@ -103,10 +130,12 @@ async def get_current_user_stories(
 )
 async def get_story(
     story_id: int,
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_read_db),
 ):
     try:
-        story = await Story.get_by_id(session, story_id=story_id)
+        story = await Story.get_by_id(
+            session, story_id=story_id, options=loaders.STORY_CONTENT
+        )
     except NoResultFound:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="История не найдена"
@@ -117,17 +146,22 @@ async def get_story(
 
 @router.get(
     "/organization/{organization_id}",
-    response_model=List[StorySchema],
+    response_model=PageSchema[SummaryStorySchema],
     summary="Get all organization stories",
-    description="Get all stories in organization. Should be authorized",
+    description="Get a page of stories in organization. Should be authorized",
 )
+@query_budget(1)
 async def get_all_organization_stories(
     organization_id: int,
-    session: AsyncSession = Depends(get_db),
+    page: PageParams = Depends(get_page_params),
+    session: AsyncSession = Depends(get_read_db),
 ):
     try:
         stories = await Story.get_all_by_organization(
-            session, organization_id=organization_id
+            session,
+            organization_id=organization_id,
+            page=page,
+            options=loaders.STORY_CONTENT,
         )
     except NoResultFound:
         raise HTTPException(
@@ -135,22 +169,29 @@ async def get_all_organization_stories(
             detail="У организации нет историй",
         )
 
-    return [StorySchema.model_validate(story) for story in stories]
+    return page_response(SummaryStorySchema, stories)
 
 
 @router.get(
     "/user/{username}",
-    response_model=List[StorySchema],
+    response_model=PageSchema[SummaryStorySchema],
     summary="Get user stories",
-    description="Get stories by user. Should be authorized",
+    description="Get a page of stories by user. Should be authorized",
 )
+@query_budget(2)
 async def get_user_stories(
     username: str,
-    session: AsyncSession = Depends(get_db),
+    page: PageParams = Depends(get_page_params),
+    session: AsyncSession = Depends(get_read_db),
 ):
     try:
         if user := await User.get_by_id_or_login(session, login=username):
-            stories = await Story.get_all_by_owner(session, owner_id=user.id)
+            stories = await Story.get_all_rows_by_owner(
+                session,
+                owner_id=user.id,
+                columns=get_schema_columns(Story, SummaryStorySchema),
+                page=page,
+            )
         else:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Пользователь не найден"
@@ -160,7 +201,7 @@ async def get_user_stories(
             status_code=status.HTTP_404_NOT_FOUND, detail="Истории не найдены"
         )
 
-    return [StorySchema.model_validate(story) for story in stories]
+    return page_response(SummaryStorySchema, stories)
 
 
 @router.delete(
@@ -171,7 +212,7 @@ async def get_user_stories(
 async def delete_story(
     story_id: int,
     session: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     try:
         story = await Story.get_by_id(session, story_id=story_id, private=True)
@@ -186,7 +227,12 @@ async def delete_story(
             detail="У вас нет прав на удаление этого поста",
         )
 
+    showcase_organization_ids = (
+        await story.get_showcase_organization_ids(session) if story.position else ()
+    )
+
     await story.delete(session)
+    await invalidate_favorite_stories(*showcase_organization_ids)
 
     return {"detail": "История успешно удалена"}
 
@@ -198,10 +244,11 @@ async def delete_story(
 )
 async def update_story(
     story_id: int,
+    background_tasks: BackgroundTasks,
     payload: StoryChangeSchema = Depends(),
     content: List[UploadFile] = File(None),
     session: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     try:
         story = await Story.get_by_id(session, story_id=story_id, private=True)
@@ -222,16 +269,14 @@ async def update_story(
             detail="Нельзя загружать более 3 медиа-файлов",
         )
 
-    encoded_content = (
-        [
-            b64encode(await content_item.read()).decode("utf-8")
-            for content_item in content
-        ]
-        if content
-        else None
-    )
+    content_references = await save_uploads(session, content, background_tasks)
 
-    await story.change(session=session, story=payload, content=encoded_content)
+    await story.change(session=session, story=payload, content=content_references)
+
+    if story.position:
+        await invalidate_favorite_stories(
+            *await story.get_showcase_organization_ids(session)
+        )
 
     return {"detail": "История изменена"}
 
@@ -246,7 +291,7 @@ async def update_story_position(
     story_id: int,
     position: int,
     session: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     try:
         story = await Story.get_by_id(session, story_id=story_id)
@@ -262,18 +307,29 @@ async def update_story_position(
         )
 
     await story.change_position(session=session, position=position)
+    await invalidate_favorite_stories(
+        *await story.get_showcase_organization_ids(session)
+    )
 
     return {"detail": "Позиция истории изменена"}
 
 
 @router.get(
     "/favorite/{organization_id}",
-    response_model=dict[int, StorySchema],
+    response_model=dict[int, SummaryStorySchema],
     summary="Get favorite stories [TESTING]",
     description="Get favorite stories. Should be authorized.",
 )
+@query_budget(1)
+@cache(
+    expire=FAVORITE_STORIES_CACHE_EXPIRE,
+    namespace=FAVORITE_STORIES_NAMESPACE,
+    key_builder=organization_key_builder,
+)
 async def get_favorite_stories_by_organization(
     organization_id: int,
+    # The response is cached for everyone, so it's filled from the primary rather
+    # than a replica which may not have the write which invalidated it yet
     session: AsyncSession = Depends(get_db),
 ):
     stories = await Story.get_favorite(session, organization_id=organization_id)
@@ -283,14 +339,16 @@ async def get_favorite_stories_by_organization(
 
 @router.get(
     "/admin/",
-    response_model=dict,
+    response_model=PageSchema[SummaryStorySchema],
     summary="Get all stories",
-    description="Get all stories. Should be authorized as admin.",
+    description="Get a page of stories. Should be authorized as admin.",
 )
+@query_budget(2)
 async def get_all_stories_admin(
     moderation_state: ModerationState,
+    page: PageParams = Depends(get_page_params),
     session: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     if not await is_user_service_admin(user):
         raise HTTPException(
@@ -298,13 +356,18 @@ async def get_all_stories_admin(
             detail="Вы не являетесь администратором сервиса.",
         )
     try:
-        stories = await Story.get_all(session, moderation_state=moderation_state)
+        stories = await Story.get_all(
+            session,
+            moderation_state=moderation_state,
+            page=page,
+            options=loaders.STORY_CONTENT,
+        )
     except NoResultFound:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Истории не найдены"
         )
 
-    return [StorySchema.model_validate(story) for story in stories]
+    return page_response(SummaryStorySchema, stories)
 
 
 @router.patch(
@@ -317,7 +380,7 @@ async def change_story_moderation_state_admin(
     story_id: int,
     moderation_state: ModerationState,
     session: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     if not await is_user_service_admin(user):
         raise HTTPException(
@@ -325,47 +388,59 @@ async def change_story_moderation_state_admin(
             detail="Вы не являетесь администратором сервиса.",
         )
     try:
-        story = await Story.get_by_id(session=session, story_id=story_id, private=True)
-
-        if story.moderation_state in (ModerationState.on_check, ModerationState.denied):
-            organization = story.organization
-            if not organization:
-                organization = story.goal.organization
+        # The discount and the moderation state are committed together
+        async with unit_of_work(session):
+            story = await Story.get_by_id(
+                session=session,
+                story_id=story_id,
+                private=True,
+                options=loaders.STORY_ORGANIZATION,
+            )
 
-            if (
-                organization.max_discount
-                and organization.common_discount
-                and organization.step_amount
+            if story.moderation_state in (
+                ModerationState.on_check,
+                ModerationState.denied,
             ):
-                step = (
-                    organization.max_discount - organization.common_discount
-                ) / organization.step_amount
-                new_discount_percentage = step
-
-                discount = await Discount.get_by_user_and_organization(
-                    session=session,
-                    user_id=story.owner_id,
-                    organization_id=story.organization_id,
-                )
-
-                if discount:
-                    new_discount_percentage = min(
-                        discount.discount_percentage + step, organization.max_discount
-                    )
-                    await discount.update_percentage(
-                        session=session, discount_percentage=new_discount_percentage
-                    )
-                else:
-                    await Discount.create(
+                organization = story.organization
+                if not organization:
+                    organization = story.goal.owner
+
+                if (
+                    organization.max_discount
+                    and organization.common_discount
+                    and organization.step_amount
+                ):
+                    step = (
+                        organization.max_discount - organization.common_discount
+                    ) / organization.step_amount
+                    new_discount_percentage = step
+
+                    discount = await Discount.get_by_user_and_organization(
                         session=session,
                         user_id=story.owner_id,
-                        organization_id=story.organization_id,
-                        discount_percentage=new_discount_percentage,
+                        organization_id=organization.id,
                     )
 
-        await story.change_moderation_state(
-            session=session, moderation_state=moderation_state
-        )
+                    if discount:
+                        new_discount_percentage = min(
+                            discount.discount_percentage + step,
+                            organization.max_discount,
+                        )
+                        await discount.update_percentage(
+                            session=session,
+                            discount_percentage=new_discount_percentage,
+                        )
+                    else:
+                        await Discount.create(
+                            session=session,
+                            user_id=story.owner_id,
+                            organization_id=organization.id,
+                            discount_percentage=new_discount_percentage,
+                        )
+
+            await story.change_moderation_state(
+                session=session, moderation_state=moderation_state
+            )
     except (IntegrityError, NoResultFound) as error:
         logging.error(error)
         raise HTTPException(
@@ -1,8 +1,8 @@
 import logging
-from base64 import b64encode
 
 from fastapi import (
     APIRouter,
+    BackgroundTasks,
     Depends,
     HTTPException,
     File,
@@ -13,9 +13,12 @@ from fastapi import (
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.utils.auth import get_current_user
-from app.database_initializer import get_db
+from app.utils.media import save_upload
+from app.utils.db import load_deferred
+from app.database_initializer import get_db, get_read_db
 from app.services.auth.password import validate_password
 from app.models.user import User
+from app.models import loaders
 from app.schemas.user import (
     UserSchema,
     UserSchemaPublic,
@@ -34,9 +37,11 @@ router = APIRouter()
 )
 async def profile(
     username: str,
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_read_db),
 ):
-    if user := await User.get_by_id_or_login(session=session, login=username):
+    if user := await User.get_by_id_or_login(
+        session=session, login=username, options=loaders.USER_PROFILE
+    ):
         return UserSchemaPublic.model_validate(user)
     else:
         raise HTTPException(
@@ -56,7 +61,11 @@ async def update_user_info(
     user: User = Depends(get_current_user),
 ):
     try:
-        user = await user.update(session=session, updates=payload.model_dump())
+        await user.update(session=session, updates=payload.model_dump())
+
+        user = await User.get_by_id_or_login(
+            session=session, user_id=user.id, options=loaders.USER_PROFILE
+        )
         return UserSchema.model_validate(user)
     except Exception as e:
         logging.error("Failed to update user: %s", e)
@@ -73,16 +82,18 @@ async def update_user_info(
     description="Update user profile photo. Should be authorized",
 )
 async def update_user_photo(
+    background_tasks: BackgroundTasks,
     photo: UploadFile = File(..., description="New user profile photo"),
     session: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
     try:
-        content = await photo.read()
-        encoded_photo = b64encode(content)
+        photo_reference = await save_upload(session, photo, background_tasks)
 
-        await user.update(session=session, updates={"photo": encoded_photo})
+        await user.update(session=session, updates={"photo": photo_reference})
         return {"detail": "Фото успешно обновлено"}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error("Failed to update user: %s", e)
         raise HTTPException(
@@ -102,14 +113,18 @@ async def update_user_password(
     session: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
-    if not validate_password(user.hashed_password, payload.old_password):
+    await load_deferred(session, user, "hashed_password")
+
+    if not await validate_password(user.hashed_password, payload.old_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Неверный пароль"
         )
 
     try:
-        user = await user.update(
-            session=session, updates={"password": payload.new_password}
+        await user.update(session=session, updates={"password": payload.new_password})
+
+        user = await User.get_by_id_or_login(
+            session=session, user_id=user.id, options=loaders.USER_PROFILE
         )
         return UserSchema.model_validate(user)
     except Exception as e:
@@ -4,6 +4,8 @@ from typing import Optional, List
 from pydantic import BaseModel, Field
 from fastapi import File, UploadFile
 
+from app.schemas.media import MediaField, MediaPreviewField
+
 
 class GoalCreateSchema(BaseModel):
     title: str = Field(..., description="The title of the goal", max_length=100)
@@ -42,7 +44,11 @@ class GoalUpdateSchema(GoalCreateSchema):
 class GoalSchema(GoalCreateSchema):
     id: int
     owner_id: int
-    content: Optional[bytes]
+    content: MediaField
 
     class Config:
         from_attributes = True
+
+
+class SummaryGoalSchema(GoalSchema):
+    content: MediaPreviewField
@@ -0,0 +1,59 @@
+from typing import Annotated, List, Optional
+
+from pydantic import BaseModel, BeforeValidator, computed_field
+
+from settings import MEDIA_DERIVATIVE_SOURCE_TYPES, MEDIA_URL
+
+MEDIA_PREVIEW_VARIANT = "small"
+
+
+class MediaSchema(BaseModel):
+    hash: str
+    size: int
+    mime: str
+
+    @computed_field
+    @property
+    def url(self) -> str:
+        return f"{MEDIA_URL}/{self.hash}"
+
+    class Config:
+        from_attributes = True
+
+
+class MediaPreviewSchema(MediaSchema):
+    """Media reference for list responses, images point to their small derivative."""
+
+    @computed_field
+    @property
+    def url(self) -> str:
+        if self.mime in MEDIA_DERIVATIVE_SOURCE_TYPES:
+            return f"{MEDIA_URL}/{self.hash}?variant={MEDIA_PREVIEW_VARIANT}"
+
+        return f"{MEDIA_URL}/{self.hash}"
+
+
+def skip_legacy_media(value):
+    """
+    Media stored inline as base64 is shown as missing until it's moved
+    to the media store by migrate_media.py.
+    """
+    if isinstance(value, (str, bytes)):
+        return None
+
+    if isinstance(value, list):
+        return [item for item in value if not isinstance(item, (str, bytes))]
+
+    return value
+
+
+MediaField = Annotated[Optional[MediaSchema], BeforeValidator(skip_legacy_media)]
+MediaPreviewField = Annotated[
+    Optional[MediaPreviewSchema], BeforeValidator(skip_legacy_media)
+]
+MediaListField = Annotated[
+    Optional[List[MediaSchema]], BeforeValidator(skip_legacy_media)
+]
+MediaPreviewListField = Annotated[
+    Optional[List[MediaPreviewSchema]], BeforeValidator(skip_legacy_media)
+]
@@ -9,8 +9,9 @@ from pydantic import (
 )
 
 from app.types.enums import OrganizationType
-from app.schemas.goal import GoalSchema
-from app.schemas.story import StorySchema
+from app.schemas.goal import SummaryGoalSchema
+from app.schemas.media import MediaField
+from app.schemas.story import SummaryStorySchema
 from app.utils.alpha_validation import is_strong_password, SPECIAL_CHARS
 from app.utils.forms import as_form
 
@@ -58,10 +59,10 @@ class OrganizationSchema(OrganizationSchemaBase):
     common_discount: Optional[int]
     max_discount: Optional[int]
 
-    photo: Optional[bytes]
+    photo: MediaField
 
-    goals: List[GoalSchema] = []
-    stories: List[StorySchema] = []
+    goals: List[SummaryGoalSchema] = []
+    stories: List[SummaryStorySchema] = []
 
     class Config:
         from_attributes = True
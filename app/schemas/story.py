@@ -3,6 +3,7 @@ from typing import Optional, List
 from pydantic import BaseModel
 from fastapi import Form
 
+from app.schemas.media import MediaListField, MediaPreviewListField
 from app.utils.forms import as_form
 
 
@@ -18,12 +19,16 @@ class StorySchema(StoryCreateSchema):
     id: int
     owner_id: int
     position: Optional[int]
-    content: Optional[List[bytes]]
+    content: MediaListField
 
     class Config:
         from_attributes = True
 
 
+class SummaryStorySchema(StorySchema):
+    content: MediaPreviewListField
+
+
 @as_form
 class StoryChangeSchema(BaseModel):
     description: str = Form(...)
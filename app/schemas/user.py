@@ -10,7 +10,8 @@ from pydantic import (
 )
 
 from app.types.enums import Gender
-from app.schemas.story import StorySchema
+from app.schemas.media import MediaField
+from app.schemas.story import SummaryStorySchema
 from app.utils.alpha_validation import (
     is_latin,
     is_cyrillic,
@@ -192,8 +193,8 @@ class UserSchemaPublic(UserSchemaBase):
     first_name: Optional[str]
     username: str
     description: Optional[str]
-    stories: List[StorySchema] = []
-    photo: Optional[bytes]
+    stories: List[SummaryStorySchema] = []
+    photo: MediaField
 
     class Config:
         from_attributes = True
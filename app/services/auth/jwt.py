@@ -1,4 +1,13 @@
-from settings import SECRET_KEY, ACCESS_TOKEN_EXPIRE_TIME, REFRESH_TOKEN_EXPIRE_TIME
+from settings import (
+    SECRET_KEY,
+    ACCESS_TOKEN_EXPIRE_TIME,
+    REFRESH_TOKEN_EXPIRE_TIME,
+    DECODED_TOKENS_CACHE_SIZE,
+)
+
+import hashlib
+import secrets
+import time
 
 from datetime import datetime, timedelta, timezone
 
@@ -6,13 +15,29 @@ from datetime import datetime, timedelta, timezone
 import jwt
 from fastapi import HTTPException, status
 
+from app.utils import metrics
+from app.utils.cache import TTLCache
+
+DECODED_TOKENS_CACHE = metrics.counter(
+    "jwt_decode_cache_total", "Decodes of tokens by the cache result", ("result",)
+)
+
+# Claims of verified tokens by the digest of the token, until the token expires.
+# Only tokens which passed verification get here, so a hit needs no verification.
+decoded_tokens = TTLCache(maxsize=DECODED_TOKENS_CACHE_SIZE)
+
 
 def generate_token(obj, token_type: str, token_expire_time: int) -> str:
     token = jwt.encode(
         {
             "id": obj.id,
             "role": obj.role.value,
+            "organization_id": obj.organization_id,
+            # Version of the account, see app.utils.principal
+            "ver": obj.token_version or 0,
             "type": token_type,
+            # Identifies the token when it's revoked
+            "jti": secrets.token_urlsafe(12),
             "exp": datetime.now(tz=timezone.utc) + timedelta(seconds=token_expire_time),
         },
         SECRET_KEY,
@@ -34,7 +59,29 @@ def generate_refresh_token(obj: object) -> str:
     )
 
 
+def invalidate_decoded_tokens() -> None:
+    """Forget verified tokens, to be called when the signing key is rotated."""
+    decoded_tokens.clear()
+
+
 def decode_token(token: str) -> dict:
+    """Claims of the token, verified once and then cached until it expires."""
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    if (payload := decoded_tokens.get(key)) is not None:
+        DECODED_TOKENS_CACHE.labels(result="hit").inc()
+        return payload
+
+    DECODED_TOKENS_CACHE.labels(result="miss").inc()
+    payload = verify_token(token)
+
+    if (ttl := payload.get("exp", 0) - time.time()) > 0:
+        decoded_tokens.set(key, payload, ttl=ttl)
+
+    return payload
+
+
+def verify_token(token: str) -> dict:
     try:
         return jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
     except (jwt.DecodeError, jwt.InvalidTokenError):
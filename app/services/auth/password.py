@@ -1,9 +1,75 @@
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
+from fastapi import HTTPException, status
+
+from app.utils import metrics
+from settings import PASSWORD_HASHING_MAX_QUEUE, PASSWORD_HASHING_WORKERS
+
+PASSWORD_HASHING_QUEUE = metrics.gauge(
+    "password_hashing_queue_depth", "Password hashes and checks waiting for a worker"
+)
+PASSWORD_HASHING_TIME = metrics.histogram(
+    "password_hashing_seconds", "Time of a password hash or check, including waiting"
+)
+
+executor = None
+
+
+def get_password_executor() -> ThreadPoolExecutor:
+    global executor
+
+    if not executor:
+        # bcrypt releases the GIL, so the threads hash in parallel
+        executor = ThreadPoolExecutor(
+            max_workers=PASSWORD_HASHING_WORKERS, thread_name_prefix="bcrypt"
+        )
+
+    return executor
+
+
+def shutdown_password_executor() -> None:
+    global executor
+
+    if executor:
+        executor.shutdown(cancel_futures=True)
+        executor = None
+
+
+def get_queue_depth() -> int:
+    # Calls submitted to the executor wait in its work queue until a thread is free
+    return executor._work_queue.qsize() if executor else 0
+
+
+PASSWORD_HASHING_QUEUE.set_function(get_queue_depth)
+
+
+async def run_bcrypt(function, *args):
+    """
+    Run a bcrypt function in the password executor, so it doesn't block the event
+    loop for the ~250 ms it takes. Past PASSWORD_HASHING_MAX_QUEUE waiting calls,
+    new ones are rejected instead of queueing for seconds.
+    """
+    if get_queue_depth() >= PASSWORD_HASHING_MAX_QUEUE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Сервер перегружен, попробуйте позже",
+            headers={"Retry-After": "1"},
+        )
+
+    loop = asyncio.get_running_loop()
+    started_at = loop.time()
+    try:
+        return await loop.run_in_executor(get_password_executor(), function, *args)
+    finally:
+        PASSWORD_HASHING_TIME.observe(loop.time() - started_at)
 
 
-def hash_password(password: str) -> bytes:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+async def hash_password(password: str) -> bytes:
+    return await run_bcrypt(bcrypt.hashpw, password.encode(), bcrypt.gensalt())
 
 
-def validate_password(hashed_password: bytes, password: str) -> bool:
-    return bcrypt.checkpw(password.encode(), hashed_password)
+async def validate_password(hashed_password: bytes, password: str) -> bool:
+    return await run_bcrypt(bcrypt.checkpw, password.encode(), hashed_password)
@@ -0,0 +1,174 @@
+"""
+Whether a username or an email is taken, for the signup form which asks on every
+keystroke.
+
+Usernames and emails of all users are added to a Bloom filter kept in Redis as a
+bitmap, so the database is asked only when the filter says "maybe taken". The
+filter is built from the database at startup by one of the workers, merged into the
+bitmap so logins added meanwhile aren't lost, and marked ready. Until then, and
+without Redis, every check goes to the database.
+
+A Bloom filter can't forget, so logins of deleted users stay "maybe taken" and are
+answered by the database. Delete TAKEN_LOGINS_KEY and TAKEN_LOGINS_READY_KEY to
+have the filter rebuilt without them on the next start.
+"""
+
+import asyncio
+import logging
+
+from typing import AsyncIterator, Callable
+
+from redis import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database_initializer import SessionLocal
+from app.redis_initializer import get_optional_redis, report_redis_error
+from app.utils import metrics
+from app.utils.bloom import BloomFilter, get_bloom_positions, get_bloom_size
+from settings import TAKEN_LOGINS_BLOOM_CAPACITY
+
+TAKEN_LOGINS_KEY = "taken-logins"
+TAKEN_LOGINS_READY_KEY = "taken-logins:ready"
+TAKEN_LOGINS_REBUILD_KEY = "taken-logins:rebuild"
+TAKEN_LOGINS_LOCK_KEY = "taken-logins:lock"
+# Another worker may rebuild the filter if the one holding the lock died this long ago
+TAKEN_LOGINS_LOCK_TIMEOUT = 10 * 60
+
+BLOOM_SIZE, BLOOM_HASH_COUNT = get_bloom_size(TAKEN_LOGINS_BLOOM_CAPACITY, 0.01)
+
+# Redis numbers the bits of a byte from the highest, BloomFilter from the lowest
+REVERSED_BITS = bytes(int(f"{byte:08b}"[::-1], 2) for byte in range(256))
+
+LOGIN_AVAILABILITY_CHECKS = metrics.counter(
+    "login_availability_checks_total",
+    "Checks of taken logins by what answered them",
+    ("source",),
+)
+
+# Logins which failed to reach Redis, added when it's available again
+pending_logins: set[str] = set()
+rebuild = None
+
+
+def normalize_login(login: str) -> str:
+    # Case is ignored, it only makes the filter answer "maybe" more often
+    return login.lower()
+
+
+def get_positions(login: str) -> list[int]:
+    return get_bloom_positions(normalize_login(login), BLOOM_SIZE, BLOOM_HASH_COUNT)
+
+
+def get_redis_bitmap(bloom: BloomFilter) -> bytes:
+    return bytes(bloom.bits).translate(REVERSED_BITS)
+
+
+async def add_taken_logins(*logins: str | None) -> None:
+    pending_logins.update(normalize_login(login) for login in logins if login)
+
+    if not pending_logins or not (redis := await get_optional_redis()):
+        return
+
+    try:
+        async with redis.pipeline(transaction=False) as pipeline:
+            for login in pending_logins:
+                for position in get_positions(login):
+                    pipeline.setbit(TAKEN_LOGINS_KEY, position, 1)
+            await pipeline.execute()
+
+        pending_logins.clear()
+    except RedisError as error:
+        report_redis_error(error)
+
+
+async def is_login_possibly_taken(login: str) -> bool:
+    """False if the login is certainly available, otherwise the database knows."""
+    await add_taken_logins()
+
+    if normalize_login(login) in pending_logins:
+        LOGIN_AVAILABILITY_CHECKS.labels(source="database").inc()
+        return True
+
+    if redis := await get_optional_redis():
+        try:
+            async with redis.pipeline(transaction=False) as pipeline:
+                # Both are gone if Redis lost its data or evicted them
+                pipeline.exists(TAKEN_LOGINS_READY_KEY, TAKEN_LOGINS_KEY)
+                for position in get_positions(login):
+                    pipeline.getbit(TAKEN_LOGINS_KEY, position)
+                existing, *bits = await pipeline.execute()
+
+            if existing == 2 and not all(bits):
+                LOGIN_AVAILABILITY_CHECKS.labels(source="filter").inc()
+                return False
+        except RedisError as error:
+            report_redis_error(error)
+
+    LOGIN_AVAILABILITY_CHECKS.labels(source="database").inc()
+
+    return True
+
+
+async def rebuild_taken_logins(
+    get_logins: Callable[[AsyncSession], AsyncIterator[str]],
+) -> None:
+    """Build the filter from the database, unless it's ready or being built."""
+    if not (redis := await get_optional_redis()):
+        return
+
+    try:
+        if await redis.exists(TAKEN_LOGINS_READY_KEY) or not await redis.set(
+            TAKEN_LOGINS_LOCK_KEY, 1, nx=True, ex=TAKEN_LOGINS_LOCK_TIMEOUT
+        ):
+            return
+    except RedisError as error:
+        report_redis_error(error)
+        return
+
+    try:
+        bloom = BloomFilter(TAKEN_LOGINS_BLOOM_CAPACITY)
+        async with SessionLocal() as session:
+            async for login in get_logins(session):
+                bloom.add(normalize_login(login))
+
+        async with redis.pipeline(transaction=True) as pipeline:
+            pipeline.set(TAKEN_LOGINS_REBUILD_KEY, get_redis_bitmap(bloom))
+            pipeline.bitop(
+                "OR", TAKEN_LOGINS_KEY, TAKEN_LOGINS_KEY, TAKEN_LOGINS_REBUILD_KEY
+            )
+            pipeline.delete(TAKEN_LOGINS_REBUILD_KEY)
+            pipeline.set(TAKEN_LOGINS_READY_KEY, 1)
+            await pipeline.execute()
+
+        logging.info("Rebuilt the filter of taken logins")
+    except RedisError as error:
+        report_redis_error(error)
+    except Exception:
+        # Nobody awaits the task, so the error would go unnoticed otherwise
+        logging.exception("Failed to rebuild the filter of taken logins")
+    finally:
+        try:
+            # The next worker to start may retry a failed rebuild
+            await redis.delete(TAKEN_LOGINS_LOCK_KEY)
+        except RedisError as error:
+            report_redis_error(error)
+
+
+def start_taken_logins_rebuild(
+    get_logins: Callable[[AsyncSession], AsyncIterator[str]],
+) -> None:
+    global rebuild
+
+    rebuild = asyncio.create_task(rebuild_taken_logins(get_logins))
+
+
+async def stop_taken_logins_rebuild() -> None:
+    global rebuild
+
+    if rebuild:
+        rebuild.cancel()
+        try:
+            await rebuild
+        except asyncio.CancelledError:
+            pass
+        rebuild = None
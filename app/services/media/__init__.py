@@ -0,0 +1,40 @@
+from app.services.media.store import (
+    BlobStore,
+    BlobWriter,
+    BlobNotFound,
+    LocalBlobStore,
+)
+from app.services.media.sniff import sniff_mime, SNIFF_HEADER_SIZE
+from app.services.media.derivatives import (
+    generate_derivatives,
+    shutdown_derivative_executor,
+)
+
+from settings import MEDIA_STORAGE_BACKEND, MEDIA_ROOT
+
+blob_store = None
+
+
+def get_blob_store() -> BlobStore:
+    global blob_store
+
+    if not blob_store:
+        if MEDIA_STORAGE_BACKEND == "local":
+            blob_store = LocalBlobStore(root=MEDIA_ROOT)
+        else:
+            raise ValueError(f"Unknown media storage backend: {MEDIA_STORAGE_BACKEND}")
+
+    return blob_store
+
+
+__all__ = [
+    "BlobStore",
+    "BlobWriter",
+    "BlobNotFound",
+    "LocalBlobStore",
+    "get_blob_store",
+    "sniff_mime",
+    "SNIFF_HEADER_SIZE",
+    "generate_derivatives",
+    "shutdown_derivative_executor",
+]
@@ -0,0 +1,88 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+from app.services.media.store import BlobStore
+
+from settings import MEDIA_DERIVATIVE_SIZES, MEDIA_DERIVATIVE_WORKERS
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_FORMAT = "WEBP"
+DERIVATIVE_QUALITY = 80
+
+executor = None
+
+
+def render_derivatives(source: str | bytes, sizes: dict[str, int]) -> dict[str, bytes]:
+    """
+    Render downscaled copies of the image. Runs in a worker process, so it gets
+    either a path to the file or its content and returns encoded images by variant.
+    """
+    with Image.open(source if isinstance(source, str) else io.BytesIO(source)) as image:
+        image = ImageOps.exif_transpose(image)
+
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+
+        derivatives = {}
+
+        for variant, size in sizes.items():
+            derivative = image.copy()
+            derivative.thumbnail((size, size))
+
+            buffer = io.BytesIO()
+            derivative.save(buffer, format=DERIVATIVE_FORMAT, quality=DERIVATIVE_QUALITY)
+            derivatives[variant] = buffer.getvalue()
+
+        return derivatives
+
+
+def get_derivative_executor() -> ProcessPoolExecutor:
+    global executor
+
+    if not executor:
+        # Forking a process with running event loop and threads is not safe
+        executor = ProcessPoolExecutor(
+            max_workers=MEDIA_DERIVATIVE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    return executor
+
+
+def shutdown_derivative_executor() -> None:
+    global executor
+
+    if executor:
+        executor.shutdown(cancel_futures=True)
+        executor = None
+
+
+async def generate_derivatives(store: BlobStore, blob_hash: str) -> None:
+    """Render all configured derivatives of the image blob off the event loop and store them."""
+    try:
+        if all(
+            [await store.exists(blob_hash, variant) for variant in MEDIA_DERIVATIVE_SIZES]
+        ):
+            return
+
+        source = store.local_path(blob_hash) or await store.get(blob_hash)
+
+        derivatives = await asyncio.get_running_loop().run_in_executor(
+            get_derivative_executor(),
+            render_derivatives,
+            source,
+            MEDIA_DERIVATIVE_SIZES,
+        )
+
+        for variant, data in derivatives.items():
+            await store.put_derivative(blob_hash, variant, data)
+    except Exception as error:
+        # Media is still served in original size without derivatives
+        logger.error("Failed to generate derivatives of %s: %s", blob_hash, error)
@@ -0,0 +1,26 @@
+SNIFF_HEADER_SIZE = 16
+
+
+def sniff_mime(header: bytes) -> str | None:
+    """
+    Detect the media type by the magic bytes at the start of the file.
+    Declared content types of uploads are not trusted since we serve the files back.
+    """
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if header.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    if header.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video/webm"
+    if header[4:8] == b"ftyp":
+        if header[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+            return "image/heic"
+        if header[8:10] == b"qt":
+            return "video/quicktime"
+        return "video/mp4"
+
+    return None
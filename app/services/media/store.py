@@ -0,0 +1,298 @@
+import asyncio
+import hashlib
+import os
+import re
+import uuid
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+
+BLOB_HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+VARIANT_PATTERN = re.compile(r"^[a-z]+$")
+
+
+class BlobNotFound(Exception):
+    pass
+
+
+class BlobWriter(ABC):
+    """
+    Incremental writer of a single blob. The content hash is calculated
+    on the fly, so the blob never has to be held in memory as a whole.
+    """
+
+    def __init__(self):
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    async def write(self, chunk: bytes) -> None:
+        self.sha256.update(chunk)
+        self.size += len(chunk)
+        await self._write(chunk)
+
+    @abstractmethod
+    async def _write(self, chunk: bytes) -> None:
+        pass
+
+    @abstractmethod
+    async def commit(self) -> str:
+        """Make the written blob available under its hash and return the hash."""
+
+    @abstractmethod
+    async def abort(self) -> None:
+        """Drop everything written so far."""
+
+
+class BlobStore(ABC):
+    """Content-addressed storage for media blobs, keyed by SHA-256 hex digest."""
+
+    @staticmethod
+    def validate_hash(blob_hash: str) -> str:
+        if not isinstance(blob_hash, str) or not BLOB_HASH_PATTERN.match(blob_hash):
+            raise BlobNotFound(blob_hash)
+
+        return blob_hash
+
+    @staticmethod
+    def validate_variant(variant: str) -> str:
+        if not isinstance(variant, str) or not VARIANT_PATTERN.match(variant):
+            raise BlobNotFound(variant)
+
+        return variant
+
+    def local_path(self, blob_hash: str, variant: str | None = None) -> str | None:
+        """Path of the blob on the local filesystem, if the backend has one."""
+        return None
+
+    @abstractmethod
+    async def put(self, data: bytes) -> str:
+        """Store the blob and return its hash. Storing existing content is a no-op."""
+
+    @abstractmethod
+    async def open_writer(self) -> BlobWriter:
+        """Start writing a blob whose hash is not known in advance."""
+
+    @abstractmethod
+    async def get(self, blob_hash: str) -> bytes:
+        """Read the whole blob. Raises BlobNotFound if there is no such blob."""
+
+    @abstractmethod
+    async def put_derivative(self, blob_hash: str, variant: str, data: bytes) -> None:
+        """Store a derivative (e.g. a thumbnail) of the blob under the variant name."""
+
+    @abstractmethod
+    async def get_derivative(self, blob_hash: str, variant: str) -> bytes:
+        pass
+
+    @abstractmethod
+    async def exists(self, blob_hash: str, variant: str | None = None) -> bool:
+        pass
+
+    @abstractmethod
+    async def delete(
+        self, blob_hash: str, unless_modified_since: datetime | None = None
+    ) -> bool:
+        """
+        Delete the blob together with all of its derivatives, unless it was written
+        since unless_modified_since. Returns whether it was deleted.
+        """
+
+    @abstractmethod
+    async def list_blobs(self) -> list[tuple[str, datetime]]:
+        """Hashes of all stored blobs with the time they were last written."""
+
+    async def remove_stale_uploads(self, before: datetime) -> None:
+        """Drop data of uploads which were started before the time and never finished."""
+
+
+def touch(path: str) -> bool:
+    """
+    Update the modification time of an existing blob, False if there is none.
+    Storing the content again restarts the grace period of an unreferenced blob,
+    otherwise the garbage collector could delete it before the new reference
+    is committed.
+    """
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+
+    return True
+
+
+class LocalBlobWriter(BlobWriter):
+    def __init__(self, store: "LocalBlobStore", tmp_path: str):
+        super().__init__()
+        self.store = store
+        self.tmp_path = tmp_path
+        self.file = open(tmp_path, "wb")
+
+    async def _write(self, chunk: bytes) -> None:
+        await asyncio.to_thread(self.file.write, chunk)
+
+    def _commit(self, blob_hash: str) -> None:
+        self.file.close()
+
+        path = self.store.path(blob_hash)
+
+        if touch(path):
+            # The same content is already stored
+            os.remove(self.tmp_path)
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self.tmp_path, path)
+
+    def _abort(self) -> None:
+        self.file.close()
+
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+    async def commit(self) -> str:
+        blob_hash = self.sha256.hexdigest()
+        await asyncio.to_thread(self._commit, blob_hash)
+
+        return blob_hash
+
+    async def abort(self) -> None:
+        await asyncio.to_thread(self._abort)
+
+
+@dataclass
+class LocalBlobStore(BlobStore):
+    """
+    Stores blobs on the local filesystem with a sharded layout:
+    ``<root>/ab/cd/abcd...`` where ``abcd...`` is the SHA-256 of the content.
+    """
+
+    root: str
+
+    def path(self, blob_hash: str, variant: str | None = None) -> str:
+        self.validate_hash(blob_hash)
+
+        name = f"{blob_hash}.{self.validate_variant(variant)}" if variant else blob_hash
+
+        return os.path.join(self.root, blob_hash[:2], blob_hash[2:4], name)
+
+    def local_path(self, blob_hash: str, variant: str | None = None) -> str | None:
+        return self.path(blob_hash, variant)
+
+    def _open_writer(self) -> LocalBlobWriter:
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        return LocalBlobWriter(
+            store=self, tmp_path=os.path.join(tmp_dir, f"{uuid.uuid4().hex}.tmp")
+        )
+
+    def _write(self, path: str, data: bytes) -> None:
+        if touch(path):
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file first, so readers never see a partial blob
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _read(self, path: str) -> bytes:
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise BlobNotFound(path)
+
+    def _delete(
+        self, blob_hash: str, unless_modified_since: datetime | None = None
+    ) -> bool:
+        path = self.path(blob_hash)
+
+        if unless_modified_since is not None:
+            try:
+                modified = datetime.fromtimestamp(os.path.getmtime(path))
+            except FileNotFoundError:
+                modified = None
+
+            if modified and modified >= unless_modified_since:
+                # Stored again by an upload whose reference may not be committed yet
+                return False
+
+        try:
+            names = os.listdir(os.path.dirname(path))
+        except FileNotFoundError:
+            return True
+
+        # Derivatives are stored next to the blob as "<hash>.<variant>"
+        for name in names:
+            if name == blob_hash or name.startswith(f"{blob_hash}."):
+                try:
+                    os.remove(os.path.join(os.path.dirname(path), name))
+                except FileNotFoundError:
+                    pass
+
+        return True
+
+    def _list_blobs(self) -> list[tuple[str, datetime]]:
+        blobs = []
+
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if BLOB_HASH_PATTERN.match(name):
+                    mtime = os.path.getmtime(os.path.join(directory, name))
+                    blobs.append((name, datetime.fromtimestamp(mtime)))
+
+        return blobs
+
+    def _remove_stale_uploads(self, before: datetime) -> None:
+        tmp_dir = os.path.join(self.root, "tmp")
+
+        try:
+            names = os.listdir(tmp_dir)
+        except FileNotFoundError:
+            return
+
+        for name in names:
+            path = os.path.join(tmp_dir, name)
+            try:
+                if datetime.fromtimestamp(os.path.getmtime(path)) < before:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    async def put(self, data: bytes) -> str:
+        blob_hash = hashlib.sha256(data).hexdigest()
+        await asyncio.to_thread(self._write, self.path(blob_hash), data)
+
+        return blob_hash
+
+    async def open_writer(self) -> LocalBlobWriter:
+        return await asyncio.to_thread(self._open_writer)
+
+    async def get(self, blob_hash: str) -> bytes:
+        return await asyncio.to_thread(self._read, self.path(blob_hash))
+
+    async def put_derivative(self, blob_hash: str, variant: str, data: bytes) -> None:
+        await asyncio.to_thread(self._write, self.path(blob_hash, variant), data)
+
+    async def get_derivative(self, blob_hash: str, variant: str) -> bytes:
+        return await asyncio.to_thread(self._read, self.path(blob_hash, variant))
+
+    async def exists(self, blob_hash: str, variant: str | None = None) -> bool:
+        return await asyncio.to_thread(os.path.exists, self.path(blob_hash, variant))
+
+    async def delete(
+        self, blob_hash: str, unless_modified_since: datetime | None = None
+    ) -> bool:
+        return await asyncio.to_thread(self._delete, blob_hash, unless_modified_since)
+
+    async def list_blobs(self) -> list[tuple[str, datetime]]:
+        return await asyncio.to_thread(self._list_blobs)
+
+    async def remove_stale_uploads(self, before: datetime) -> None:
+        await asyncio.to_thread(self._remove_stale_uploads, before)
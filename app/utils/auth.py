@@ -5,12 +5,17 @@ from fastapi import HTTPException, Depends, status
 from app.database_initializer import get_db
 from app.models.user import User, Role
 from app.services.auth.jwt import decode_token
+from app.utils.principal import (
+    Principal,
+    cache_principal,
+    get_account_version,
+    get_cached_principal,
+)
 
 
-async def get_current_user(
+def get_access_token_payload(
     credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer()),
-    session: AsyncSession = Depends(get_db),
-):
+) -> dict:
     payload = decode_token(credentials.credentials)
 
     if payload["type"] != "access":
@@ -19,18 +24,71 @@ async def get_current_user(
             detail="Invalid token type",
         )
 
-    user = await User.get_by_id_or_login(session=session, user_id=payload["id"])
+    return payload
 
-    if not user:
+
+def raise_user_not_found():
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Пользователь не найден в базе данных",
+    )
+
+
+def verify_token_version(payload: dict, version: int):
+    # Tokens issued before the version was added have none
+    if payload.get("ver", 0) < version:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Пользователь не найден в базе данных",
+            detail="Данные пользователя изменились, обновите токен",
         )
 
+
+async def get_current_principal(
+    payload: dict = Depends(get_access_token_payload),
+    session: AsyncSession = Depends(get_db),
+) -> Principal:
+    """
+    The authenticated user from the claims of the token, or from the cache if the
+    version of the account is unknown. See app.utils.principal.
+    """
+    if "ver" in payload:
+        version = await get_account_version(payload["id"])
+
+        if version is not None:
+            verify_token_version(payload, version)
+
+            return Principal.from_claims(payload)
+
+    if not (principal := await get_cached_principal(payload["id"])):
+        principal = await User.get_principal(session, user_id=payload["id"])
+
+        if not principal:
+            raise_user_not_found()
+
+        await cache_principal(principal)
+
+    verify_token_version(payload, principal.token_version)
+
+    return principal
+
+
+async def get_current_user(
+    payload: dict = Depends(get_access_token_payload),
+    session: AsyncSession = Depends(get_db),
+) -> User:
+    """The authenticated user loaded from the database, for endpoints which change it."""
+    user = await User.get_by_id_or_login(session=session, user_id=payload["id"])
+
+    if not user:
+        raise_user_not_found()
+
+    verify_token_version(payload, user.token_version)
+    await cache_principal(Principal.from_user(user))
+
     return user
 
 
-async def verify_organization_admin(user: User):
+async def verify_organization_admin(user: User | Principal):
     try:
         assert user.role == Role.org_admin
         assert user.organization_id
@@ -42,7 +100,7 @@ async def verify_organization_admin(user: User):
         )
 
 
-async def is_user_service_admin(user: User):
+async def is_user_service_admin(user: User | Principal):
     try:
         assert user.role == Role.admin
 
@@ -0,0 +1,41 @@
+"""
+Bloom filters: sets which answer "maybe in" or "certainly not in" in constant
+memory. They are sized for a capacity and the rate of false "maybe" answers
+wanted at that capacity.
+"""
+
+import hashlib
+import math
+
+
+def get_bloom_size(capacity: int, error_rate: float) -> tuple[int, int]:
+    """Bits and hash functions of a filter."""
+    size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    hash_count = max(round(size / capacity * math.log(2)), 1)
+
+    return size, hash_count
+
+
+def get_bloom_positions(item: str, size: int, hash_count: int) -> list[int]:
+    """Bits of the item, by double hashing of one digest."""
+    digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+    first = int.from_bytes(digest[:8], "little")
+    second = int.from_bytes(digest[8:], "little") | 1
+
+    return [(first + i * second) % size for i in range(hash_count)]
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.size, self.hash_count = get_bloom_size(capacity, error_rate)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, item: str) -> None:
+        for position in get_bloom_positions(item, self.size, self.hash_count):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in get_bloom_positions(item, self.size, self.hash_count)
+        )
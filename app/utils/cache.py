@@ -0,0 +1,77 @@
+import logging
+import time
+
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from fastapi_cache import FastAPICache
+
+FAVORITE_STORIES_NAMESPACE = "favorite-stories"
+
+
+def organization_key_builder(
+    func, namespace: str = "", *, request=None, response=None, args=(), kwargs=None
+) -> str:
+    """Key of a response cached per organization, other arguments don't change it."""
+    return f"{namespace}:{kwargs['organization_id']}"
+
+
+async def invalidate_favorite_stories(*organization_ids: int | None) -> None:
+    for organization_id in set(filter(None, organization_ids)):
+        try:
+            # FastAPICache.clear always passes a namespace, which makes the backend
+            # drop every key under the prefix, so the key is cleared directly
+            await FastAPICache.get_backend().clear(
+                key=f"{FastAPICache.get_prefix()}:{FAVORITE_STORIES_NAMESPACE}:{organization_id}"
+            )
+        except KeyError:
+            # The in-memory backend raises for keys which aren't cached
+            pass
+        except Exception as e:
+            # The entry expires by itself, so the showcase is only stale for a while
+            logging.warning(
+                "Failed to invalidate favorite stories of organization %s: %s",
+                organization_id,
+                e,
+            )
+
+
+class TTLCache:
+    """
+    In-process cache which drops entries after their time to live, and the least
+    recently used ones when it's full.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
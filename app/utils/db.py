@@ -1,12 +1,88 @@
+from contextlib import asynccontextmanager
+
+from sqlalchemy import inspect
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+
+def dialect_insert(session: AsyncSession, model):
+    """INSERT of the session's dialect, which supports ``on_conflict_do_*``."""
+    if session.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+
+    return sqlite.insert(model)
+
+
+UNIT_OF_WORK = "unit_of_work"
+
+
+@asynccontextmanager
+async def unit_of_work(session: AsyncSession):
+    """
+    Compose writes of several model methods into one transaction. Within the block
+    they don't commit, the changes are committed once when it exits or rolled back
+    on an error. Nested blocks join the outer one.
+    """
+    if session.info.get(UNIT_OF_WORK):
+        yield session
+        return
+
+    session.info[UNIT_OF_WORK] = True
+    try:
+        yield session
+        await session.commit()
+    except BaseException:
+        await session.rollback()
+        raise
+    finally:
+        session.info.pop(UNIT_OF_WORK, None)
+
+
+async def save(session: AsyncSession, flush: bool = False) -> None:
+    """
+    Commit the changes of the session. Within a unit of work they are committed when
+    it ends instead, and only flushed now with flush, e.g. to get ids of new rows.
+
+    Nothing is refreshed afterwards: the session doesn't expire instances on commit,
+    and server defaults are fetched by the flush of models with eager_defaults.
+    """
+    if not session.info.get(UNIT_OF_WORK):
+        await session.commit()
+    elif flush:
+        await session.flush()
+
+
+def get_deferred_column_names(model) -> list[str]:
+    return [attr.key for attr in inspect(model).column_attrs if attr.deferred]
+
+
+async def load_deferred(session: AsyncSession, instance, *attribute_names: str) -> None:
+    """Explicitly load deferred columns of the instance which aren't loaded yet."""
+    unloaded = inspect(instance).unloaded
+    to_load = [name for name in attribute_names if name in unloaded]
+
+    if to_load:
+        await session.refresh(instance, attribute_names=to_load)
 
 
 async def create_model_instance(session: AsyncSession, model, **kwargs):
     instance = model(**kwargs)
+
+    # Deferred columns which weren't set would raise on access instead of being empty
+    for key in get_deferred_column_names(model):
+        if key not in kwargs and model.__table__.columns[key].default is None:
+            setattr(instance, key, None)
+
     session.add(instance)
 
-    await session.commit()
-    await session.refresh(instance)
+    await save(session, flush=True)
+
+    # Nothing can reference the new row yet, so its collections are known to be empty
+    # and don't have to be loaded to be serialized
+    for relationship in inspect(model).relationships:
+        if relationship.uselist and relationship.key not in kwargs:
+            set_committed_value(instance, relationship.key, [])
 
     return instance
 
@@ -17,7 +93,6 @@ async def update_model_instance(session: AsyncSession, instance, **kwargs):
 
     session.add(instance)
 
-    await session.commit()
-    await session.refresh(instance)
+    await save(session)
 
     return instance
@@ -0,0 +1,115 @@
+"""
+Email verification codes.
+
+A code is kept in Redis for EMAIL_CODE_EXPIRE with the count of attempts to enter
+it, counted atomically by a Lua script. After EMAIL_CODE_MAX_ATTEMPTS wrong attempts
+the code is dropped and a new one has to be requested. Without Redis codes are kept
+in the worker which issued them.
+"""
+
+import hmac
+import secrets
+
+from redis import RedisError
+
+from app.redis_initializer import get_optional_redis, get_script, report_redis_error
+from app.utils.cache import TTLCache
+from settings import EMAIL_CODE_EXPIRE, EMAIL_CODE_MAX_ATTEMPTS
+
+EMAIL_CODE_NAMESPACE = "email-code"
+# Codes of the in-process fallback, the least recently used are dropped beyond this
+LOCAL_CODES_SIZE = 10000
+
+# Counts the attempt and returns the code, or nothing if there is no code or the
+# attempts are exhausted
+ATTEMPT_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return false
+end
+
+if redis.call("HINCRBY", KEYS[1], "attempts", 1) > tonumber(ARGV[1]) then
+    redis.call("DEL", KEYS[1])
+    return false
+end
+
+return redis.call("HGET", KEYS[1], "code")
+"""
+
+# Code and attempts by email
+local_codes = TTLCache(maxsize=LOCAL_CODES_SIZE)
+
+
+def get_email_code_key(email: str) -> str:
+    return f"{EMAIL_CODE_NAMESPACE}:{email.lower()}"
+
+
+def decode(value: str | bytes) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+async def issue_email_code(email: str) -> str:
+    """A new code for the email, replacing the previous one and its attempts."""
+    code = f"{secrets.randbelow(10**6):06}"
+    key = get_email_code_key(email)
+
+    if redis := await get_optional_redis():
+        try:
+            async with redis.pipeline(transaction=True) as pipeline:
+                pipeline.delete(key)
+                pipeline.hset(key, mapping={"code": code, "attempts": 0})
+                pipeline.expire(key, EMAIL_CODE_EXPIRE)
+                await pipeline.execute()
+
+            return code
+        except RedisError as error:
+            report_redis_error(error)
+
+    local_codes.set(key, [code, 0], ttl=EMAIL_CODE_EXPIRE)
+
+    return code
+
+
+def attempt_local_code(key: str) -> str | None:
+    if not (entry := local_codes.get(key)):
+        return None
+
+    entry[1] += 1
+    if entry[1] > EMAIL_CODE_MAX_ATTEMPTS:
+        local_codes.pop(key)
+        return None
+
+    return entry[0]
+
+
+async def check_email_code(email: str, code: str) -> bool:
+    """Whether the code was issued for the email, a correct code is used up."""
+    key = get_email_code_key(email)
+    redis = await get_optional_redis()
+    expected = None
+
+    if redis:
+        try:
+            script = get_script(redis, ATTEMPT_SCRIPT)
+            if value := await script(keys=[key], args=[EMAIL_CODE_MAX_ATTEMPTS]):
+                expected = decode(value)
+        except RedisError as error:
+            report_redis_error(error)
+            redis = None
+
+    if expected is None:
+        expected = attempt_local_code(key)
+
+    if expected is None or not hmac.compare_digest(
+        expected.encode(), code.encode()
+    ):
+        return False
+
+    local_codes.pop(key)
+    if redis:
+        try:
+            await redis.delete(key)
+        except RedisError as error:
+            # The code expires by itself
+            report_redis_error(error)
+
+    return True
@@ -0,0 +1,144 @@
+import logging
+
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi import BackgroundTasks, HTTPException, UploadFile, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.media import Media
+from app.services.media import (
+    BlobStore,
+    get_blob_store,
+    generate_derivatives,
+    sniff_mime,
+    SNIFF_HEADER_SIZE,
+)
+
+from settings import (
+    MEDIA_UPLOAD_CHUNK_SIZE,
+    MEDIA_MAX_UPLOAD_SIZE,
+    MEDIA_ALLOWED_TYPES,
+    MEDIA_DERIVATIVE_SOURCE_TYPES,
+    MEDIA_GC_GRACE_PERIOD,
+    MEDIA_GC_BATCH_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def save_upload(
+    session: AsyncSession,
+    upload: UploadFile,
+    background_tasks: Optional[BackgroundTasks] = None,
+) -> dict:
+    """
+    Stream uploaded file to the blob store chunk by chunk and register its metadata
+    in the session. The type is checked on the first chunk and the size on every one,
+    so peak memory doesn't depend on the file size.
+    If background tasks are passed, derivatives of images are generated after the response.
+    Returns the reference which should be stored in the owning row.
+    """
+    store = get_blob_store()
+    writer = await store.open_writer()
+    mime = None
+
+    try:
+        while chunk := await upload.read(MEDIA_UPLOAD_CHUNK_SIZE):
+            if mime is None:
+                mime = sniff_mime(chunk[:SNIFF_HEADER_SIZE])
+
+                if mime not in MEDIA_ALLOWED_TYPES:
+                    raise HTTPException(
+                        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                        detail="Неподдерживаемый формат файла",
+                    )
+
+            if writer.size + len(chunk) > MEDIA_MAX_UPLOAD_SIZE:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail="Файл слишком большой",
+                )
+
+            await writer.write(chunk)
+
+        if mime is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Файл пустой"
+            )
+    except BaseException:
+        await writer.abort()
+        raise
+
+    blob_hash = await writer.commit()
+
+    media = await Media.register(
+        session=session, blob_hash=blob_hash, size=writer.size, mime=mime
+    )
+
+    if background_tasks is not None and mime in MEDIA_DERIVATIVE_SOURCE_TYPES:
+        background_tasks.add_task(generate_derivatives, store, blob_hash)
+
+    return media.as_reference()
+
+
+async def save_uploads(
+    session: AsyncSession,
+    uploads: Optional[List[UploadFile]],
+    background_tasks: Optional[BackgroundTasks] = None,
+) -> Optional[List[dict]]:
+    if not uploads:
+        return None
+
+    return [await save_upload(session, upload, background_tasks) for upload in uploads]
+
+
+async def collect_media_garbage(
+    session: AsyncSession,
+    store: Optional[BlobStore] = None,
+    dry_run: bool = False,
+) -> List[str]:
+    """
+    Delete blobs which have no references for longer than the grace period:
+    media with zero reference count and blobs left without metadata by failed requests.
+    The grace period protects uploads which aren't referenced yet.
+    Returns hashes of the collected blobs.
+    """
+    store = store or get_blob_store()
+    before = datetime.now() - timedelta(seconds=MEDIA_GC_GRACE_PERIOD)
+    collected = []
+
+    if dry_run:
+        collected.extend(await Media.get_unreferenced(session, before=before))
+
+    while not dry_run and (
+        hashes := await Media.get_unreferenced(
+            session, before=before, limit=MEDIA_GC_BATCH_SIZE
+        )
+    ):
+        # Rows are deleted first, so a failure leaves an orphaned blob and never
+        # a reference to a missing one. Orphaned blobs are collected below.
+        # Content uploaded again after the rows were deleted has a fresh blob,
+        # which is kept for its new row.
+        for blob_hash in await Media.delete_unreferenced(session, hashes, before=before):
+            if await store.delete(blob_hash, unless_modified_since=before):
+                collected.append(blob_hash)
+
+    orphaned = [blob_hash for blob_hash, modified in await store.list_blobs() if modified < before]
+
+    for i in range(0, len(orphaned), MEDIA_GC_BATCH_SIZE):
+        batch = orphaned[i : i + MEDIA_GC_BATCH_SIZE]
+        known = await Media.get_known_hashes(session, batch)
+
+        for blob_hash in batch:
+            if blob_hash not in known and (
+                dry_run or await store.delete(blob_hash, unless_modified_since=before)
+            ):
+                collected.append(blob_hash)
+
+    if not dry_run:
+        await store.remove_stale_uploads(before=before)
+
+    logger.info("%s unreferenced media blobs collected", len(collected))
+
+    return collected
@@ -0,0 +1,80 @@
+import binascii
+import json
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import Select, tuple_
+
+from settings import PAGE_SIZE, MAX_PAGE_SIZE
+
+
+@dataclass
+class PageParams:
+    cursor: Optional[str] = None
+    limit: int = PAGE_SIZE
+
+
+@dataclass
+class Page:
+    items: list
+    next_cursor: Optional[str] = None
+
+
+def get_page_params(
+    cursor: Optional[str] = Query(
+        None, description="Cursor from the previous page, omit for the first page"
+    ),
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+) -> PageParams:
+    return PageParams(cursor=cursor, limit=limit)
+
+
+def encode_cursor(values: Sequence) -> str:
+    return urlsafe_b64encode(json.dumps(list(values)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence) -> list:
+    """Decode key values from the cursor, which is opaque for clients and can't be trusted."""
+    try:
+        values = json.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+
+        assert isinstance(values, list) and len(values) == len(keys)
+        assert all(
+            isinstance(value, key.type.python_type)
+            for value, key in zip(values, keys)
+        )
+    except (AssertionError, ValueError, binascii.Error, NotImplementedError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный курсор"
+        )
+
+    return values
+
+
+def paginate(query: Select, keys: Sequence, page: PageParams) -> Select:
+    """
+    Restrict the query to the page after the cursor, ordered by the keys.
+    Keys have to be unique together and selected by the query. One extra row is
+    fetched to know whether there is the next page.
+    """
+    if page.cursor:
+        values = decode_cursor(page.cursor, keys)
+        query = query.where(tuple_(*keys) > tuple_(*values))
+
+    return query.order_by(*keys).limit(page.limit + 1)
+
+
+def get_page(rows: Sequence, keys: Sequence, page: PageParams) -> Page:
+    """Build the page from rows or entities fetched by the paginated query."""
+    items = list(rows[: page.limit])
+
+    if len(rows) <= page.limit:
+        return Page(items=items)
+
+    return Page(
+        items=items,
+        next_cursor=encode_cursor([getattr(items[-1], key.key) for key in keys]),
+    )
@@ -0,0 +1,66 @@
+"""
+Metrics of the connection pools: how long requests wait for a connection and how
+many of the connections are in use.
+"""
+
+import time
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.utils import metrics
+
+POOL_CHECKOUT_TIME = metrics.histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a connection from the pool, including opening new ones",
+    labelnames=("engine",),
+)
+POOL_SIZE = metrics.gauge(
+    "db_pool_size", "Connections the pool keeps open", labelnames=("engine",)
+)
+POOL_CHECKED_OUT = metrics.gauge(
+    "db_pool_checked_out", "Connections in use", labelnames=("engine",)
+)
+POOL_OVERFLOW = metrics.gauge(
+    "db_pool_overflow", "Connections opened over the pool size", labelnames=("engine",)
+)
+POOL_SATURATION = metrics.gauge(
+    "db_pool_saturation",
+    "Connections in use relative to the most the pool may open",
+    labelnames=("engine",),
+)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """The pool of the async engines which records checkout wait time."""
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            # The logging name of the pool is the name of its engine
+            POOL_CHECKOUT_TIME.labels(engine=self.logging_name).observe(
+                time.perf_counter() - started_at
+            )
+
+
+def instrument_pool(engine: AsyncEngine, name: str) -> None:
+    """Report pool usage of the engine, read when the metrics are collected."""
+    if not isinstance(engine.pool, QueuePool):
+        return
+
+    # The pool is looked up every time, it's replaced when the engine is disposed
+    def get_pool() -> QueuePool:
+        return engine.pool
+
+    def get_saturation() -> float:
+        pool = get_pool()
+        return pool.checkedout() / (pool.size() + max(pool._max_overflow, 0))
+
+    POOL_SIZE.labels(engine=name).set_function(lambda: get_pool().size())
+    POOL_CHECKED_OUT.labels(engine=name).set_function(lambda: get_pool().checkedout())
+    POOL_OVERFLOW.labels(engine=name).set_function(
+        lambda: max(get_pool().overflow(), 0)
+    )
+    POOL_SATURATION.labels(engine=name).set_function(get_saturation)
@@ -0,0 +1,199 @@
+"""
+The authenticated user as most endpoints need it: id, role, organization and whether
+the email is confirmed.
+
+Principals are cached in Redis for PRINCIPAL_CACHE_EXPIRE and in the worker for
+PRINCIPAL_LOCAL_CACHE_EXPIRE, so authenticated requests usually don't query the
+user. Changes of the user invalidate both, other workers see them when their own
+short-lived entry expires. Without Redis only the worker cache is used.
+
+Access tokens carry the principal in their claims, with the version of the account
+they were issued for. The version is raised when the role or the organization of
+the user changes, or the user is deleted, and kept in Redis for the lifetime of
+access tokens. Tokens of an older version are rejected, so the claims can be
+trusted without loading the user.
+"""
+
+import json
+
+from dataclasses import asdict, dataclass
+
+from redis import RedisError
+
+from app.redis_initializer import get_optional_redis, report_redis_error
+from app.types.enums import Role
+from app.utils.cache import TTLCache
+from settings import (
+    ACCESS_TOKEN_EXPIRE_TIME,
+    PRINCIPAL_CACHE_EXPIRE,
+    PRINCIPAL_LOCAL_CACHE_EXPIRE,
+    PRINCIPAL_LOCAL_CACHE_SIZE,
+)
+
+PRINCIPAL_NAMESPACE = "principal"
+ACCOUNT_VERSION_NAMESPACE = "account-version"
+
+local_principals = TTLCache(maxsize=PRINCIPAL_LOCAL_CACHE_SIZE)
+local_versions = TTLCache(maxsize=PRINCIPAL_LOCAL_CACHE_SIZE)
+# Versions which failed to reach Redis, published when it's available again
+pending_versions: dict[int, int] = {}
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    role: Role
+    organization_id: int | None
+    is_email_confirmed: bool
+    token_version: int = 0
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(
+            id=user.id,
+            role=Role(user.role),
+            organization_id=user.organization_id,
+            is_email_confirmed=bool(user.is_email_confirmed),
+            token_version=user.token_version or 0,
+        )
+
+    @classmethod
+    def from_claims(cls, payload: dict) -> "Principal":
+        return cls(
+            id=payload["id"],
+            role=Role(payload["role"]),
+            organization_id=payload["organization_id"],
+            # Tokens are issued only to users with confirmed email
+            is_email_confirmed=True,
+            token_version=payload["ver"],
+        )
+
+    def dumps(self) -> str:
+        return json.dumps({**asdict(self), "role": self.role.value})
+
+    @classmethod
+    def loads(cls, value: str | bytes) -> "Principal":
+        data = json.loads(value)
+        data["role"] = Role(data["role"])
+
+        return cls(**data)
+
+
+def get_principal_key(user_id: int) -> str:
+    return f"{PRINCIPAL_NAMESPACE}:{user_id}"
+
+
+async def get_cached_principal(user_id: int) -> Principal | None:
+    if principal := local_principals.get(user_id):
+        return principal
+
+    if not (redis := await get_optional_redis()):
+        return None
+
+    try:
+        value = await redis.get(get_principal_key(user_id))
+    except RedisError as error:
+        report_redis_error(error)
+        return None
+
+    if value is None:
+        return None
+
+    principal = Principal.loads(value)
+    local_principals.set(user_id, principal, ttl=PRINCIPAL_LOCAL_CACHE_EXPIRE)
+
+    return principal
+
+
+async def cache_principal(principal: Principal) -> None:
+    local_principals.set(principal.id, principal, ttl=PRINCIPAL_LOCAL_CACHE_EXPIRE)
+
+    if redis := await get_optional_redis():
+        try:
+            await redis.setex(
+                get_principal_key(principal.id),
+                PRINCIPAL_CACHE_EXPIRE,
+                principal.dumps(),
+            )
+        except RedisError as error:
+            report_redis_error(error)
+
+
+async def invalidate_principal(user_id: int) -> None:
+    local_principals.pop(user_id)
+
+    if redis := await get_optional_redis():
+        try:
+            await redis.delete(get_principal_key(user_id))
+        except RedisError as error:
+            # The entry expires by itself, so the principal is only stale for a while
+            report_redis_error(error)
+
+
+def get_account_version_key(user_id: int) -> str:
+    return f"{ACCOUNT_VERSION_NAMESPACE}:{user_id}"
+
+
+async def get_account_version(user_id: int) -> int | None:
+    """
+    Version of the account if it changed within the lifetime of access tokens,
+    otherwise 0. None if it's unknown because Redis is unavailable or doesn't have
+    the latest version yet.
+    """
+    await publish_pending_versions()
+
+    if user_id in pending_versions:
+        return None
+
+    if (version := local_versions.get(user_id)) is not None:
+        return version
+
+    if not (redis := await get_optional_redis()):
+        return None
+
+    try:
+        value = await redis.get(get_account_version_key(user_id))
+    except RedisError as error:
+        report_redis_error(error)
+        return None
+
+    version = int(value) if value is not None else 0
+    local_versions.set(user_id, version, ttl=PRINCIPAL_LOCAL_CACHE_EXPIRE)
+
+    return version
+
+
+async def publish_pending_versions() -> None:
+    if not pending_versions or not (redis := await get_optional_redis()):
+        return
+
+    published = dict(pending_versions)
+
+    try:
+        async with redis.pipeline(transaction=False) as pipeline:
+            for user_id, version in published.items():
+                # Older tokens have expired by the time the key does
+                pipeline.setex(
+                    get_account_version_key(user_id), ACCESS_TOKEN_EXPIRE_TIME, version
+                )
+            await pipeline.execute()
+    except RedisError as error:
+        report_redis_error(error)
+        return
+
+    for user_id, version in published.items():
+        # Unless it was raised again meanwhile
+        if pending_versions.get(user_id) == version:
+            del pending_versions[user_id]
+
+
+async def publish_account_version(user_id: int, version: int) -> None:
+    """
+    Reject tokens of older versions. Until the version reaches Redis it's retried,
+    and the version is unknown to this worker, so tokens are checked against the
+    database. Other workers may accept older tokens meanwhile.
+    """
+    local_versions.set(user_id, version, ttl=PRINCIPAL_LOCAL_CACHE_EXPIRE)
+    pending_versions[user_id] = max(version, pending_versions.get(user_id, 0))
+
+    await publish_pending_versions()
@@ -0,0 +1,60 @@
+"""
+Read path for list endpoints. Only the columns a response schema needs are selected
+as rows, which are validated and serialized at once with a cached adapter of the list
+type. No ORM entities are built, so there's no identity map bookkeeping and no
+relationship loading.
+"""
+
+from functools import cache
+from typing import List, Sequence
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import inspect
+
+from app.schemas.pagination import PageSchema
+from app.utils.pagination import Page
+
+
+@cache
+def get_list_adapter(schema: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[schema])
+
+
+@cache
+def get_page_adapter(schema: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(PageSchema[schema])
+
+
+@cache
+def get_schema_columns(model, schema: type[BaseModel]) -> tuple:
+    """Columns of the model which are fields of the schema."""
+    return tuple(
+        getattr(model, attr.key)
+        for attr in inspect(model).column_attrs
+        if attr.key in schema.model_fields
+    )
+
+
+def list_response(schema: type[BaseModel], items: Sequence) -> Response:
+    """
+    Validate rows or dicts as a list of the schema and serialize it to JSON response.
+    The response bypasses validation of the endpoint's response model, which only
+    documents it.
+    """
+    adapter = get_list_adapter(schema)
+
+    return Response(
+        content=adapter.dump_json(adapter.validate_python(items, from_attributes=True)),
+        media_type="application/json",
+    )
+
+
+def page_response(schema: type[BaseModel], page: Page) -> Response:
+    """Same as list_response, but for a page of rows, entities or dicts."""
+    adapter = get_page_adapter(schema)
+    validated = adapter.validate_python(
+        {"items": page.items, "next_cursor": page.next_cursor}, from_attributes=True
+    )
+
+    return Response(content=adapter.dump_json(validated), media_type="application/json")
@@ -0,0 +1,143 @@
+"""
+Statements and database time of every request, counted by cursor events of the engine.
+
+Routers get a budget of statements per request, QUERY_BUDGET by default or their own
+with query_budget. Going over it is logged, or raised when QUERY_BUDGET_STRICT is set,
+as it is in tests, so a relationship loaded per row fails the test of the route.
+"""
+
+import logging
+import time
+
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from settings import DEBUG, QUERY_BUDGET, QUERY_BUDGET_STRICT
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_HEADER = "X-DB-Query-Count"
+QUERY_TIME_HEADER = "X-DB-Query-Time"
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    duration: float = 0.0
+
+    @property
+    def milliseconds(self) -> float:
+        return self.duration * 1000
+
+
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def get_query_stats() -> QueryStats | None:
+    """Stats of the current request, None outside of requests."""
+    return _query_stats.get()
+
+
+def query_budget(statements: int):
+    """Set the number of statements the endpoint may issue per request."""
+
+    def decorator(endpoint):
+        endpoint.query_budget = statements
+        return endpoint
+
+    return decorator
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = conn.info["query_started_at"].pop()
+
+    # The session runs the statement in a greenlet with the context of the request
+    if stats := _query_stats.get():
+        stats.count += 1
+        stats.duration += time.perf_counter() - started_at
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    """
+    Counts statements of the request. In debug mode they are sent in response headers,
+    otherwise logged. The budget is checked when the response starts.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                check_budget(scope, stats)
+
+                if DEBUG:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (QUERY_COUNT_HEADER.lower().encode(), str(stats.count).encode()),
+                        (
+                            QUERY_TIME_HEADER.lower().encode(),
+                            f"{stats.milliseconds:.2f}".encode(),
+                        ),
+                    ]
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _query_stats.reset(token)
+
+        if not DEBUG:
+            logger.info(
+                "%s %s: %d queries in %.2f ms",
+                scope["method"],
+                get_route_path(scope),
+                stats.count,
+                stats.milliseconds,
+            )
+
+
+def get_route_path(scope) -> str:
+    route = scope.get("route")
+
+    return route.path if route else scope["path"]
+
+
+def check_budget(scope, stats: QueryStats) -> None:
+    budget = getattr(scope.get("endpoint"), "query_budget", QUERY_BUDGET)
+
+    if stats.count <= budget:
+        return
+
+    message = (
+        f"{scope['method']} {get_route_path(scope)} issued {stats.count} queries, "
+        f"the budget is {budget}"
+    )
+
+    if QUERY_BUDGET_STRICT:
+        raise QueryBudgetExceeded(message)
+
+    logger.warning(message)
@@ -0,0 +1,148 @@
+"""
+Sliding-window rate limits for endpoints which are expensive or can be brute-forced.
+
+Attempts are counted by client IP and, for endpoints given a key function, by the
+login they target. The counts live in Redis, updated atomically by a Lua script so
+all workers share them. Without Redis every worker counts on its own.
+
+Limits are route dependencies, resolved before the endpoint touches the database:
+
+    @router.post("/login", dependencies=[Depends(LOGIN_RATE_LIMIT)])
+"""
+
+import math
+import time
+import uuid
+
+from collections import deque
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException, Request, status
+from redis import RedisError
+
+from app.redis_initializer import get_optional_redis, get_script, report_redis_error
+from app.utils import metrics
+from settings import RATE_LIMIT_PER_IP, RATE_LIMIT_PER_LOGIN, RATE_LIMIT_WINDOW
+
+RATE_LIMIT_NAMESPACE = "rate-limit"
+# Windows of the in-process fallback are pruned when there are more keys than this
+LOCAL_WINDOWS_SIZE = 10000
+
+RATE_LIMIT_REJECTIONS = metrics.counter(
+    "rate_limit_rejections_total", "Requests rejected by rate limits", ("scope",)
+)
+
+# The log of attempts in the window is a sorted set scored by time in milliseconds.
+# Returns 0 if the attempt is allowed, otherwise milliseconds until it would be.
+SLIDING_WINDOW_SCRIPT = """
+local time = redis.call("TIME")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+
+redis.call("ZREMRANGEBYSCORE", KEYS[1], 0, now - window)
+
+if redis.call("ZCARD", KEYS[1]) >= limit then
+    local oldest = redis.call("ZRANGE", KEYS[1], 0, 0, "WITHSCORES")
+    return math.max(tonumber(oldest[2]) + window - now, 1)
+end
+
+redis.call("ZADD", KEYS[1], now, ARGV[3])
+redis.call("PEXPIRE", KEYS[1], window)
+
+return 0
+"""
+
+local_windows: dict[str, deque] = {}
+
+
+def hit_local_window(key: str, limit: int, window: float) -> float:
+    """The fallback of the script, seconds until the attempt would be allowed."""
+    now = time.monotonic()
+
+    if len(local_windows) > LOCAL_WINDOWS_SIZE:
+        for stale_key in [
+            k for k, attempts in local_windows.items() if attempts[-1] <= now - window
+        ]:
+            del local_windows[stale_key]
+
+    attempts = local_windows.setdefault(key, deque())
+    while attempts and attempts[0] <= now - window:
+        attempts.popleft()
+
+    if len(attempts) >= limit:
+        return max(attempts[0] + window - now, 0.001)
+
+    attempts.append(now)
+
+    return 0
+
+
+async def hit_window(key: str, limit: int, window: int) -> float:
+    if redis := await get_optional_redis():
+        try:
+            script = get_script(redis, SLIDING_WINDOW_SCRIPT)
+            retry_after = await script(
+                keys=[key], args=[window * 1000, limit, uuid.uuid4().hex]
+            )
+
+            return int(retry_after) / 1000
+        except RedisError as error:
+            report_redis_error(error)
+
+    return hit_local_window(key, limit, window)
+
+
+class RateLimit:
+    """
+    Dependency which allows per_ip attempts from an IP and per_login attempts at a
+    login within window seconds, otherwise responds with 429 and Retry-After.
+    """
+
+    def __init__(
+        self,
+        scope: str,
+        get_login: Callable[[Request], Awaitable[str | None]] | None = None,
+        per_ip: int = RATE_LIMIT_PER_IP,
+        per_login: int = RATE_LIMIT_PER_LOGIN,
+        window: int = RATE_LIMIT_WINDOW,
+    ):
+        self.scope = scope
+        self.get_login = get_login
+        self.per_ip = per_ip
+        self.per_login = per_login
+        self.window = window
+
+    async def __call__(self, request: Request) -> None:
+        prefix = f"{RATE_LIMIT_NAMESPACE}:{self.scope}"
+        host = request.client.host if request.client else "unknown"
+        limits = [(f"{prefix}:ip:{host}", self.per_ip)]
+
+        if self.get_login and (login := await self.get_login(request)):
+            limits.append((f"{prefix}:login:{login.lower()}", self.per_login))
+
+        for key, limit in limits:
+            if retry_after := await hit_window(key, limit, self.window):
+                RATE_LIMIT_REJECTIONS.labels(scope=self.scope).inc()
+
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Слишком много попыток, попробуйте позже",
+                    headers={"Retry-After": str(max(math.ceil(retry_after), 1))},
+                )
+
+
+async def get_form_login(request: Request) -> str | None:
+    # The form is already parsed for the endpoint, this reads it from the request
+    return (await request.form()).get("login")
+
+
+async def get_query_email(request: Request) -> str | None:
+    return request.query_params.get("email")
+
+
+LOGIN_RATE_LIMIT = RateLimit("login", get_login=get_form_login)
+EMAIL_CODE_RATE_LIMIT = RateLimit("email-code", get_login=get_query_email)
+EMAIL_VERIFICATION_RATE_LIMIT = RateLimit(
+    "email-verification", get_login=get_query_email
+)
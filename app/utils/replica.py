@@ -0,0 +1,61 @@
+"""
+Read-your-writes for the read replica.
+
+A successful write request pins the client to the primary for
+REPLICA_STICKY_PRIMARY_TIME: the response sets a cookie and a header with the time
+the pin ends. Browsers send the cookie back, other clients can send the header.
+Until then get_read_db gives the client sessions of the primary.
+"""
+
+import time
+
+from fastapi import Request
+
+from settings import REPLICA_STICKY_PRIMARY_TIME
+
+STICKY_PRIMARY_COOKIE = "db_primary_until"
+STICKY_PRIMARY_HEADER = "X-DB-Primary-Until"
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def is_sticky_primary(request: Request) -> bool:
+    """Whether the client wrote recently and has to read from the primary."""
+    value = request.headers.get(STICKY_PRIMARY_HEADER) or request.cookies.get(
+        STICKY_PRIMARY_COOKIE
+    )
+
+    try:
+        return float(value) > time.time()
+    except (TypeError, ValueError):
+        return False
+
+
+class StickyPrimaryMiddleware:
+    """Pins the client to the primary after requests which may have written."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            return await self.app(scope, receive, send)
+
+        async def send_with_pin(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = str(int(time.time()) + REPLICA_STICKY_PRIMARY_TIME)
+                cookie = (
+                    f"{STICKY_PRIMARY_COOKIE}={until}; "
+                    f"Max-Age={REPLICA_STICKY_PRIMARY_TIME}; "
+                    "Path=/; HttpOnly; SameSite=lax"
+                )
+
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"set-cookie", cookie.encode()),
+                    (STICKY_PRIMARY_HEADER.lower().encode(), until.encode()),
+                ]
+
+            await send(message)
+
+        await self.app(scope, receive, send_with_pin)
@@ -0,0 +1,187 @@
+"""
+Refresh tokens revoked by logging out.
+
+A token is stored by its id (the jti claim) in a Redis set of the tokens which expire
+within the same REVOKED_TOKENS_BUCKET_TIME, and the set expires with the last of
+them. Every worker mirrors the sets in Bloom filters, loaded at startup and kept up
+to date over pub/sub, so checking a token which isn't revoked, the common case,
+doesn't leave the process. Redis is asked only when the filter says "maybe" or the
+worker isn't in sync.
+
+Tokens issued before jti was added were revoked by storing the whole token as a
+key with the value LEGACY_REVOKED_VALUE, those keys are still checked for them.
+
+Without Redis a worker knows only about the tokens revoked by itself.
+"""
+
+import asyncio
+import hashlib
+import time
+
+from redis import RedisError
+from redis import asyncio as aioredis
+
+from app.redis_initializer import get_optional_redis, get_redis, report_redis_error
+from app.utils.bloom import BloomFilter
+from settings import (
+    REDIS_RETRY_INTERVAL,
+    REFRESH_TOKEN_EXPIRE_TIME,
+    REVOKED_TOKENS_BLOOM_CAPACITY,
+    REVOKED_TOKENS_BUCKET_TIME,
+)
+
+REVOKED_TOKENS_NAMESPACE = "revoked-tokens"
+REVOKED_TOKENS_CHANNEL = "revoked-tokens"
+# Value of the keys of tokens revoked before jti was added, they expire by themselves
+LEGACY_REVOKED_VALUE = "logged_out"
+
+# Filters by bucket, and tokens revoked while Redis was unavailable
+local_filters: dict[int, BloomFilter] = {}
+local_revoked: dict[int, set[str]] = {}
+# The filters have all revoked tokens while the listener is subscribed
+is_synced = False
+listener = None
+
+
+def get_token_id(token: str, payload: dict) -> str:
+    # Tokens issued before jti was added are identified by their digest
+    if jti := payload.get("jti"):
+        return jti
+
+    return hashlib.blake2b(token.encode(), digest_size=12).hexdigest()
+
+
+def get_bucket(payload: dict) -> int:
+    return int(payload["exp"]) // REVOKED_TOKENS_BUCKET_TIME
+
+
+def get_bucket_key(bucket: int) -> str:
+    return f"{REVOKED_TOKENS_NAMESPACE}:{bucket}"
+
+
+def get_live_buckets() -> range:
+    current = int(time.time()) // REVOKED_TOKENS_BUCKET_TIME
+    last = (int(time.time()) + REFRESH_TOKEN_EXPIRE_TIME) // REVOKED_TOKENS_BUCKET_TIME
+
+    return range(current, last + 1)
+
+
+def prune_buckets() -> None:
+    live = get_live_buckets()
+    for buckets in (local_filters, local_revoked):
+        for bucket in [bucket for bucket in buckets if bucket < live.start]:
+            del buckets[bucket]
+
+
+def add_to_filter(bucket: int, token_id: str) -> None:
+    if bucket not in local_filters:
+        prune_buckets()
+        local_filters[bucket] = BloomFilter(REVOKED_TOKENS_BLOOM_CAPACITY)
+
+    local_filters[bucket].add(token_id)
+
+
+def decode(value: str | bytes) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+async def revoke_token(token: str, payload: dict) -> None:
+    token_id, bucket = get_token_id(token, payload), get_bucket(payload)
+    add_to_filter(bucket, token_id)
+
+    if redis := await get_optional_redis():
+        try:
+            key = get_bucket_key(bucket)
+            async with redis.pipeline(transaction=True) as pipeline:
+                pipeline.sadd(key, token_id)
+                pipeline.expireat(key, (bucket + 1) * REVOKED_TOKENS_BUCKET_TIME)
+                pipeline.publish(REVOKED_TOKENS_CHANNEL, f"{bucket}:{token_id}")
+                await pipeline.execute()
+
+            return
+        except RedisError as error:
+            report_redis_error(error)
+
+    local_revoked.setdefault(bucket, set()).add(token_id)
+
+
+async def is_token_revoked(token: str, payload: dict) -> bool:
+    token_id, bucket = get_token_id(token, payload), get_bucket(payload)
+
+    if token_id in local_revoked.get(bucket, ()):
+        return True
+
+    if "jti" not in payload and await is_legacy_token_revoked(token):
+        return True
+
+    if is_synced and token_id not in local_filters.get(bucket, ()):
+        return False
+
+    if redis := await get_optional_redis():
+        try:
+            return bool(await redis.sismember(get_bucket_key(bucket), token_id))
+        except RedisError as error:
+            report_redis_error(error)
+
+    # A "maybe" of the filter alone isn't trusted, it would log out random users
+    return False
+
+
+async def is_legacy_token_revoked(token: str) -> bool:
+    if redis := await get_optional_redis():
+        try:
+            return decode(await redis.get(token) or "") == LEGACY_REVOKED_VALUE
+        except RedisError as error:
+            report_redis_error(error)
+
+    return False
+
+
+async def load_revoked_tokens(redis: aioredis.Redis) -> None:
+    for bucket in get_live_buckets():
+        for token_id in await redis.smembers(get_bucket_key(bucket)):
+            add_to_filter(bucket, decode(token_id))
+
+
+async def listen_revoked_tokens() -> None:
+    """Keep the filters in sync with Redis, reconnecting after failures."""
+    global is_synced
+
+    while True:
+        try:
+            pubsub = (await get_redis()).pubsub()
+            try:
+                # Subscribed before loading, so no token revoked meanwhile is missed
+                await pubsub.subscribe(REVOKED_TOKENS_CHANNEL)
+                await load_revoked_tokens(await get_redis())
+                is_synced = True
+
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        bucket, token_id = decode(message["data"]).split(":", 1)
+                        add_to_filter(int(bucket), token_id)
+            finally:
+                is_synced = False
+                await pubsub.close()
+        except (RedisError, OSError) as error:
+            report_redis_error(error)
+
+        await asyncio.sleep(REDIS_RETRY_INTERVAL)
+
+
+def start_revoked_tokens_listener() -> None:
+    global listener
+
+    listener = asyncio.create_task(listen_revoked_tokens())
+
+
+async def stop_revoked_tokens_listener() -> None:
+    global listener
+
+    if listener:
+        listener.cancel()
+        try:
+            await listener
+        except asyncio.CancelledError:
+            pass
+        listener = None
@@ -0,0 +1,231 @@
+"""
+Measure insert throughput and lookup latency with the indexes before and after
+the 0004_rationalize_indexes migration.
+
+The "before" schema is the current one with the migration's changes reverted.
+Both run against a temporary SQLite file, so writes go to disk.
+
+    python -m benchmarks.indexes --rows 2000
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import os
+import random
+import tempfile
+import time
+
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.database_initializer import Base
+from app.models import loaders  # noqa: F401, registers all models
+from app.models.code import Code
+from app.models.discount import Discount
+from app.models.goal import Goal
+from app.models.organization import Organization, Place
+from app.models.story import Story
+from app.models.user import User
+from app.types.enums import CodeType, ModerationState
+
+MIGRATION = (
+    Path(__file__).parent.parent
+    / "app/migrations/versions/0004_rationalize_indexes.py"
+)
+ORGANIZATIONS = 100
+BATCH_SIZE = 100
+
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location("rationalize_indexes", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    return migration
+
+
+def revert_indexes(connection, migration) -> None:
+    """Turn the current schema into the one before the migration."""
+    # Plain DDL, indexes declared with the columns would be added to the models' tables
+    for indexes in migration.ADDED_INDEXES.values():
+        for name in indexes:
+            connection.execute(text(f"DROP INDEX {name}"))
+
+    for table, indexes in migration.DROPPED_INDEXES.items():
+        for name, columns in indexes.items():
+            columns = ", ".join(columns)
+            connection.execute(text(f"CREATE INDEX {name} ON {table} ({columns})"))
+
+
+def media_reference() -> dict:
+    return {"hash": os.urandom(32).hex(), "size": 1024, "mime": "image/jpeg"}
+
+
+def make_rows(rows: int) -> dict:
+    now = datetime.now()
+    text = "lorem ipsum " * 20
+
+    return {
+        Organization: [
+            {
+                "id": i,
+                "name": f"org{i}",
+                "inn_or_ogrn": str(i),
+                "legal_address": "address",
+                "organization_type": "кафе",
+            }
+            for i in range(1, ORGANIZATIONS + 1)
+        ],
+        User: [
+            {
+                "id": i,
+                "username": f"user{i}",
+                "email": f"user{i}@example.com",
+                "description": text,
+                "hashed_password": os.urandom(60),
+                "role": "consumer",
+            }
+            for i in range(1, rows + 1)
+        ],
+        Goal: [
+            {
+                "id": i,
+                "owner_id": i % ORGANIZATIONS + 1,
+                "title": f"goal{i}",
+                "description": text,
+                "address": {"address": f"street {i}"},
+                "dates": ["2024-01-01", "2024-02-01"],
+                "prize_info": text,
+                "prize_conditions": {"visits": 5},
+                "content": media_reference(),
+                "created_at": now,
+            }
+            for i in range(1, rows + 1)
+        ],
+        Place: [
+            {
+                "id": i,
+                "organization_id": i % ORGANIZATIONS + 1,
+                "name": f"place{i}",
+                "address": f"street {i}",
+            }
+            for i in range(1, rows + 1)
+        ],
+        Story: [
+            {
+                "id": i,
+                "owner_id": i % rows + 1,
+                "goal_id": i % rows + 1,
+                "description": text,
+                "content": [media_reference(), media_reference()],
+                "moderation_state": ModerationState.allowed,
+                "created_at": now,
+            }
+            for i in range(1, rows * 5 + 1)
+        ],
+        Code: [
+            {
+                "value": f"code{i}",
+                "code_type": CodeType.qr_code,
+                "content": os.urandom(256),
+                "owner_id": i % rows + 1,
+                "created_at": now,
+            }
+            for i in range(1, rows + 1)
+        ],
+        Discount: [
+            {
+                "id": i,
+                "user_id": i % rows + 1,
+                "organization_id": i % ORGANIZATIONS + 1,
+                "discount_percentage": 5,
+            }
+            for i in range(1, rows + 1)
+        ],
+    }
+
+
+def lookups(rows: int) -> dict:
+    def organization_id():
+        return random.randint(1, ORGANIZATIONS)
+
+    def row_id():
+        return random.randint(1, rows)
+
+    return {
+        "place by organization and address": lambda: select(Place).filter(
+            Place.organization_id == organization_id(),
+            Place.address == f"street {row_id()}",
+        ),
+        "discount by user and organization": lambda: select(Discount).filter(
+            Discount.user_id == row_id(),
+            Discount.organization_id == organization_id(),
+        ),
+        "stories by owner": lambda: select(Story.id).filter(
+            Story.owner_id == row_id()
+        ),
+        "codes by owner": lambda: select(Code.value).filter(Code.owner_id == row_id()),
+        "goals by owner": lambda: select(Goal.id).filter(
+            Goal.owner_id == organization_id()
+        ),
+    }
+
+
+async def run(rows: int, repeat: int, before: bool) -> dict:
+    migration = load_migration()
+    path = os.path.join(tempfile.mkdtemp(), "benchmark.sqlite3")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        if before:
+            await connection.run_sync(revert_indexes, migration)
+
+    results = {}
+    random.seed(0)
+
+    async with AsyncSession(engine) as session:
+        inserted = 0
+        started_at = time.perf_counter()
+
+        for model, values in make_rows(rows).items():
+            for i in range(0, len(values), BATCH_SIZE):
+                await session.execute(insert(model), values[i : i + BATCH_SIZE])
+                await session.commit()
+            inserted += len(values)
+
+        results["insert, rows/s"] = inserted / (time.perf_counter() - started_at)
+
+        for lookup, make_query in lookups(rows).items():
+            started_at = time.perf_counter()
+            for _ in range(repeat):
+                (await session.execute(make_query())).all()
+
+            results[f"{lookup}, ms"] = (time.perf_counter() - started_at) / repeat * 1000
+
+    await engine.dispose()
+    os.remove(path)
+
+    return results
+
+
+async def main(rows: int, repeat: int) -> None:
+    before = await run(rows, repeat, before=True)
+    after = await run(rows, repeat, before=False)
+
+    print(f"{'':40} {'before':>10} {'after':>10}")
+    for key in before:
+        print(f"{key:40} {before[key]:10.2f} {after[key]:10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.rows, args.repeat))
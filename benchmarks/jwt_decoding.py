@@ -0,0 +1,59 @@
+"""
+Measure decoding of access tokens with and without the cache of verified tokens.
+
+A client sends the same token many times, so every pass decodes each of the tokens
+once; the first pass fills the cache, the following ones hit it.
+
+    python -m benchmarks.jwt_decoding --tokens 1000 --passes 20
+"""
+
+import argparse
+import statistics
+import time
+
+from app.services.auth import jwt
+from app.services.auth.jwt import generate_access_token
+from app.types.enums import Role
+from app.utils.principal import Principal
+
+
+def measure(decode, tokens: list[str], passes: int) -> list[float]:
+    timings = []
+    for _ in range(passes):
+        for token in tokens:
+            started_at = time.perf_counter()
+            decode(token)
+            timings.append(time.perf_counter() - started_at)
+
+    timings.sort()
+
+    return timings
+
+
+def main(token_count: int, passes: int) -> None:
+    tokens = [
+        generate_access_token(Principal(i, Role.consumer, None, True))
+        for i in range(token_count)
+    ]
+
+    uncached = measure(jwt.verify_token, tokens, passes)
+    jwt.invalidate_decoded_tokens()
+    cached = measure(jwt.decode_token, tokens, passes)
+
+    print(f"tokens: {token_count}, passes: {passes}")
+    print(f"{'':20} {'verify_token':>12} {'decode_token':>12}")
+    for key, percentile in (("p50, us", 0.5), ("p99, us", 0.99)):
+        before = uncached[int(len(uncached) * percentile)] * 1e6
+        after = cached[int(len(cached) * percentile)] * 1e6
+        print(f"{key:20} {before:12.2f} {after:12.2f}")
+    before, after = statistics.mean(uncached) * 1e6, statistics.mean(cached) * 1e6
+    print(f"{'mean, us':20} {before:12.2f} {after:12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--passes", type=int, default=20)
+    args = parser.parse_args()
+
+    main(args.tokens, args.passes)
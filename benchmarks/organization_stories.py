@@ -0,0 +1,164 @@
+"""
+Compare the old and the new query of organization stories on growing data.
+
+The old query filtered by Goal.owner_id without joining goals, so every story was
+paired with every goal of the organization: the rows read grow as stories × goals,
+and stories attached directly to the organization were missed. The new one reads
+a page of the stories attached to the organization by either path.
+
+    python -m benchmarks.organization_stories --scales 1 2 4 8
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.database_initializer import Base
+from app.models import loaders  # noqa: F401, registers all models
+from app.models.goal import Goal
+from app.models.organization import Organization
+from app.models.story import Story
+from app.models.user import User
+from app.types.enums import ModerationState
+from app.utils.pagination import PageParams
+
+ORGANIZATIONS = 10
+ORGANIZATION_ID = 1
+
+
+async def fill(session: AsyncSession, scale: int) -> None:
+    """Every organization gets 10·scale goals with 10 stories each and 10·scale own stories."""
+    goals_per_organization = 10 * scale
+
+    await session.execute(
+        insert(User).values(
+            id=1,
+            username="benchmark",
+            email="b@b.com",
+            hashed_password=b"",
+            role="consumer",
+        )
+    )
+    await session.execute(
+        insert(Organization),
+        [
+            {
+                "id": i,
+                "name": f"org{i}",
+                "inn_or_ogrn": str(i),
+                "legal_address": "address",
+                "organization_type": "кафе",
+            }
+            for i in range(1, ORGANIZATIONS + 1)
+        ],
+    )
+    await session.execute(
+        insert(Goal),
+        [
+            {
+                "id": organization_id * goals_per_organization + i,
+                "owner_id": organization_id,
+                "title": "goal",
+            }
+            for organization_id in range(1, ORGANIZATIONS + 1)
+            for i in range(goals_per_organization)
+        ],
+    )
+
+    stories = [
+        {"owner_id": 1, "goal_id": goal_id, "moderation_state": ModerationState.allowed}
+        for goal_id in range(
+            goals_per_organization, (ORGANIZATIONS + 1) * goals_per_organization
+        )
+        for _ in range(10)
+    ] + [
+        {
+            "owner_id": 1,
+            "organization_id": organization_id,
+            "moderation_state": ModerationState.allowed,
+        }
+        for organization_id in range(1, ORGANIZATIONS + 1)
+        for _ in range(goals_per_organization)
+    ]
+    await session.execute(insert(Story), stories)
+    await session.commit()
+
+
+def old_query():
+    return select(Story).filter(
+        Goal.owner_id == ORGANIZATION_ID,
+        Story.moderation_state == ModerationState.allowed,
+    )
+
+
+async def measure(coroutine_function, repeat: int) -> float:
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        await coroutine_function()
+
+    return (time.perf_counter() - started_at) / repeat * 1000
+
+
+async def run(scale: int, repeat: int) -> None:
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        await fill(session, scale)
+
+        total = await session.scalar(select(func.count()).select_from(Story))
+        old_rows = await session.scalar(
+            select(func.count()).select_from(old_query().subquery())
+        )
+
+        async def old():
+            (await session.execute(old_query())).scalars().all()
+            session.expunge_all()
+
+        async def first_page():
+            await Story.get_all_by_organization(
+                session, organization_id=ORGANIZATION_ID, page=PageParams()
+            )
+            session.expunge_all()
+
+        async def all_pages() -> int:
+            page = PageParams(limit=100)
+            rows = 0
+            while True:
+                result = await Story.get_all_by_organization(
+                    session, organization_id=ORGANIZATION_ID, page=page
+                )
+                session.expunge_all()
+                rows += len(result.items)
+                if not result.next_cursor:
+                    return rows
+                page = PageParams(cursor=result.next_cursor, limit=100)
+
+        print(
+            f"scale {scale}: {total} stories, old query returns {old_rows} rows, "
+            f"new one {await all_pages()} stories of the organization\n"
+            f"  old query      {await measure(old, repeat):9.2f} ms\n"
+            f"  first page     {await measure(first_page, repeat):9.2f} ms\n"
+            f"  all pages      {await measure(all_pages, repeat):9.2f} ms"
+        )
+
+    await engine.dispose()
+
+
+async def main(scales: list[int], repeat: int) -> None:
+    for scale in scales:
+        await run(scale, repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.scales, args.repeat))
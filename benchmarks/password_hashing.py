@@ -0,0 +1,132 @@
+"""
+Measure login throughput and latency of an unrelated endpoint under login load,
+with bcrypt run on the event loop and in the password executor.
+
+Logins are sent by concurrent clients for the duration while a probe requests the
+list of goals every 10 ms. Requests go through the app in process, against a
+temporary SQLite file.
+
+    python -m benchmarks.password_hashing --clients 8 --duration 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import bcrypt
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database_initializer import Base, get_db, get_read_db
+from app.models import loaders  # noqa: F401, registers all models
+from app.models.user import User
+from app.router import root_router
+from app.services.auth import password
+
+LOGIN = {"login": "benchmark", "password": "Benchmark123$"}
+PROBE_INTERVAL = 0.01
+
+
+async def run_on_event_loop(function, *args):
+    """How bcrypt was called before the executor."""
+    return function(*args)
+
+
+def make_app(session_maker) -> FastAPI:
+    async def get_benchmark_db():
+        async with session_maker() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(root_router)
+    app.dependency_overrides[get_db] = get_benchmark_db
+    app.dependency_overrides[get_read_db] = get_benchmark_db
+
+    return app
+
+
+async def run(app: FastAPI, clients: int, duration: float) -> dict:
+    logins = 0
+    probes = []
+    stop_at = time.perf_counter() + duration
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://localhost/api"
+    ) as client:
+
+        async def log_in():
+            nonlocal logins
+            while time.perf_counter() < stop_at:
+                response = await client.post("/auth/login", data=LOGIN)
+                assert response.status_code == 200, response.text
+                logins += 1
+
+        async def probe():
+            while time.perf_counter() < stop_at:
+                started_at = time.perf_counter()
+                response = await client.get("/goals/")
+                assert response.status_code == 200, response.text
+                probes.append(time.perf_counter() - started_at)
+                await asyncio.sleep(PROBE_INTERVAL)
+
+        await asyncio.gather(probe(), *(log_in() for _ in range(clients)))
+
+    probes.sort()
+
+    return {
+        "logins/s": logins / duration,
+        "probe p50, ms": statistics.median(probes) * 1000,
+        "probe p99, ms": probes[int(len(probes) * 0.99)] * 1000,
+        "probe max, ms": probes[-1] * 1000,
+    }
+
+
+async def main(clients: int, duration: float) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "benchmark.sqlite3")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(
+            insert(User).values(
+                username=LOGIN["login"],
+                email="benchmark@example.com",
+                is_email_confirmed=True,
+                hashed_password=bcrypt.hashpw(
+                    LOGIN["password"].encode(), bcrypt.gensalt()
+                ),
+                role="consumer",
+            )
+        )
+
+    app = make_app(async_sessionmaker(engine, expire_on_commit=False))
+
+    run_bcrypt = password.run_bcrypt
+    password.run_bcrypt = run_on_event_loop
+    before = await run(app, clients, duration)
+
+    password.run_bcrypt = run_bcrypt
+    after = await run(app, clients, duration)
+    password.shutdown_password_executor()
+
+    await engine.dispose()
+    os.remove(path)
+
+    print(f"workers: {password.PASSWORD_HASHING_WORKERS}, clients: {clients}")
+    print(f"{'':20} {'event loop':>12} {'executor':>12}")
+    for key in before:
+        print(f"{key:20} {before[key]:12.2f} {after[key]:12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.clients, args.duration))
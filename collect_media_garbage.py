@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+
+from app.models import loaders  # noqa: F401, registers all models referencing media
+from app.models.media import Media
+from app.database_initializer import get_db
+from app.utils.media import collect_media_garbage
+
+from settings import MEDIA_GC_BATCH_SIZE
+
+
+async def collect_garbage(dry_run: bool = False, recount: bool = False):
+    async for session in get_db():
+        if recount:
+            corrected = await Media.recount_references(
+                session, batch_size=MEDIA_GC_BATCH_SIZE
+            )
+            print(f"Reference counts corrected: {corrected}")
+
+        collected = await collect_media_garbage(session, dry_run=dry_run)
+
+        for blob_hash in collected:
+            print(blob_hash)
+
+        print(
+            f"{'Would be collected' if dry_run else 'Collected'}: {len(collected)} blobs"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete unreferenced media blobs.")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="only list what would be deleted"
+    )
+    parser.add_argument(
+        "--recount",
+        action="store_true",
+        help="recalculate reference counts from the referencing rows first",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(collect_garbage(dry_run=args.dry_run, recount=args.recount))
@@ -16,11 +16,26 @@ import os
 
 # Set debug mode for successful testing (it should be before importing app modules)
 os.environ["DEBUG"] = "true"
+# Fail tests of routes which issue more queries than their budget
+os.environ["QUERY_BUDGET_STRICT"] = "true"
 
 from exceptions import validation_error_handler
 from app.router import root_router
-from app.redis_initializer import get_redis
+from app.utils.query_stats import QueryStatsMiddleware
+from app.utils.rate_limit import RATE_LIMIT_NAMESPACE, local_windows
+from app.redis_initializer import get_optional_redis, get_redis
 from app.database_initializer import init_models
+from app.models.user import User
+from app.services.auth.password import shutdown_password_executor
+from app.services.availability import (
+    start_taken_logins_rebuild,
+    stop_taken_logins_rebuild,
+)
+from app.services.media import shutdown_derivative_executor
+from app.utils.revoked_tokens import (
+    start_revoked_tokens_listener,
+    stop_revoked_tokens_listener,
+)
 from create_superuser import create_superuser
 
 # Configure logging
@@ -40,12 +55,19 @@ async def app():
         await create_superuser("testadmin", "adminpasswD1$")
         redis = await get_redis(decode_responses=False)
         FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+        start_revoked_tokens_listener()
+        start_taken_logins_rebuild(User.iterate_logins)
 
         yield
         # Clean up on shutdown
+        shutdown_derivative_executor()
+        shutdown_password_executor()
+        await stop_revoked_tokens_listener()
+        await stop_taken_logins_rebuild()
         # TODO: Add clean up
 
     app = FastAPI(lifespan=lifespan)
+    app.add_middleware(QueryStatsMiddleware)
 
     app.include_router(root_router)
 
@@ -116,3 +138,15 @@ async def access_data_admin(client: AsyncClient):
     logger.info(f"Admin login attempt: {response.status_code}, {response.json()}")
 
     return response.json()
+
+
+@pytest_asyncio.fixture
+async def rate_limits():
+    # Attempts counted by earlier runs would be rejected within the window
+    local_windows.clear()
+
+    if redis := await get_optional_redis():
+        keys = [key async for key in redis.scan_iter(f"{RATE_LIMIT_NAMESPACE}:*")]
+        if keys:
+            await redis.delete(*keys)
+
@@ -6,6 +6,17 @@ from fastapi_cache.backends.redis import RedisBackend
 
 from app.redis_initializer import get_redis
 from app.database_initializer import init_models
+from app.models.user import User
+from app.services.auth.password import shutdown_password_executor
+from app.services.availability import (
+    start_taken_logins_rebuild,
+    stop_taken_logins_rebuild,
+)
+from app.services.media import shutdown_derivative_executor
+from app.utils.revoked_tokens import (
+    start_revoked_tokens_listener,
+    stop_revoked_tokens_listener,
+)
 
 
 @asynccontextmanager
@@ -14,6 +25,12 @@ async def lifespan(app: FastAPI):
     await init_models()
     redis = await get_redis(decode_responses=False)
     FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+    start_revoked_tokens_listener()
+    start_taken_logins_rebuild(User.iterate_logins)
     yield
     # Clean up on shutdown
+    shutdown_derivative_executor()
+    shutdown_password_executor()
+    await stop_revoked_tokens_listener()
+    await stop_taken_logins_rebuild()
     # TODO: Add clean up
@@ -8,11 +8,14 @@ from pydantic import ValidationError
 from lifespan import lifespan
 from exceptions import validation_error_handler
 
+import settings
 from app import router
+from app.utils.query_stats import QueryStatsMiddleware
+from app.utils.replica import StickyPrimaryMiddleware
 
 
 logging.basicConfig()
-logging.getLogger("sqlalchemy.engine.Engine").disabled = True
+logging.getLogger("app.utils.query_stats").setLevel(logging.INFO)
 
 app = FastAPI(
     lifespan=lifespan,
@@ -33,6 +36,9 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["*"],
 )
+app.add_middleware(QueryStatsMiddleware)
+if settings.SQLALCHEMY_REPLICA_URL:
+    app.add_middleware(StickyPrimaryMiddleware)
 
 
 app.add_exception_handler(ValidationError, validation_error_handler)
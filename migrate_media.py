@@ -0,0 +1,356 @@
+"""
+Move media stored inline as base64 to the media store and replace it with references.
+
+Tables are walked in batches ordered by id, every batch is committed separately,
+so the migration can run next to the live API and be stopped at any moment.
+The last migrated id of every table is saved to the checkpoint file after each
+commit and the next run continues from there.
+
+Photo columns have to be moved aside to legacy_photo first with `alembic upgrade head`.
+"""
+
+import argparse
+import asyncio
+import binascii
+import hashlib
+import json
+import os
+import time
+
+from base64 import b64decode
+from collections import Counter
+from dataclasses import dataclass, field
+
+from sqlalchemy import JSON, LargeBinary, column, inspect, select, table, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database_initializer import engine, get_db
+from app.models.media import Media, get_media_hashes, get_ref_count_updates
+from app.services.media import (
+    BlobStore,
+    get_blob_store,
+    generate_derivatives,
+    shutdown_derivative_executor,
+    sniff_mime,
+    SNIFF_HEADER_SIZE,
+)
+from settings import MEDIA_DERIVATIVE_SOURCE_TYPES
+
+DEFAULT_CHECKPOINT_FILE = "media_migration.checkpoint.json"
+
+
+@dataclass
+class MediaColumn:
+    table_name: str
+    # Column with base64 content, cleared after the migration unless it's the target
+    source: str
+    target: str
+    is_list: bool = False
+
+    @property
+    def table(self):
+        columns = {self.source, self.target}
+
+        return table(
+            self.table_name,
+            column("id"),
+            *[
+                column(name, LargeBinary if name == "legacy_photo" else JSON)
+                for name in sorted(columns)
+            ],
+        )
+
+
+MEDIA_COLUMNS = {
+    "users": MediaColumn("users", source="legacy_photo", target="photo"),
+    "organizations": MediaColumn("organizations", source="legacy_photo", target="photo"),
+    "goals": MediaColumn("goals", source="content", target="content"),
+    "stories": MediaColumn("stories", source="content", target="content", is_list=True),
+}
+
+
+@dataclass
+class Progress:
+    rows: int = 0
+    migrated: int = 0
+    failed: int = 0
+    size: int = 0
+    hashes: set = field(default_factory=set)
+
+    def __str__(self):
+        return (
+            f"{self.rows} rows checked, {self.migrated} migrated, {self.failed} failed, "
+            f"{self.size} bytes in {len(self.hashes)} unique blobs"
+        )
+
+
+def load_checkpoint(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_checkpoint(path: str, checkpoint: dict) -> None:
+    # Replace the file atomically, so it's never left half-written
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def is_legacy(value) -> bool:
+    return isinstance(value, (str, bytes))
+
+
+async def has_column(table_name: str, column_name: str) -> bool:
+    async with engine.connect() as connection:
+        columns = await connection.run_sync(
+            lambda sync_connection: inspect(sync_connection).get_columns(table_name)
+        )
+
+    return any(column["name"] == column_name for column in columns)
+
+
+async def store_legacy_media(
+    session: AsyncSession,
+    store: BlobStore,
+    encoded: str | bytes,
+    progress: Progress,
+    dry_run: bool,
+) -> dict:
+    """Decode base64 media, put it to the store and return the reference."""
+    data = b64decode(encoded, validate=True)
+    mime = sniff_mime(data[:SNIFF_HEADER_SIZE]) or "application/octet-stream"
+
+    if dry_run:
+        blob_hash = hashlib.sha256(data).hexdigest()
+    else:
+        blob_hash = await store.put(data)
+        await Media.register(session, blob_hash=blob_hash, size=len(data), mime=mime)
+
+    if blob_hash not in progress.hashes:
+        progress.size += len(data)
+        progress.hashes.add(blob_hash)
+
+    return {"hash": blob_hash, "size": len(data), "mime": mime}
+
+
+async def migrate_value(
+    session: AsyncSession,
+    store: BlobStore,
+    media_column: MediaColumn,
+    value,
+    progress: Progress,
+    dry_run: bool,
+):
+    if not media_column.is_list:
+        return await store_legacy_media(session, store, value, progress, dry_run)
+
+    return [
+        (
+            await store_legacy_media(session, store, item, progress, dry_run)
+            if is_legacy(item)
+            else item
+        )
+        for item in value
+    ]
+
+
+async def migrate_batch(
+    session: AsyncSession,
+    store: BlobStore,
+    media_column: MediaColumn,
+    last_id: int,
+    batch_size: int,
+    progress: Progress,
+    dry_run: bool,
+) -> int | None:
+    """Migrate the next batch of rows after the id. Returns the last id or None at the end."""
+    media_table = media_column.table
+    source = media_table.c[media_column.source]
+    target = media_table.c[media_column.target]
+
+    query = (
+        select(media_table.c.id, source, target)
+        .where(media_table.c.id > last_id, source.is_not(None))
+        .order_by(media_table.c.id)
+        .limit(batch_size)
+    )
+    if not dry_run:
+        # Rows are locked until the batch is committed, so the API can't change them
+        # between reading and writing
+        query = query.with_for_update()
+
+    rows = (await session.execute(query)).all()
+
+    if not rows:
+        return None
+
+    deltas = Counter()
+    images = set()
+
+    for row_id, value, current in rows:
+        progress.rows += 1
+
+        if media_column.is_list:
+            if not isinstance(value, list) or not any(map(is_legacy, value)):
+                continue
+        elif not is_legacy(value):
+            continue
+
+        try:
+            migrated = await migrate_value(
+                session, store, media_column, value, progress, dry_run
+            )
+        except (binascii.Error, ValueError) as error:
+            progress.failed += 1
+            print(f"{media_column.table_name} #{row_id}: can't decode media: {error}")
+            continue
+
+        progress.migrated += 1
+
+        if dry_run:
+            continue
+
+        values = {media_column.target: migrated}
+
+        if media_column.source != media_column.target:
+            values[media_column.source] = None
+
+            # The photo was already replaced through the API, the legacy one is dropped
+            if get_media_hashes(current):
+                values.pop(media_column.target)
+                migrated = None
+
+        await session.execute(
+            update(media_table).where(media_table.c.id == row_id).values(values)
+        )
+
+        # References which were already in the list are counted, only new ones are added
+        deltas.update(get_media_hashes(migrated))
+        deltas.subtract(get_media_hashes(value))
+
+        refs = [migrated] if isinstance(migrated, dict) else migrated or []
+        images.update(
+            ref["hash"] for ref in refs if ref["mime"] in MEDIA_DERIVATIVE_SOURCE_TYPES
+        )
+
+    if not dry_run:
+        for statement in get_ref_count_updates(deltas):
+            await session.execute(statement)
+
+        await session.commit()
+
+        for blob_hash in images:
+            await generate_derivatives(store, blob_hash)
+
+    return rows[-1][0]
+
+
+async def migrate_table(
+    media_column: MediaColumn,
+    checkpoint: dict,
+    checkpoint_file: str,
+    batch_size: int,
+    commits_per_second: float,
+    dry_run: bool,
+) -> Progress:
+    store = get_blob_store()
+    progress = Progress()
+    last_id = checkpoint.get(media_column.table_name, 0)
+
+    if not await has_column(media_column.table_name, media_column.source):
+        print(f"{media_column.table_name}: nothing to migrate")
+        return progress
+
+    async for session in get_db():
+        while True:
+            started_at = time.monotonic()
+
+            last_id = await migrate_batch(
+                session, store, media_column, last_id, batch_size, progress, dry_run
+            )
+
+            if last_id is None:
+                break
+
+            if not dry_run:
+                checkpoint[media_column.table_name] = last_id
+                save_checkpoint(checkpoint_file, checkpoint)
+
+            print(f"{media_column.table_name}: {progress}, last id {last_id}")
+
+            # Throttle the commit rate, so the live API isn't starved of the database
+            delay = 1 / commits_per_second - (time.monotonic() - started_at)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    return progress
+
+
+async def migrate_media(
+    tables: list[str],
+    checkpoint_file: str = DEFAULT_CHECKPOINT_FILE,
+    batch_size: int = 100,
+    commits_per_second: float = 2,
+    dry_run: bool = False,
+    restart: bool = False,
+):
+    checkpoint = {} if restart else load_checkpoint(checkpoint_file)
+
+    try:
+        for table_name in tables:
+            progress = await migrate_table(
+                MEDIA_COLUMNS[table_name],
+                checkpoint=checkpoint,
+                checkpoint_file=checkpoint_file,
+                batch_size=batch_size,
+                commits_per_second=commits_per_second,
+                dry_run=dry_run,
+            )
+            print(f"{table_name} done: {progress}")
+    finally:
+        shutdown_derivative_executor()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Move base64 media from the database to the media store."
+    )
+    parser.add_argument(
+        "--table",
+        dest="tables",
+        action="append",
+        choices=MEDIA_COLUMNS.keys(),
+        help="table to migrate, can be repeated (default: all)",
+    )
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument(
+        "--commits-per-second",
+        type=float,
+        default=2,
+        help="upper limit of committed batches per second",
+    )
+    parser.add_argument("--checkpoint-file", default=DEFAULT_CHECKPOINT_FILE)
+    parser.add_argument(
+        "--restart", action="store_true", help="ignore saved checkpoints"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only decode and count media without writing anything",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(
+        migrate_media(
+            tables=args.tables or list(MEDIA_COLUMNS),
+            checkpoint_file=args.checkpoint_file,
+            batch_size=args.batch_size,
+            commits_per_second=args.commits_per_second,
+            dry_run=args.dry_run,
+            restart=args.restart,
+        )
+    )
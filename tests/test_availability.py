@@ -0,0 +1,67 @@
+import pytest
+
+from app.database_initializer import SessionLocal
+from app.models.user import User
+from app.services import availability
+from app.services.availability import (
+    TAKEN_LOGINS_LOCK_KEY,
+    get_redis_bitmap,
+    rebuild_taken_logins,
+)
+from app.utils.bloom import BloomFilter, get_bloom_positions
+
+
+@pytest.mark.asyncio
+async def test_taken_logins(client):
+    # Test that the filter is built from all logins, in the bit order of Redis
+    async with SessionLocal() as session:
+        logins = [login async for login in User.iterate_logins(session)]
+    assert "testadmin" in logins
+
+    response = await client.get("/auth/exists", params={"login": "testadmin"})
+    assert response.json() == {"exists": True}
+
+    bloom = BloomFilter(100)
+    bloom.add("testadmin")
+    bitmap = get_redis_bitmap(bloom)
+    for position in get_bloom_positions("testadmin", bloom.size, bloom.hash_count):
+        assert bitmap[position >> 3] & (0x80 >> (position & 7))
+
+
+class LockingRedis:
+    """Redis which only keeps plain keys, enough for the lock of the rebuild."""
+
+    def __init__(self):
+        self.values = {}
+
+    async def exists(self, *keys: str) -> int:
+        return sum(key in self.values for key in keys)
+
+    async def set(self, key: str, value, nx: bool = False, ex: int | None = None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self.values.pop(key, None) is not None for key in keys)
+
+
+@pytest.mark.asyncio
+async def test_failed_rebuild_releases_lock(monkeypatch):
+    # Test that a rebuild which failed to read the logins lets another one start
+    redis = LockingRedis()
+
+    async def get_locking_redis():
+        return redis
+
+    async def get_failing_logins(session):
+        raise RuntimeError("The database is unavailable")
+        yield
+
+    monkeypatch.setattr(availability, "get_optional_redis", get_locking_redis)
+
+    await rebuild_taken_logins(get_failing_logins)
+
+    assert TAKEN_LOGINS_LOCK_KEY not in redis.values
+
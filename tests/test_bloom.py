@@ -0,0 +1,10 @@
+from app.utils.bloom import BloomFilter
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"item{i}")
+
+    assert all(f"item{i}" in bloom for i in range(1000))
+    assert sum(f"other{i}" in bloom for i in range(10000)) < 300
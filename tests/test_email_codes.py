@@ -0,0 +1,18 @@
+import pytest
+
+from app.utils.email_codes import check_email_code, issue_email_code
+from settings import EMAIL_CODE_MAX_ATTEMPTS
+
+
+@pytest.mark.asyncio
+async def test_email_codes():
+    # Test that a code is used up once entered, and dropped after wrong attempts
+    code = await issue_email_code("Codes@example.com")
+    assert await check_email_code("codes@example.com", code)
+    assert not await check_email_code("codes@example.com", code)
+
+    code = await issue_email_code("codes@example.com")
+    wrong_code = f"{(int(code) + 1) % 10**6:06}"
+    for _ in range(EMAIL_CODE_MAX_ATTEMPTS):
+        assert not await check_email_code("codes@example.com", wrong_code)
+    assert not await check_email_code("codes@example.com", code)
@@ -32,7 +32,56 @@ async def test_get_all_goals(client, access_data):
         "/goals/", headers={"Authorization": f"Bearer {access_data['access_token']}"}
     )
     assert response.status_code == 200, response.json()
-    assert isinstance(response.json(), list)
+    assert isinstance(response.json()["items"], list)
+
+
+@pytest.mark.asyncio
+async def test_get_goals_by_pages(client, access_data):
+    headers = {"Authorization": f"Bearer {access_data['access_token']}"}
+
+    for index in range(3):
+        response = await client.post(
+            "/goals/",
+            data={
+                "title": f"Paged Goal {index}",
+                "description": "Test Description",
+                "address": "Gorbunova Street, 14, Moscow, 121596",
+                "cost": 1000,
+                "from_time": "12:00:00",
+                "to_time": "13:00:00",
+                "dates": ["2017-02-02"],
+            },
+            files={"content": open("tests/assets/test_image.jpeg", "rb").read()},
+            headers=headers,
+        )
+        assert response.status_code == 201, response.json()
+
+    response = await client.get("/goals/", headers=headers)
+    all_ids = [goal["id"] for goal in response.json()["items"]]
+    assert response.json()["next_cursor"] is None
+
+    ids = []
+    params = {"limit": 1}
+    while True:
+        response = await client.get("/goals/", params=params, headers=headers)
+        assert response.status_code == 200, response.json()
+
+        page = response.json()
+        assert len(page["items"]) <= 1
+        ids.extend(goal["id"] for goal in page["items"])
+
+        if page["next_cursor"] is None:
+            break
+        params["cursor"] = page["next_cursor"]
+
+    assert ids == all_ids
+    assert len(ids) >= 3
+
+    response = await client.get("/goals/", params={"cursor": "broken"}, headers=headers)
+    assert response.status_code == 400, response.json()
+
+    response = await client.get("/goals/", params={"limit": 1000}, headers=headers)
+    assert response.status_code == 422, response.json()
 
 
 @pytest.mark.asyncio
@@ -0,0 +1,26 @@
+import pytest
+
+from fastapi import HTTPException
+
+from app.models.user import User
+from app.services.auth import jwt
+from app.services.auth.jwt import decode_token, generate_refresh_token
+from app.types.enums import Role
+
+
+def test_decoded_tokens_cache():
+    # Test that a token is verified once, until the cache is invalidated
+    token = generate_refresh_token(User(id=1, role=Role.consumer))
+    hits = jwt.DECODED_TOKENS_CACHE.labels(result="hit")
+    misses = jwt.DECODED_TOKENS_CACHE.labels(result="miss")
+    hit_count, miss_count = hits.value, misses.value
+
+    assert decode_token(token) == decode_token(token)
+    assert (hits.value - hit_count, misses.value - miss_count) == (1, 1)
+
+    jwt.invalidate_decoded_tokens()
+    decode_token(token)
+    assert misses.value - miss_count == 2
+
+    with pytest.raises(HTTPException):
+        decode_token(token[:-2])
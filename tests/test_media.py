@@ -0,0 +1,226 @@
+import os
+import random
+import time
+
+from datetime import datetime
+
+import pytest
+
+from sqlalchemy import update
+
+from app.database_initializer import SessionLocal
+from app.models.media import Media
+from app.services.media.store import LocalBlobStore
+from app.utils.media import collect_media_garbage
+from settings import MEDIA_GC_GRACE_PERIOD
+
+
+@pytest.mark.asyncio
+async def test_get_uploaded_media(client, access_data):
+    # Test uploaded photo is stored as a reference and served by the media endpoint
+    with open("tests/assets/test_image.jpeg", "rb") as photo:
+        content = photo.read()
+
+    response = await client.put(
+        "/organization/photo",
+        files={"photo": ("test_image.jpeg", content, "image/jpeg")},
+        headers={"Authorization": f"Bearer {access_data['access_token']}"},
+    )
+    assert response.status_code == 200, response.json()
+
+    response = await client.get(
+        "/organization/us",
+        headers={"Authorization": f"Bearer {access_data['access_token']}"},
+    )
+    assert response.status_code == 200, response.json()
+
+    photo = response.json()["photo"]
+    assert photo["size"] == len(content), photo
+    assert photo["mime"] == "image/jpeg", photo
+
+    response = await client.get(f"/media/{photo['hash']}")
+    assert response.status_code == 200
+    assert response.content == content
+    assert response.headers["content-type"] == "image/jpeg"
+
+    # Derivatives are generated in background after the upload
+    response = await client.get(f"/media/{photo['hash']}", params={"variant": "small"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert len(response.content) < len(content)
+
+
+@pytest.mark.asyncio
+async def test_get_media_conditional_and_partial(client, access_data):
+    # Test media endpoint supports ETag revalidation and byte ranges
+    with open("tests/assets/test_image.jpeg", "rb") as photo:
+        content = photo.read()
+
+    response = await client.put(
+        "/user/photo",
+        files={"photo": ("test_image.jpeg", content, "image/jpeg")},
+        headers={"Authorization": f"Bearer {access_data['access_token']}"},
+    )
+    assert response.status_code == 200, response.json()
+
+    response = await client.get(
+        "/auth/me", headers={"Authorization": f"Bearer {access_data['access_token']}"}
+    )
+    media_hash = response.json()["photo"]["hash"]
+
+    response = await client.get(f"/media/{media_hash}")
+    assert response.status_code == 200
+    assert response.headers["etag"] == f'"{media_hash}"'
+
+    response = await client.get(
+        f"/media/{media_hash}", headers={"If-None-Match": f'"{media_hash}"'}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = await client.get(f"/media/{media_hash}", headers={"Range": "bytes=0-99"})
+    assert response.status_code == 206
+    assert response.content == content[:100]
+    assert response.headers["content-range"] == f"bytes 0-99/{len(content)}"
+
+
+@pytest.mark.asyncio
+async def test_upload_unsupported_media(client, access_data):
+    # Test declared content type is not trusted and unknown files are rejected
+    response = await client.put(
+        "/organization/photo",
+        files={"photo": ("photo.jpeg", b"<html><script></script></html>", "image/jpeg")},
+        headers={"Authorization": f"Bearer {access_data['access_token']}"},
+    )
+    assert response.status_code == 415, response.json()
+
+
+@pytest.mark.asyncio
+async def test_upload_heic_media(client, access_data):
+    # Test photos in the default format of phones are accepted
+    headers = {"Authorization": f"Bearer {access_data['access_token']}"}
+    content = b"\x00\x00\x00\x18ftypheic" + random.randbytes(64)
+
+    response = await client.put(
+        "/user/photo",
+        files={"photo": ("photo.heic", content, "application/octet-stream")},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.json()
+
+    response = await client.get("/auth/me", headers=headers)
+    assert response.json()["photo"]["mime"] == "image/heic"
+
+
+@pytest.mark.asyncio
+async def test_get_unknown_media(client):
+    response = await client.get(f"/media/{'0' * 64}")
+    assert response.status_code == 404, response.json()
+
+    response = await client.get("/media/..%2F..%2Fsettings.py")
+    assert response.status_code == 404, response.json()
+
+
+def make_png() -> bytes:
+    # Unique image, so its references are counted from zero
+    from io import BytesIO
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new("RGB", (8, 8), tuple(random.randbytes(3))).save(buffer, format="PNG")
+
+    return buffer.getvalue()
+
+
+async def get_ref_count(blob_hash: str) -> int:
+    async with SessionLocal() as session:
+        media = await Media.get_by_hash(session, blob_hash=blob_hash)
+
+        return media.ref_count
+
+
+@pytest.mark.asyncio
+async def test_media_deduplication_and_ref_count(client, access_data):
+    # Test the same content is stored once and its references are counted
+    headers = {"Authorization": f"Bearer {access_data['access_token']}"}
+    first, second = make_png(), make_png()
+
+    response = await client.put(
+        "/user/photo", files={"photo": ("a.png", first, "image/png")}, headers=headers
+    )
+    assert response.status_code == 200, response.json()
+    response = await client.put(
+        "/organization/photo",
+        files={"photo": ("b.png", first, "image/png")},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.json()
+
+    response = await client.get("/organization/us", headers=headers)
+    first_hash = response.json()["photo"]["hash"]
+    assert await get_ref_count(first_hash) == 2
+
+    response = await client.put(
+        "/user/photo", files={"photo": ("c.png", second, "image/png")}, headers=headers
+    )
+    assert response.status_code == 200, response.json()
+
+    response = await client.get("/auth/me", headers=headers)
+    second_hash = response.json()["photo"]["hash"]
+    assert await get_ref_count(first_hash) == 1
+    assert await get_ref_count(second_hash) == 1
+
+
+@pytest.mark.asyncio
+async def test_reupload_of_orphaned_blob(tmp_path):
+    # Test that storing content of an orphaned blob again keeps it from the collector
+    store = LocalBlobStore(root=str(tmp_path))
+    content = make_png()
+
+    writer = await store.open_writer()
+    await writer.write(content)
+    blob_hash = await writer.commit()
+    expired = time.time() - MEDIA_GC_GRACE_PERIOD - 60
+    os.utime(store.path(blob_hash), (expired, expired))
+
+    writer = await store.open_writer()
+    await writer.write(content)
+    assert await writer.commit() == blob_hash
+
+    async with SessionLocal() as session:
+        assert blob_hash not in await collect_media_garbage(session, store=store)
+    assert await store.exists(blob_hash)
+
+
+@pytest.mark.asyncio
+async def test_reupload_while_collecting(tmp_path, monkeypatch):
+    # Test that a blob stored again after its row was collected isn't deleted
+    store = LocalBlobStore(root=str(tmp_path))
+    content = make_png()
+    blob_hash = await store.put(content)
+    expired = time.time() - MEDIA_GC_GRACE_PERIOD - 60
+    os.utime(store.path(blob_hash), (expired, expired))
+
+    async with SessionLocal() as session:
+        await Media.register(session, blob_hash, size=len(content), mime="image/png")
+        await session.execute(
+            update(Media)
+            .where(Media.hash == blob_hash)
+            .values(unreferenced_at=datetime.fromtimestamp(expired))
+        )
+        await session.commit()
+
+    delete_unreferenced = Media.delete_unreferenced.__func__
+
+    async def delete_and_reupload(cls, session, hashes, before):
+        deleted = await delete_unreferenced(cls, session, hashes, before)
+        # The upload registers the content again after its row was deleted
+        await store.put(content)
+        return deleted
+
+    monkeypatch.setattr(Media, "delete_unreferenced", classmethod(delete_and_reupload))
+
+    async with SessionLocal() as session:
+        assert blob_hash not in await collect_media_garbage(session, store=store)
+    assert await store.exists(blob_hash)
+
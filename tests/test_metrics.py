@@ -0,0 +1,54 @@
+import pytest
+
+from app.utils.metrics import Counter, Gauge, Histogram, Registry
+
+
+@pytest.mark.asyncio
+async def test_get_metrics(client, access_data, access_data_admin):
+    # Test that pool usage of the database engine is reported to service admins only
+    await client.get("/goals/")
+
+    response = await client.get("/metrics")
+    assert response.status_code == 401, response.text
+
+    response = await client.get(
+        "/metrics",
+        headers={"Authorization": f"Bearer {access_data['access_token']}"},
+    )
+    assert response.status_code == 403, response.text
+
+    response = await client.get(
+        "/metrics",
+        headers={"Authorization": f"Bearer {access_data_admin['access_token']}"},
+    )
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'db_pool_size{engine="primary"}' in response.text
+    assert 'db_pool_checkout_seconds_count{engine="primary"}' in response.text
+
+
+def test_render_metrics():
+    registry = Registry()
+    requests = registry.register(Counter("requests_total", "Requests"))
+    workers = registry.register(Gauge("workers", "Workers", labelnames=("pool",)))
+    latency = registry.register(Histogram("latency_seconds", "Latency", buckets=(1,)))
+
+    requests.inc()
+    workers.labels(pool="media").set_function(lambda: 2)
+    latency.observe(0.5)
+    latency.observe(3)
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        "requests_total 1",
+        "# HELP workers Workers",
+        "# TYPE workers gauge",
+        'workers{pool="media"} 2',
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="1"} 1',
+        'latency_seconds_bucket{le="+Inf"} 2',
+        "latency_seconds_sum 3.5",
+        "latency_seconds_count 2",
+    ]
@@ -0,0 +1,18 @@
+import pytest
+
+from fastapi import HTTPException
+
+from app.services.auth import password
+
+
+@pytest.mark.asyncio
+async def test_password_hashing(monkeypatch):
+    # Test that passwords are hashed off the event loop, and rejected when overloaded
+    hashed_password = await password.hash_password("Test123$")
+    assert await password.validate_password(hashed_password, "Test123$")
+    assert not await password.validate_password(hashed_password, "Wrong123$")
+
+    monkeypatch.setattr(password, "PASSWORD_HASHING_MAX_QUEUE", 0)
+    with pytest.raises(HTTPException) as error:
+        await password.hash_password("Test123$")
+    assert error.value.status_code == 503
@@ -16,7 +16,7 @@ EXPECTED_DATA_FOR_GET_PLACE = [
 async def test_places(client, access_data):
     response = await client.get("/organization/places/")
     assert response.status_code == 200, response.json()
-    assert response.json() == [], response.json()
+    assert response.json()["items"] == [], response.json()
 
     set_response = await client.put(
         "/organization/places/",
@@ -27,7 +27,7 @@ async def test_places(client, access_data):
     assert set_response.status_code == 200, set_response.json()
 
     places_response = await client.get("/organization/places/")
-    assert places_response.json() == EXPECTED_DATA_FOR_GET_PLACE, (
+    assert places_response.json()["items"] == EXPECTED_DATA_FOR_GET_PLACE, (
         f"Response: {places_response.json()}, expected: {EXPECTED_DATA_FOR_GET_PLACE}"
     )
 
@@ -40,7 +40,7 @@ async def test_places(client, access_data):
     counter = get_counter_response.json()["counter"]
 
     places_response = await client.get("/organization/places/")
-    assert places_response.json() == EXPECTED_DATA_FOR_GET_PLACE, (
+    assert places_response.json()["items"] == EXPECTED_DATA_FOR_GET_PLACE, (
         f"Response: {places_response.json()}, expected: {EXPECTED_DATA_FOR_GET_PLACE}"
     )
 
@@ -81,7 +81,9 @@ async def test_get_all_places(client, access_data):
         headers={"Authorization": f"Bearer {access_data['access_token']}"},
     )
     assert response.status_code == 200, response.json()
-    assert isinstance(response.json(), list), "Response should be a list of places"
+    assert isinstance(response.json()["items"], list), (
+        "Response should be a page of places"
+    )
 
 
 @pytest.mark.asyncio
@@ -0,0 +1,57 @@
+import pytest
+
+from app.utils import principal
+from app.utils.principal import get_account_version, publish_account_version
+
+
+class RecordingRedis:
+    """Redis which keeps values set through pipelines."""
+
+    def __init__(self):
+        self.values = {}
+
+    def pipeline(self, transaction: bool = True) -> "RecordingPipeline":
+        return RecordingPipeline(self)
+
+    async def get(self, key: str):
+        return self.values.get(key)
+
+
+class RecordingPipeline:
+    def __init__(self, redis: RecordingRedis):
+        self.redis = redis
+        self.values = {}
+
+    async def __aenter__(self) -> "RecordingPipeline":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    def setex(self, key: str, time: int, value) -> None:
+        self.values[key] = str(value)
+
+    async def execute(self) -> None:
+        self.redis.values.update(self.values)
+
+
+@pytest.mark.asyncio
+async def test_pending_account_version(monkeypatch):
+    # Test that a version which failed to reach Redis is unknown until it's retried
+    async def get_no_redis():
+        return None
+
+    monkeypatch.setattr(principal, "get_optional_redis", get_no_redis)
+    await publish_account_version(1000, 3)
+    assert await get_account_version(1000) is None
+
+    redis = RecordingRedis()
+
+    async def get_recording_redis():
+        return redis
+
+    monkeypatch.setattr(principal, "get_optional_redis", get_recording_redis)
+    principal.local_versions.clear()
+    assert await get_account_version(1000) == 3
+    assert redis.values == {"account-version:1000": "3"}
+    assert not principal.pending_versions
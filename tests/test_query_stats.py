@@ -0,0 +1,32 @@
+import pytest
+
+from app.utils.query_stats import (
+    QUERY_COUNT_HEADER,
+    QUERY_TIME_HEADER,
+    QueryBudgetExceeded,
+    QueryStats,
+    check_budget,
+    query_budget,
+)
+
+
+@pytest.mark.asyncio
+async def test_query_stats_headers(client):
+    response = await client.get("/goals/")
+    assert response.status_code == 200, response.json()
+
+    assert int(response.headers[QUERY_COUNT_HEADER]) == 1
+    assert float(response.headers[QUERY_TIME_HEADER]) > 0
+
+
+def test_query_budget():
+    @query_budget(2)
+    async def endpoint():
+        pass
+
+    scope = {"method": "GET", "path": "/api/test", "endpoint": endpoint}
+
+    check_budget(scope, QueryStats(count=2))
+
+    with pytest.raises(QueryBudgetExceeded):
+        check_budget(scope, QueryStats(count=3))
@@ -0,0 +1,15 @@
+from redis import asyncio as aioredis
+
+from app.redis_initializer import get_script
+from app.utils.rate_limit import SLIDING_WINDOW_SCRIPT
+
+
+def test_get_script():
+    # Test that a script is registered once per client
+    client, other_client = aioredis.Redis(), aioredis.Redis()
+    script = get_script(client, SLIDING_WINDOW_SCRIPT)
+
+    assert get_script(client, SLIDING_WINDOW_SCRIPT) is script
+    assert get_script(other_client, SLIDING_WINDOW_SCRIPT).registered_client is (
+        other_client
+    )
@@ -0,0 +1,79 @@
+import pytest
+import pytest_asyncio
+
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import database_initializer
+from app.database_initializer import Base
+from app.router import root_router
+from app.utils.replica import (
+    STICKY_PRIMARY_COOKIE,
+    STICKY_PRIMARY_HEADER,
+    StickyPrimaryMiddleware,
+)
+
+
+@pytest_asyncio.fixture
+async def replica(app, tmp_path, monkeypatch):
+    # An empty database in a separate file stands for a replica which lags behind
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.sqlite3'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    monkeypatch.setattr(
+        database_initializer,
+        "ReplicaSessionLocal",
+        async_sessionmaker(bind=engine, expire_on_commit=False),
+    )
+
+    replica_app = FastAPI()
+    replica_app.add_middleware(StickyPrimaryMiddleware)
+    replica_app.include_router(root_router)
+
+    yield replica_app
+
+    await engine.dispose()
+
+
+def make_client(app: FastAPI) -> AsyncClient:
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost/api")
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replica(replica):
+    async with make_client(replica) as client:
+        response = await client.get("/user/testadmin")
+        assert response.status_code == 404, response.json()
+
+
+@pytest.mark.asyncio
+async def test_reads_after_write_go_to_primary(replica):
+    user_data = {
+        "first_name": "Test",
+        "username": "replicauser",
+        "email": "replicauser@example.com",
+        "birth_date": "2000-01-01",
+        "gender": "male",
+        "password": "Test123$",
+    }
+
+    async with make_client(replica) as client:
+        response = await client.post("/auth/signup", data=user_data)
+        assert response.status_code == 201, response.json()
+        assert STICKY_PRIMARY_COOKIE in response.cookies
+        until = response.headers[STICKY_PRIMARY_HEADER]
+
+        # The cookie is sent back by the client
+        response = await client.get("/user/replicauser")
+        assert response.status_code == 200, response.json()
+
+    async with make_client(replica) as client:
+        response = await client.get(
+            "/user/replicauser", headers={STICKY_PRIMARY_HEADER: until}
+        )
+        assert response.status_code == 200, response.json()
+
+        response = await client.get("/user/replicauser")
+        assert response.status_code == 404, response.json()
@@ -0,0 +1,61 @@
+import jwt
+import pytest
+
+from datetime import datetime, timedelta, timezone
+
+from app.models.user import User
+from app.services.auth.jwt import decode_token, generate_refresh_token
+from app.types.enums import Role
+from app.utils import revoked_tokens
+from app.utils.revoked_tokens import is_token_revoked, revoke_token
+from settings import SECRET_KEY
+
+
+@pytest.mark.asyncio
+async def test_revoked_tokens():
+    # Test that only the revoked refresh token is reported as revoked
+    user = User(id=1, role=Role.consumer)
+    revoked, other = generate_refresh_token(user), generate_refresh_token(user)
+
+    await revoke_token(revoked, decode_token(revoked))
+
+    assert await is_token_revoked(revoked, decode_token(revoked))
+    assert not await is_token_revoked(other, decode_token(other))
+
+
+class LegacyRevokedRedis:
+    """Redis with tokens revoked before jti was added, stored as keys of their own."""
+
+    def __init__(self, *tokens: str):
+        self.values = {token: b"logged_out" for token in tokens}
+
+    async def get(self, key: str) -> bytes | None:
+        return self.values.get(key)
+
+    async def sismember(self, key: str, member: str) -> bool:
+        return False
+
+
+@pytest.mark.asyncio
+async def test_legacy_revoked_tokens(client, monkeypatch):
+    # Test that a token revoked before the upgrade can't be refreshed
+    token = jwt.encode(
+        {
+            "id": 1,
+            "role": Role.consumer.value,
+            "type": "refresh",
+            "exp": datetime.now(tz=timezone.utc) + timedelta(days=1),
+        },
+        SECRET_KEY,
+        algorithm="HS256",
+    )
+
+    async def get_legacy_redis():
+        return LegacyRevokedRedis(token)
+
+    monkeypatch.setattr(revoked_tokens, "get_optional_redis", get_legacy_redis)
+
+    response = await client.post(
+        "/auth/refresh", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 401, response.json()
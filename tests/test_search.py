@@ -44,7 +44,7 @@ async def test_search_places(client, access_data):
             response = await client.post(
                 "/goals/",
                 data=goal_data,
-                files={"content": random_string().encode()},
+                files={"content": open("tests/assets/test_image.jpeg", "rb").read()},
                 headers={"Authorization": f"Bearer {org_access_data['access_token']}"},
             )
             assert response.status_code == 201, response.json()
@@ -1,5 +1,10 @@
 import pytest
 
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+
+from app.utils.cache import FAVORITE_STORIES_NAMESPACE, invalidate_favorite_stories
+
 
 @pytest.mark.asyncio
 async def test_create_story(client, access_data):
@@ -87,7 +92,7 @@ async def test_get_all_organization_stories(client, access_data):
         headers={"Authorization": f"Bearer {access_data['access_token']}"},
     )
     assert response.status_code == 200, response.json()
-    assert isinstance(response.json(), list)
+    assert isinstance(response.json()["items"], list)
 
 
 @pytest.mark.asyncio
@@ -98,7 +103,7 @@ async def test_get_user_stories(client, access_data):
         headers={"Authorization": f"Bearer {access_data['access_token']}"},
     )
     assert response.status_code == 200, response.json()
-    assert isinstance(response.json(), list)
+    assert isinstance(response.json()["items"], list)
 
 
 @pytest.mark.asyncio
@@ -109,7 +114,7 @@ async def test_get_current_user_stories(client, access_data):
         headers={"Authorization": f"Bearer {access_data['access_token']}"},
     )
     assert response.status_code == 200, response.json()
-    assert isinstance(response.json(), list)
+    assert isinstance(response.json()["items"], list)
 
 
 @pytest.mark.asyncio
@@ -140,3 +145,21 @@ async def test_delete_story(client, access_data):
         "/stories/1", headers={"Authorization": f"Bearer {access_data['access_token']}"}
     )
     assert response.status_code == 404, response.json()
+
+
+@pytest.mark.asyncio
+async def test_invalidate_favorite_stories(client, monkeypatch):
+    # Test that only the showcase of the changed organization is dropped
+    backend = InMemoryBackend()
+    monkeypatch.setattr(FastAPICache, "_backend", backend)
+    prefix = f"{FastAPICache.get_prefix()}:{FAVORITE_STORIES_NAMESPACE}"
+    await backend.set(f"{prefix}:1", b"first", expire=60)
+    await backend.set(f"{prefix}:2", b"second", expire=60)
+
+    await invalidate_favorite_stories(1)
+
+    assert await backend.get(f"{prefix}:1") is None
+    assert await backend.get(f"{prefix}:2") == b"second"
+
+    # Showcases which aren't cached are skipped
+    await invalidate_favorite_stories(3)
@@ -1,6 +1,15 @@
 import pytest
 import asyncio
 
+from app.database_initializer import SessionLocal
+from app.models.user import User
+from app.services.auth.jwt import decode_token
+from app.types.enums import Role
+from app.utils.db import unit_of_work
+from app.utils.principal import invalidate_principal, publish_account_version
+from app.utils.query_stats import QUERY_COUNT_HEADER
+from app.utils.rate_limit import RATE_LIMIT_PER_LOGIN
+
 
 @pytest.mark.asyncio
 async def test_get_user_profile(client, access_data):
@@ -75,6 +84,26 @@ async def test_create_new_user(client):
     assert response.json()["username"] == user_data["username"]
 
 
+@pytest.mark.asyncio
+async def test_unit_of_work_rollback(client):
+    # Test that writes in a failed unit of work are rolled back together
+    user_data = {
+        "first_name": "Test",
+        "username": "rolledback",
+        "email": "rolledback@example.com",
+        "password": "Test123$",
+    }
+    async with SessionLocal() as session:
+        with pytest.raises(RuntimeError):
+            async with unit_of_work(session):
+                await User.create(session, user_schema=dict(user_data), role="consumer")
+                raise RuntimeError
+
+    response = await client.get("/auth/exists", params={"login": "rolledback"})
+    assert response.status_code == 200, response.json()
+    assert response.json() == {"exists": False}
+
+
 @pytest.mark.asyncio
 async def test_login_and_logout(client):
     # Test logging in with valid credentials
@@ -120,3 +149,71 @@ async def test_login_and_logout(client):
         "Refresh token after logging out shouldn't be valid: ",
         refresh_response.json().get("access_token"),
     )
+
+
+@pytest.mark.asyncio
+async def test_principal_cache(client, access_data):
+    # Test that the authenticated user is loaded once and reloaded after a change
+    headers = {"Authorization": f"Bearer {access_data['access_token']}"}
+    await invalidate_principal(decode_token(access_data["access_token"])["id"])
+
+    def query_count(response):
+        assert response.status_code == 200, response.json()
+        return int(response.headers[QUERY_COUNT_HEADER])
+
+    uncached = query_count(await client.get("/stories/me", headers=headers))
+    assert query_count(await client.get("/stories/me", headers=headers)) == uncached - 1
+
+    response = await client.patch(
+        "/user/", data={"description": "Changed"}, headers=headers
+    )
+    assert response.status_code == 200, response.json()
+    assert query_count(await client.get("/stories/me", headers=headers)) == uncached
+
+
+@pytest.mark.asyncio
+async def test_token_version(client, access_data):
+    # Test that the claims authorize without queries until the account changes
+    headers = {"Authorization": f"Bearer {access_data['access_token']}"}
+    payload = decode_token(access_data["access_token"])
+    await invalidate_principal(payload["id"])
+
+    uncached = await client.get("/stories/me", headers=headers)
+    assert uncached.status_code == 200, uncached.json()
+
+    # As if the version was read from Redis
+    await publish_account_version(payload["id"], payload["ver"])
+    response = await client.get("/stories/me", headers=headers)
+    assert response.status_code == 200, response.json()
+    assert (
+        int(response.headers[QUERY_COUNT_HEADER])
+        == int(uncached.headers[QUERY_COUNT_HEADER]) - 1
+    )
+
+    async with SessionLocal() as session:
+        user = await User.get_by_id_or_login(session, user_id=payload["id"])
+        await user.update(session, {"role": Role.consumer})
+        await user.update(session, {"role": Role(payload["role"])})
+        await session.commit()
+
+    response = await client.get("/stories/me", headers=headers)
+    assert response.status_code == 401, response.json()
+
+    headers = {"Authorization": f"Bearer {access_data['refresh_token']}"}
+    response = await client.post("/auth/refresh", headers=headers)
+    assert decode_token(response.json()["access_token"])["ver"] == payload["ver"] + 2
+
+
+@pytest.mark.asyncio
+async def test_email_verification_rate_limit(client, rate_limits):
+    # Test that guessing the code is stopped before the database is queried
+    params = {"email": "ratelimited@example.com", "code": "000000"}
+
+    for _ in range(RATE_LIMIT_PER_LOGIN):
+        response = await client.post("/auth/email-verification", params=params)
+        assert response.status_code == 401, response.json()
+
+    response = await client.post("/auth/email-verification", params=params)
+    assert response.status_code == 429, response.json()
+    assert int(response.headers["Retry-After"]) > 0
+    assert int(response.headers[QUERY_COUNT_HEADER]) == 0